@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils import timezone
-from .models import Affiliate, ReferralClick, Referral
+from .models import Affiliate, DashboardSnapshot, ReferralClick, Referral
 
 
 @admin.register(Affiliate)
@@ -74,3 +74,10 @@ class ReferralAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('affiliate__affiliate_code', 'order__order_number')
     readonly_fields = ('affiliate', 'order', 'customer', 'customer_name_masked', 'customer_email_masked', 'created_at')
+
+
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('affiliate', 'total_clicks', 'total_leads', 'total_referrals', 'updated_at')
+    search_fields = ('affiliate__affiliate_code',)
+    readonly_fields = ('affiliate', 'total_clicks', 'total_leads', 'total_referrals', 'recent_clicks', 'recent_referrals', 'updated_at')
@@ -0,0 +1,246 @@
+"""
+Buffered click ingestion.
+
+Clicks first pass a filter stage: known bot/link-preview user agents and
+repeats of the same (affiliate, IP, user agent) inside a sliding window
+are counted but not stored. Accepted clicks are appended to an in-process bounded buffer and return
+immediately; a background thread writes them with bulk_create once
+CLICK_FLUSH_BATCH_SIZE clicks are queued or CLICK_FLUSH_INTERVAL seconds
+have passed, interning user-agent strings into the user_agents table on the
+way. When the buffer is full new clicks are dropped (and counted)
+rather than blocking the redirect. Remaining clicks are flushed at exit.
+Written clicks are added to the live click counters (apps.core.counters).
+"""
+
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.core.counters import counters, CLICKS
+
+logger = logging.getLogger(__name__)
+
+
+# Crawlers, link unfurlers (WhatsApp/Instagram/Telegram previews) and scripts.
+# In-app browsers (Instagram, TikTok) send a normal Mozilla UA and pass.
+BOT_USER_AGENT_PATTERN = re.compile(
+    r'bot|crawl|spider|slurp|preview|facebookexternalhit|facebot|whatsapp|'
+    r'telegram|skypeuripreview|embedly|headless|lighthouse|'
+    r'curl|wget|python-requests|python-urllib|httpx|okhttp|go-http-client|java/',
+    re.IGNORECASE
+)
+
+
+class ClickFilter:
+    """
+    Classify clicks before they are recorded.
+    
+    Duplicate detection keeps the last-seen time per (affiliate, IP,
+    user-agent hash) in a bounded LRU map; a repeat within `window` seconds
+    is a duplicate and refreshes the window.
+    """
+    
+    def __init__(self, window=None, max_keys=None):
+        self.window = window or getattr(settings, 'CLICK_DEDUP_WINDOW', 30 * 60)
+        self.max_keys = max_keys or getattr(settings, 'CLICK_DEDUP_MAX_KEYS', 100000)
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def is_bot(user_agent):
+        return not user_agent or bool(BOT_USER_AGENT_PATTERN.search(user_agent))
+    
+    def is_duplicate(self, affiliate_id, ip_address, user_agent):
+        ua_hash = hashlib.blake2b(user_agent.encode(), digest_size=8).digest()
+        key = (affiliate_id, ip_address, ua_hash)
+        now = time.monotonic()
+        
+        with self._lock:
+            last_seen = self._seen.get(key)
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            
+            # Oldest entries are at the front: expire, then enforce the bound
+            while self._seen:
+                oldest_key, oldest_time = next(iter(self._seen.items()))
+                if now - oldest_time <= self.window and len(self._seen) <= self.max_keys:
+                    break
+                self._seen.popitem(last=False)
+        
+        return last_seen is not None and now - last_seen <= self.window
+    
+    def classify(self, affiliate_id, ip_address, user_agent):
+        """Return 'bot', 'duplicate' or None (record the click)."""
+        if self.is_bot(user_agent):
+            return 'bot'
+        if self.is_duplicate(affiliate_id, ip_address, user_agent):
+            return 'duplicate'
+        return None
+
+
+class ClickIngestionPipeline:
+    """Bounded click buffer with a size/time-triggered background flusher."""
+    
+    def __init__(self, capacity=None, batch_size=None, flush_interval=None):
+        self.capacity = capacity or getattr(settings, 'CLICK_BUFFER_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'CLICK_FLUSH_BATCH_SIZE', 500)
+        self.flush_interval = flush_interval or getattr(settings, 'CLICK_FLUSH_INTERVAL', 2.0)
+        
+        self.filter = ClickFilter()
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        
+        self.metrics = {
+            'bots': 0,
+            'duplicates': 0,
+            'enqueued': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'flushes': 0,
+            'last_flush_at': None,
+        }
+    
+    def record(self, affiliate_id, ip_address=None, user_agent='', referer_url='', landing_page=''):
+        """
+        Filter a click and queue it for insertion.
+        
+        Returns:
+            bool: False if the click was filtered out or dropped because the buffer is full
+        """
+        rejection = self.filter.classify(affiliate_id, ip_address, user_agent)
+        if rejection:
+            with self._condition:
+                self.metrics['bots' if rejection == 'bot' else 'duplicates'] += 1
+            return False
+        
+        click = {
+            'affiliate_id': affiliate_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'referer_url': referer_url,
+            'landing_page': landing_page,
+            'created_at': timezone.now(),
+        }
+        
+        if not getattr(settings, 'CLICK_INGEST_ASYNC', True):
+            self._write([click])
+            return True
+        
+        self._ensure_started()
+        with self._condition:
+            if len(self._buffer) >= self.capacity:
+                self.metrics['dropped'] += 1
+                return False
+            self._buffer.append(click)
+            self.metrics['enqueued'] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return True
+    
+    def flush(self):
+        """Write everything currently buffered. Returns the number of clicks written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._condition:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                written += self._write(batch)
+        return written
+    
+    def get_metrics(self):
+        """Return a snapshot of pipeline counters."""
+        with self._condition:
+            return {
+                **self.metrics,
+                'buffered': len(self._buffer),
+                'capacity': self.capacity,
+            }
+    
+    def shutdown(self):
+        """Stop the flusher thread and flush remaining clicks."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+    
+    def _write(self, batch):
+        from .models import DashboardSnapshot, ReferralClick, UserAgent
+        
+        try:
+            user_agent_ids = UserAgent.intern_many(click['user_agent'] for click in batch)
+            clicks = ReferralClick.objects.bulk_create([
+                ReferralClick(
+                    **{key: value for key, value in click.items() if key != 'user_agent'},
+                    user_agent_id=user_agent_ids.get(click['user_agent'])
+                )
+                for click in batch
+            ])
+        except Exception as e:
+            logger.error(f'Failed to write {len(batch)} clicks: {e}')
+            with self._condition:
+                self.metrics['failed'] += len(batch)
+            return 0
+        
+        try:
+            DashboardSnapshot.add_clicks(clicks)
+        except Exception as e:
+            # Clicks are stored; rebuild_dashboards repairs the counter
+            logger.error(f'Failed to update dashboards for {len(batch)} clicks: {e}')
+        
+        deltas = {}
+        for click in clicks:
+            counters.add(deltas, CLICKS, 1, click.affiliate_id)
+        counters.incr_many(deltas)
+        
+        with self._condition:
+            self.metrics['flushed'] += len(batch)
+            self.metrics['flushes'] += 1
+            self.metrics['last_flush_at'] = timezone.now().isoformat()
+        return len(batch)
+    
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='click-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                stopping = self._stopping
+            
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+            
+            if stopping:
+                return
+
+
+# Singleton instance
+click_pipeline = ClickIngestionPipeline()
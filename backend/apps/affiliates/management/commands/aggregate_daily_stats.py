@@ -5,15 +5,22 @@ Usage:
     python manage.py aggregate_daily_stats
     python manage.py aggregate_daily_stats --date=2026-01-09
     python manage.py aggregate_daily_stats --days=7
-    
+    python manage.py aggregate_daily_stats --days=7 --legacy
+
 Schedule with cron:
     0 1 * * * cd /path/to/backend && python manage.py aggregate_daily_stats
+
+By default each date is aggregated set-based: one grouped query per source
+table (clicks, referrals, commissions), merged in memory and written back
+with a single bulk upsert. --legacy runs the original per-affiliate queries
+and is kept for verifying the set-based results.
 """
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count, Sum, Q
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
 from apps.affiliates.models import Affiliate, ReferralClick, Referral, DailyStats
 from apps.commissions.models import Commission
 
@@ -37,6 +44,11 @@ class Command(BaseCommand):
             type=str,
             help='Aggregate for specific affiliate code only'
         )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Use the per-affiliate query path (slow, for verification)'
+        )
     
     def handle(self, *args, **options):
         # Determine which dates to process
@@ -60,14 +72,29 @@ class Command(BaseCommand):
         total_processed = 0
         total_updated = 0
         
-        for target_date in dates:
-            self.stdout.write(f'\nProcessing date: {target_date}')
+        if not options.get('legacy'):
+            affiliate_ids = [a.id for a in affiliates] if options.get('affiliate') else list(
+                affiliates.values_list('id', flat=True)
+            )
             
-            for affiliate in affiliates:
-                updated = self._aggregate_for_affiliate_date(affiliate, target_date)
-                if updated:
-                    total_updated += 1
-                total_processed += 1
+            for target_date in dates:
+                updated = self._aggregate_date(affiliate_ids, target_date)
+                self.stdout.write(f'Processed {target_date}: {updated} affiliates')
+                total_updated += updated
+                total_processed += len(affiliate_ids)
+        else:
+            for target_date in dates:
+                self.stdout.write(f'\nProcessing date: {target_date}')
+                
+                for affiliate in affiliates:
+                    updated = self._aggregate_for_affiliate_date(affiliate, target_date)
+                    if updated:
+                        total_updated += 1
+                    total_processed += 1
+        
+        # Rankings read DailyStats, so drop cached leaderboards
+        from apps.affiliates.services import LeaderboardService
+        LeaderboardService.invalidate()
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -83,11 +110,105 @@ class Command(BaseCommand):
             return [datetime.strptime(options['date'], '%Y-%m-%d').date()]
         elif options.get('days'):
             # Multiple days
-            today = date.today()
+            today = timezone.localdate()
             return [today - timedelta(days=i) for i in range(1, options['days'] + 1)]
         else:
             # Default: yesterday
-            return [date.today() - timedelta(days=1)]
+            return [timezone.localdate() - timedelta(days=1)]
+    
+    def _get_day_bounds(self, target_date):
+        """Return [start, end) aware datetimes covering target_date in local time."""
+        start_datetime = timezone.make_aware(
+            datetime.combine(target_date, datetime.min.time())
+        )
+        end_datetime = timezone.make_aware(
+            datetime.combine(target_date + timedelta(days=1), datetime.min.time())
+        )
+        return start_datetime, end_datetime
+    
+    def _aggregate_date(self, affiliate_ids, target_date):
+        """
+        Aggregate stats for all given affiliates on one date (set-based).
+        
+        Runs one grouped query per source table and writes every row back
+        with a single bulk upsert. Affiliates without activity get a zero row,
+        matching the legacy path.
+        """
+        if not affiliate_ids:
+            return 0
+        
+        start_datetime, end_datetime = self._get_day_bounds(target_date)
+        created_range = Q(created_at__gte=start_datetime, created_at__lt=end_datetime)
+        matured_range = Q(
+            matured_at__gte=start_datetime,
+            matured_at__lt=end_datetime,
+            status='available'
+        )
+        
+        # Clicks per affiliate (raw rows plus rollups of already-pruned clicks)
+        clicks = ReferralClick.count_by_affiliate(affiliate_ids, start_datetime, end_datetime)
+        
+        # Conversions and sales from confirmed referrals
+        referrals = {
+            row['affiliate_id']: row
+            for row in Referral.objects.filter(
+                created_range, affiliate_id__in=affiliate_ids, status='confirmed'
+            )
+            .order_by()
+            .values('affiliate_id')
+            .annotate(conversions=Count('id'), sales=Sum('order__final_amount'))
+        }
+        
+        # Earned and matured commission in one pass
+        commissions = {
+            row['affiliate_id']: row
+            for row in Commission.objects.filter(
+                created_range | matured_range, affiliate_id__in=affiliate_ids
+            )
+            .order_by()
+            .values('affiliate_id')
+            .annotate(
+                earned=Sum('amount', filter=created_range),
+                matured=Sum('amount', filter=matured_range)
+            )
+        }
+        
+        rows = []
+        for affiliate_id in affiliate_ids:
+            clicks_count = clicks.get(affiliate_id, 0)
+            referral_data = referrals.get(affiliate_id, {})
+            commission_data = commissions.get(affiliate_id, {})
+            conversions_count = referral_data.get('conversions', 0)
+            
+            conversion_rate = 0
+            if clicks_count > 0:
+                conversion_rate = round((conversions_count / clicks_count) * 100, 2)
+            
+            rows.append(DailyStats(
+                affiliate_id=affiliate_id,
+                date=target_date,
+                clicks=clicks_count,
+                conversions=conversions_count,
+                conversion_rate=conversion_rate,
+                commission_earned=commission_data.get('earned') or 0,
+                commission_matured=commission_data.get('matured') or 0,
+                total_sales=referral_data.get('sales') or 0,
+            ))
+        
+        with transaction.atomic():
+            DailyStats.objects.bulk_create(
+                rows,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['affiliate', 'date'],
+                update_fields=[
+                    'clicks', 'conversions', 'conversion_rate',
+                    'commission_earned', 'commission_matured',
+                    'total_sales', 'updated_at',
+                ],
+            )
+        
+        return len(rows)
     
     def _aggregate_for_affiliate_date(self, affiliate, target_date):
         """Aggregate stats for one affiliate and one date."""
@@ -98,12 +219,10 @@ class Command(BaseCommand):
             datetime.combine(target_date, datetime.max.time())
         )
         
-        # Count clicks for this date
-        clicks_count = ReferralClick.objects.filter(
-            affiliate=affiliate,
-            created_at__gte=start_datetime,
-            created_at__lte=end_datetime
-        ).count()
+        # Count clicks for this date (raw rows plus rollups of pruned clicks)
+        clicks_count = ReferralClick.count_for_affiliate(
+            affiliate.id, *self._get_day_bounds(target_date)
+        )
         
         # Count conversions (confirmed referrals)
         conversions_count = Referral.objects.filter(
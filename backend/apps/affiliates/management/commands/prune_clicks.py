@@ -0,0 +1,114 @@
+"""
+Django management command to apply the raw click retention policy.
+
+Raw ReferralClick rows older than CLICK_RETENTION_DAYS are folded into
+hourly ClickRollup counts and deleted, in bounded batches. Each batch adds
+its counts and deletes its rows in one transaction, so click totals
+(ReferralClick.count_by_affiliate) never double-count or lose a click.
+User-agent strings no longer referenced by any click are removed at the end.
+
+Usage:
+    python manage.py prune_clicks
+    python manage.py prune_clicks --dry-run
+    python manage.py prune_clicks --days=30 --batch-size=10000
+
+Schedule with cron (after aggregate_daily_stats):
+    30 1 * * * cd /path/to/backend && python manage.py prune_clicks
+"""
+
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from apps.affiliates.models import ReferralClick, ClickRollup, UserAgent
+
+
+class Command(BaseCommand):
+    help = 'Roll up raw referral clicks past the retention window and delete them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'CLICK_RETENTION_DAYS', 90),
+            help='Keep raw clicks for this many days (default: CLICK_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Clicks rolled up and deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be rolled up without changing anything'
+        )
+    
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        if days < 1 or batch_size < 1:
+            raise CommandError('--days and --batch-size must be positive')
+        
+        # Cut on an hour boundary so every rolled-up hour is complete
+        cutoff = ClickRollup.truncate(timezone.now() - timedelta(days=days))
+        expired = ReferralClick.objects.filter(created_at__lt=cutoff)
+        total = expired.count()
+        
+        self.stdout.write(f'🧹 Pruning clicks before {timezone.localtime(cutoff):%Y-%m-%d %H:%M} ({days} days)')
+        
+        if options['dry_run']:
+            buckets = (
+                expired.order_by()
+                .annotate(hour=TruncHour('created_at'))
+                .values('affiliate_id', 'hour')
+                .distinct()
+                .count()
+            )
+            self.stdout.write(self.style.WARNING(
+                f'🔍 DRY RUN: {total:,} clicks would be rolled up into {buckets:,} hourly rows and deleted'
+            ))
+            return
+        
+        if not total:
+            self.stdout.write(self.style.SUCCESS('✓ Nothing to prune'))
+            return
+        
+        processed = 0
+        while True:
+            pruned = self._prune_batch(cutoff, batch_size)
+            if not pruned:
+                break
+            processed += pruned
+            self.stdout.write(f'   {processed:,}/{total:,} clicks ({processed * 100 // max(total, processed)}%)')
+        
+        orphaned, _ = UserAgent.objects.filter(clicks__isnull=True).delete()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rolled up and deleted {processed:,} clicks, removed {orphaned:,} unused user agents'
+        ))
+    
+    def _prune_batch(self, cutoff, batch_size):
+        """Roll up and delete the oldest `batch_size` expired clicks. Returns rows pruned."""
+        with transaction.atomic():
+            # Lock the rows so a concurrent run cannot count them a second time
+            rows = list(
+                ReferralClick.objects.select_for_update()
+                .filter(created_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', 'affiliate_id', 'created_at')[:batch_size]
+            )
+            if not rows:
+                return 0
+            
+            ClickRollup.add_counts(Counter(
+                (affiliate_id, ClickRollup.truncate(created_at))
+                for _, affiliate_id, created_at in rows
+            ))
+            ReferralClick.objects.filter(id__in=[row[0] for row in rows]).delete()
+        
+        return len(rows)
@@ -0,0 +1,84 @@
+"""
+Django management command to reconcile affiliate dashboard snapshots.
+
+Recomputes DashboardSnapshot counters and recent items from source rows,
+reports drifted counters and rewrites the drifted (or missing) snapshots.
+
+Usage:
+    python manage.py rebuild_dashboards
+    python manage.py rebuild_dashboards --dry-run
+    python manage.py rebuild_dashboards --affiliate=AbC1234
+    python manage.py rebuild_dashboards --all
+
+Schedule with cron:
+    45 0 * * * cd /path/to/backend && python manage.py rebuild_dashboards
+"""
+
+from django.core.management.base import BaseCommand
+from apps.affiliates.models import Affiliate, DashboardSnapshot
+
+
+COUNTER_FIELDS = ['total_clicks', 'total_leads', 'total_referrals']
+
+
+class Command(BaseCommand):
+    help = 'Recompute affiliate dashboard snapshots from source rows and report drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--affiliate',
+            type=str,
+            help='Reconcile a specific affiliate code only'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rewrite every snapshot, not only drifted ones'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without rewriting snapshots'
+        )
+    
+    def handle(self, *args, **options):
+        affiliates = Affiliate.objects.filter(status='approved')
+        if options.get('affiliate'):
+            affiliates = Affiliate.objects.filter(affiliate_code=options['affiliate'])
+            if not affiliates.exists():
+                self.stdout.write(self.style.ERROR(f'Affiliate {options["affiliate"]} not found'))
+                return
+        affiliate_ids = list(affiliates.values_list('id', flat=True))
+        
+        snapshots = DashboardSnapshot.objects.in_bulk(affiliate_ids)
+        
+        drifted = []
+        for affiliate_id in affiliate_ids:
+            snapshot = snapshots.get(affiliate_id)
+            if snapshot is None:
+                drifted.append(affiliate_id)
+                self.stdout.write(f'  - Affiliate #{affiliate_id}: missing snapshot')
+                continue
+            
+            expected = DashboardSnapshot.compute_from_source(affiliate_id)
+            diffs = [
+                f'{field} {getattr(snapshot, field):,} -> {expected[field]:,}'
+                for field in COUNTER_FIELDS
+                if getattr(snapshot, field) != expected[field]
+            ]
+            if diffs:
+                drifted.append(affiliate_id)
+                self.stdout.write(f'  - Affiliate #{affiliate_id}: ' + ', '.join(diffs))
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\n=== DRY RUN MODE ==='))
+            self.stdout.write(f'{len(drifted)} of {len(affiliate_ids)} snapshots drifted or missing')
+            return
+        
+        to_rebuild = affiliate_ids if options['all'] else drifted
+        DashboardSnapshot.rebuild(to_rebuild)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {len(affiliate_ids)} snapshots checked, {len(drifted)} drifted, {len(to_rebuild)} rebuilt'
+            )
+        )
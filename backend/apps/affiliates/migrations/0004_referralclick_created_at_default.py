@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0003_referral_referrals_affilia_62a173_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='referralclick',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+import django.db.models.deletion
+import hashlib
+from django.db import migrations, models
+
+
+def intern_user_agents(apps, schema_editor):
+    """Move the per-row user-agent text into the user_agents table."""
+    UserAgent = apps.get_model('affiliates', 'UserAgent')
+    ReferralClick = apps.get_model('affiliates', 'ReferralClick')
+
+    ids = {}
+    values = (
+        ReferralClick.objects.exclude(user_agent_text='')
+        .values_list('user_agent_text', flat=True)
+        .distinct()
+        .iterator()
+    )
+    for value in values:
+        digest = hashlib.sha1(value.encode('utf-8', 'replace')).hexdigest()
+        ids[value] = UserAgent.objects.get_or_create(digest=digest, defaults={'value': value})[0].id
+
+    for value, user_agent_id in ids.items():
+        ReferralClick.objects.filter(user_agent_text=value).update(user_agent_id=user_agent_id)
+
+
+def restore_user_agents(apps, schema_editor):
+    UserAgent = apps.get_model('affiliates', 'UserAgent')
+    ReferralClick = apps.get_model('affiliates', 'ReferralClick')
+
+    for user_agent in UserAgent.objects.iterator():
+        ReferralClick.objects.filter(user_agent_id=user_agent.id).update(user_agent_text=user_agent.value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0004_referralclick_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='SHA-1 of the user-agent string', max_length=40, unique=True)),
+                ('value', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'user_agents',
+            },
+        ),
+        migrations.CreateModel(
+            name='ClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('affiliate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='click_rollups', to='affiliates.affiliate')),
+            ],
+            options={
+                'db_table': 'referral_click_rollups',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='referral_cl_hour_0649c1_idx')],
+                'unique_together': {('affiliate', 'hour')},
+            },
+        ),
+        migrations.RenameField(
+            model_name='referralclick',
+            old_name='user_agent',
+            new_name='user_agent_text',
+        ),
+        migrations.AddField(
+            model_name='referralclick',
+            name='user_agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clicks', to='affiliates.useragent'),
+        ),
+        migrations.RunPython(intern_user_agents, restore_user_agents),
+        migrations.RemoveField(
+            model_name='referralclick',
+            name='user_agent_text',
+        ),
+        migrations.AddIndex(
+            model_name='referralclick',
+            index=models.Index(fields=['created_at'], name='referral_cl_created_9c5a84_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0005_useragent_clickrollup_and_more'),
+        ('orders', '0003_order_invoice_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='referral',
+            index=models.Index(fields=['affiliate', 'created_at', 'id'], name='referrals_affilia_24da46_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referral',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='referrals_status_7ffc87_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referral',
+            index=models.Index(fields=['created_at', 'id'], name='referrals_created_503578_idx'),
+        ),
+    ]
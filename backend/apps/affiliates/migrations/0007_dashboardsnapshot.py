@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0006_referral_referrals_affilia_24da46_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('affiliate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_snapshot', serialize=False, to='affiliates.affiliate')),
+                ('total_clicks', models.PositiveBigIntegerField(default=0)),
+                ('total_leads', models.PositiveIntegerField(default=0)),
+                ('total_referrals', models.PositiveIntegerField(default=0)),
+                ('recent_clicks', models.JSONField(default=list)),
+                ('recent_referrals', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'affiliate_dashboard_snapshots',
+            },
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
+from datetime import timezone as dt_timezone
+import hashlib
 import secrets
 import string
 
@@ -71,6 +77,14 @@ class Affiliate(models.Model):
         if not self.affiliate_code:
             self.affiliate_code = generate_affiliate_code()
         super().save(*args, **kwargs)
+        # Status/rate may have changed: drop the cached code resolution
+        from .resolver import affiliate_code_cache
+        affiliate_code_cache.invalidate(self.affiliate_code)
+    
+    def delete(self, *args, **kwargs):
+        from .resolver import affiliate_code_cache
+        affiliate_code_cache.invalidate(self.affiliate_code)
+        return super().delete(*args, **kwargs)
     
     @property
     def is_approved(self):
@@ -90,29 +104,184 @@ class Affiliate(models.Model):
             return f"{backend_url}/r/{self.affiliate_code}/"
 
 
+class UserAgent(models.Model):
+    """Interned user-agent string, shared by every click that sent it."""
+    
+    digest = models.CharField(max_length=40, unique=True, help_text='SHA-1 of the user-agent string')
+    value = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'user_agents'
+    
+    def __str__(self):
+        return self.value
+    
+    @staticmethod
+    def digest_for(value):
+        return hashlib.sha1(value.encode('utf-8', 'replace')).hexdigest()
+    
+    @classmethod
+    def intern_many(cls, values):
+        """
+        Map user-agent strings to UserAgent ids, creating missing rows.
+        
+        Two queries at most (plus the insert). Empty strings map to None.
+        
+        Returns:
+            dict: {value: id}
+        """
+        by_digest = {cls.digest_for(value): value for value in set(values) if value}
+        if not by_digest:
+            return {}
+        
+        ids = dict(cls.objects.filter(digest__in=by_digest).values_list('digest', 'id'))
+        missing = [digest for digest in by_digest if digest not in ids]
+        if missing:
+            # ignore_conflicts: a concurrent flush may insert the same string
+            cls.objects.bulk_create(
+                [cls(digest=digest, value=by_digest[digest]) for digest in missing],
+                ignore_conflicts=True
+            )
+            ids.update(cls.objects.filter(digest__in=missing).values_list('digest', 'id'))
+        
+        return {value: ids[digest] for digest, value in by_digest.items()}
+
+
 class ReferralClick(models.Model):
-    """Track clicks on affiliate referral links."""
+    """
+    Track clicks on affiliate referral links.
+    
+    Only a recent tail is kept raw: `prune_clicks` folds older rows into
+    hourly ClickRollup counts and deletes them. Use count_by_affiliate()
+    rather than counting this table directly.
+    """
     
     affiliate = models.ForeignKey(Affiliate, on_delete=models.CASCADE, related_name='clicks')
     
     # Tracking info
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='clicks'
+    )
     referer_url = models.URLField(blank=True)
     landing_page = models.URLField(blank=True)
     
-    # Timestamp
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Timestamp (set at click time; rows are written later in batches)
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'referral_clicks'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['affiliate', 'created_at']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
         return f"Click for {self.affiliate.affiliate_code} at {self.created_at}"
+    
+    @staticmethod
+    def count_by_affiliate(affiliate_ids=None, start=None, end=None):
+        """
+        Click totals per affiliate over [start, end): rolled-up hours plus raw rows.
+        
+        Rollups are hourly, so bounds should fall on the hour (day bounds do).
+        
+        Returns:
+            dict: {affiliate_id: clicks}
+        """
+        from django.db.models import Count, Sum
+        
+        raw = ReferralClick.objects.all()
+        rolled = ClickRollup.objects.all()
+        if affiliate_ids is not None:
+            raw = raw.filter(affiliate_id__in=affiliate_ids)
+            rolled = rolled.filter(affiliate_id__in=affiliate_ids)
+        if start is not None:
+            raw = raw.filter(created_at__gte=start)
+            rolled = rolled.filter(hour__gte=start)
+        if end is not None:
+            raw = raw.filter(created_at__lt=end)
+            rolled = rolled.filter(hour__lt=end)
+        
+        totals = dict(
+            raw.order_by().values('affiliate_id').annotate(total=Count('id')).values_list('affiliate_id', 'total')
+        )
+        for affiliate_id, clicks in (
+            rolled.order_by().values('affiliate_id').annotate(total=Sum('clicks')).values_list('affiliate_id', 'total')
+        ):
+            totals[affiliate_id] = totals.get(affiliate_id, 0) + clicks
+        return totals
+    
+    @staticmethod
+    def count_for_affiliate(affiliate_id, start=None, end=None):
+        """Click total for one affiliate (see count_by_affiliate)."""
+        return ReferralClick.count_by_affiliate([affiliate_id], start, end).get(affiliate_id, 0)
+
+
+class ClickRollup(models.Model):
+    """
+    Hourly click counts for raw clicks removed by the retention job.
+    
+    `hour` is the UTC start of the hour. Written only by `prune_clicks`,
+    in the same transaction that deletes the raw rows it counts.
+    """
+    
+    affiliate = models.ForeignKey(Affiliate, on_delete=models.CASCADE, related_name='click_rollups')
+    hour = models.DateTimeField()
+    clicks = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'referral_click_rollups'
+        unique_together = ['affiliate', 'hour']
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f'{self.affiliate_id} @ {self.hour:%Y-%m-%d %H:00}: {self.clicks}'
+    
+    @staticmethod
+    def truncate(moment):
+        """Start of the UTC hour containing `moment`."""
+        return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    
+    @classmethod
+    def add_counts(cls, counts):
+        """
+        Add {(affiliate_id, hour): clicks} onto existing rollup rows.
+        
+        Must run inside the transaction that deletes the counted clicks.
+        """
+        if not counts:
+            return
+        
+        affiliate_ids = {affiliate_id for affiliate_id, _ in counts}
+        hours = {hour for _, hour in counts}
+        existing = {
+            (row.affiliate_id, row.hour): row
+            for row in cls.objects.select_for_update().filter(affiliate_id__in=affiliate_ids, hour__in=hours)
+        }
+        
+        to_update, to_create = [], []
+        for key, clicks in counts.items():
+            row = existing.get(key)
+            if row:
+                row.clicks += clicks
+                to_update.append(row)
+            else:
+                to_create.append(cls(affiliate_id=key[0], hour=key[1], clicks=clicks))
+        
+        if to_update:
+            cls.objects.bulk_update(to_update, ['clicks'])
+        if to_create:
+            cls.objects.bulk_create(to_create)
 
 
 class Referral(models.Model):
@@ -143,12 +312,35 @@ class Referral(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['affiliate', 'status', 'created_at']),
+            models.Index(fields=['affiliate', 'created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
             models.Index(fields=['order']),
         ]
     
     def __str__(self):
         return f"Referral: {self.affiliate.affiliate_code} -> {self.order.order_number}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_affiliate_id = instance.__dict__.get('affiliate_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from apps.core.counters import counters, CONVERSIONS
+        
+        adding = self._state.adding
+        loaded_affiliate_id = getattr(self, '_loaded_affiliate_id', None)
+        super().save(*args, **kwargs)
+        # Refresh the dashboards showing this referral (both, if reassigned)
+        DashboardSnapshot.schedule_referral_refresh([self.affiliate_id, loaded_affiliate_id])
+        if adding:
+            counters.incr_on_commit(counters.add({}, CONVERSIONS, 1, self.affiliate_id))
+        elif loaded_affiliate_id and loaded_affiliate_id != self.affiliate_id:
+            counters.incr_on_commit({(CONVERSIONS, loaded_affiliate_id): -1, (CONVERSIONS, self.affiliate_id): 1})
+        self._loaded_affiliate_id = self.affiliate_id
+    
     @staticmethod
     def mask_name(name):
         """Mask name for privacy: 'Darmawan Putra' -> 'Dar**** Pu****'"""
@@ -234,6 +426,33 @@ class DailyStats(models.Model):
     def __str__(self):
         return f'{self.affiliate.affiliate_code} - {self.date}'
     
+    @staticmethod
+    def add_commission_matured(target_date, amounts):
+        """
+        Add matured amounts ({affiliate_id: Decimal}) onto one day's rows.
+        
+        Lets a maturation run show up on the dashboard before the nightly
+        aggregate_daily_stats rewrites the day from source rows.
+        """
+        from django.db import transaction
+        from django.db.models import F
+        
+        with transaction.atomic():
+            existing = set(
+                DailyStats.objects.filter(date=target_date, affiliate_id__in=amounts)
+                .values_list('affiliate_id', flat=True)
+            )
+            for affiliate_id in existing:
+                DailyStats.objects.filter(date=target_date, affiliate_id=affiliate_id).update(
+                    commission_matured=F('commission_matured') + amounts[affiliate_id],
+                    updated_at=timezone.now()
+                )
+            DailyStats.objects.bulk_create([
+                DailyStats(affiliate_id=affiliate_id, date=target_date, commission_matured=amount)
+                for affiliate_id, amount in amounts.items()
+                if affiliate_id not in existing
+            ])
+    
     @staticmethod
     def get_stats_for_period(affiliate_id, start_date, end_date):
         """
@@ -264,3 +483,173 @@ class DailyStats(models.Model):
             stats['conversion_rate'] = 0
         
         return stats
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Precomputed affiliate dashboard document.
+    
+    Counters and the latest clicks/referrals, kept up to date by the events
+    that change them: click batches add to the click counter, registrations
+    add leads, and referral, commission or order changes refresh the referral
+    section after commit. Commission totals come from AffiliateBalance, so
+    the dashboard is one read. A missing snapshot is built from source rows
+    on first access; `rebuild_dashboards` repairs any drift.
+    """
+    
+    RECENT_ITEMS = 5
+    
+    affiliate = models.OneToOneField(
+        Affiliate,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='dashboard_snapshot'
+    )
+    
+    total_clicks = models.PositiveBigIntegerField(default=0)
+    total_leads = models.PositiveIntegerField(default=0)
+    total_referrals = models.PositiveIntegerField(default=0)
+    
+    # Serialized with ReferralClickSerializer / ReferralSerializer, newest first
+    recent_clicks = models.JSONField(default=list)
+    recent_referrals = models.JSONField(default=list)
+    
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'affiliate_dashboard_snapshots'
+    
+    def __str__(self):
+        return f"Dashboard {self.affiliate_id} ({self.updated_at:%Y-%m-%d %H:%M:%S})"
+    
+    @classmethod
+    def compute_from_source(cls, affiliate_id):
+        """Compute every snapshot field from source rows."""
+        from .serializers import ReferralClickSerializer
+        from apps.users.models import User
+        
+        recent_clicks = ReferralClick.objects.filter(affiliate_id=affiliate_id).order_by('-created_at', '-id')
+        return {
+            'total_clicks': ReferralClick.count_for_affiliate(affiliate_id),
+            'total_leads': User.objects.filter(referred_by_id=affiliate_id).count(),
+            'recent_clicks': ReferralClickSerializer(recent_clicks[:cls.RECENT_ITEMS], many=True).data,
+            **cls._compute_referrals(affiliate_id),
+        }
+    
+    @classmethod
+    def rebuild(cls, affiliate_ids):
+        """Overwrite snapshots for the given affiliates from source rows."""
+        for affiliate_id in affiliate_ids:
+            cls.objects.update_or_create(
+                affiliate_id=affiliate_id,
+                defaults={**cls.compute_from_source(affiliate_id), 'updated_at': timezone.now()}
+            )
+    
+    @classmethod
+    def get_for_affiliate(cls, affiliate_id):
+        """Get the snapshot, building it from source rows if missing."""
+        try:
+            return cls.objects.get(pk=affiliate_id)
+        except cls.DoesNotExist:
+            cls.rebuild([affiliate_id])
+            return cls.objects.get(pk=affiliate_id)
+    
+    @classmethod
+    def add_clicks(cls, clicks):
+        """
+        Count a written batch of ReferralClick rows and merge them into the
+        recent clicks of each affiliate.
+        """
+        from .serializers import ReferralClickSerializer
+        
+        by_affiliate = {}
+        for click in clicks:
+            by_affiliate.setdefault(click.affiliate_id, []).append(click)
+        
+        for affiliate_id, new_clicks in by_affiliate.items():
+            with transaction.atomic():
+                snapshot = cls.objects.select_for_update().filter(pk=affiliate_id).first()
+                if snapshot is None:
+                    # Built from source rows (including this batch) on first read
+                    continue
+                
+                if all(click.pk for click in new_clicks):
+                    newest = sorted(new_clicks, key=lambda click: (click.created_at, click.pk), reverse=True)
+                    recent = ReferralClickSerializer(newest[:cls.RECENT_ITEMS], many=True).data
+                    recent = sorted(
+                        recent + [item for item in snapshot.recent_clicks if item['id'] not in {c['id'] for c in recent}],
+                        key=lambda item: (item['created_at'], item['id']),
+                        reverse=True
+                    )[:cls.RECENT_ITEMS]
+                else:
+                    # Backend did not return primary keys: read the latest rows back
+                    latest = ReferralClick.objects.filter(affiliate_id=affiliate_id).order_by('-created_at', '-id')
+                    recent = ReferralClickSerializer(latest[:cls.RECENT_ITEMS], many=True).data
+                
+                cls.objects.filter(pk=affiliate_id).update(
+                    total_clicks=F('total_clicks') + len(new_clicks),
+                    recent_clicks=recent,
+                    updated_at=timezone.now()
+                )
+    
+    @classmethod
+    def add_leads(cls, affiliate_id, count=1):
+        cls.objects.filter(pk=affiliate_id).update(
+            total_leads=F('total_leads') + count,
+            updated_at=timezone.now()
+        )
+    
+    @classmethod
+    def schedule_referral_refresh(cls, affiliate_ids):
+        """Refresh the referral section of these affiliates after the current transaction commits."""
+        affiliate_ids = {affiliate_id for affiliate_id in affiliate_ids if affiliate_id}
+        if affiliate_ids:
+            transaction.on_commit(lambda: cls.refresh_referrals(affiliate_ids))
+    
+    @classmethod
+    def refresh_referrals(cls, affiliate_ids):
+        """Recompute referral count and recent referrals (two indexed queries per affiliate)."""
+        for affiliate_id in affiliate_ids:
+            if cls.objects.filter(pk=affiliate_id).exists():
+                cls.objects.filter(pk=affiliate_id).update(
+                    **cls._compute_referrals(affiliate_id),
+                    updated_at=timezone.now()
+                )
+    
+    @classmethod
+    def _compute_referrals(cls, affiliate_id):
+        from .serializers import ReferralSerializer
+        
+        referrals = Referral.objects.filter(affiliate_id=affiliate_id)
+        recent = (
+            referrals.select_related('order', 'order__product', 'commission')
+            .order_by('-created_at', '-id')[:cls.RECENT_ITEMS]
+        )
+        return {
+            'total_referrals': referrals.count(),
+            'recent_referrals': ReferralSerializer(recent, many=True).data,
+        }
+
+
+# Cascades and queryset .delete() never call Model.delete(), so the live
+# counters are adjusted here. incr_on_commit drops the deltas if the delete
+# rolls back. The commission of a referral has its own receiver
+# (apps.commissions.models).
+@receiver(pre_delete, sender=Referral)
+def release_referral_counters(sender, instance, **kwargs):
+    from apps.core.counters import counters, CONVERSIONS
+    
+    # Deferred fields can still be loaded: the row is not deleted yet
+    affiliate_id = instance.affiliate_id
+    DashboardSnapshot.schedule_referral_refresh([affiliate_id])
+    counters.incr_on_commit(counters.add({}, CONVERSIONS, -1, affiliate_id))
+
+
+@receiver(pre_delete, sender=Affiliate)
+def release_affiliate_clicks(sender, instance, **kwargs):
+    from apps.core.counters import counters, CLICKS
+    
+    # Raw clicks and rollups go with the affiliate (and so do its own
+    # counter rows): take them off the site-wide total
+    clicks = ReferralClick.count_for_affiliate(instance.pk)
+    counters.incr_on_commit({(CLICKS, None): -clicks})
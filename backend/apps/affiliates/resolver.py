@@ -0,0 +1,102 @@
+"""
+Process-local affiliate code resolution cache.
+
+Maps affiliate_code -> ResolvedAffiliate for the hot redirect/attribution
+paths so a known code is resolved without touching the database. Entries
+are evicted LRU-first beyond AFFILIATE_CODE_CACHE_SIZE and expire after
+AFFILIATE_CODE_CACHE_TTL seconds, which bounds staleness in other worker
+processes. Affiliate.save()/delete() invalidate the code in this process.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+
+
+ResolvedAffiliate = namedtuple(
+    'ResolvedAffiliate',
+    ['id', 'user_id', 'status', 'custom_commission_rate']
+)
+
+
+class AffiliateCodeCache:
+    """LRU + TTL cache of affiliate_code -> ResolvedAffiliate (or None if unknown)."""
+    
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize or getattr(settings, 'AFFILIATE_CODE_CACHE_SIZE', 10000)
+        self.ttl = ttl or getattr(settings, 'AFFILIATE_CODE_CACHE_TTL', 60)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def resolve(self, code):
+        """
+        Resolve an affiliate code regardless of status.
+        
+        Returns:
+            ResolvedAffiliate or None if no affiliate has this code
+        """
+        if not code:
+            return None
+        
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(code)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        resolved = self._load(code)
+        
+        with self._lock:
+            self._entries[code] = (now + self.ttl, resolved)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return resolved
+    
+    def get_approved(self, code):
+        """Resolve a code, returning None unless the affiliate is approved."""
+        resolved = self.resolve(code)
+        if resolved is None or resolved.status != 'approved':
+            return None
+        return resolved
+    
+    def invalidate(self, code):
+        with self._lock:
+            self._entries.pop(code, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0,
+            }
+    
+    @staticmethod
+    def _load(code):
+        from .models import Affiliate
+        
+        row = (
+            Affiliate.objects.filter(affiliate_code=code)
+            .values_list('id', 'user_id', 'status', 'custom_commission_rate')
+            .first()
+        )
+        return ResolvedAffiliate(*row) if row else None
+
+
+# Singleton instance
+affiliate_code_cache = AffiliateCodeCache()
@@ -0,0 +1,361 @@
+"""
+Affiliate leaderboard and statistics time-series services.
+
+Rankings are computed in the database (ORDER BY metric LIMIT k) so serving
+a leaderboard costs a couple of queries regardless of affiliate count.
+Windowed rankings read pre-aggregated DailyStats; all-time rankings read
+the live counters (apps.core.counters). Results are cached until the
+TTL expires or the nightly aggregation calls LeaderboardService.invalidate().
+
+Time series read closed days from DailyStats and only the days the nightly
+job has not closed yet (normally just today) from raw rows, bucketed by
+day, week or month in the configured TIME_ZONE.
+"""
+
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, F, OuterRef, Subquery, Value, FloatField
+from django.db.models.functions import Coalesce, Cast, NullIf, TruncDate
+from django.utils import timezone
+
+from .models import Affiliate, ReferralClick, ClickRollup, Referral, DailyStats
+
+
+class LeaderboardService:
+    """Rank approved affiliates by a metric over a time window."""
+    
+    METRICS = ['earned', 'conversions', 'clicks', 'conversion_rate']
+    WINDOWS = {
+        '7': 7,
+        '30': 30,
+        '90': 90,
+        'all': None,
+    }
+    
+    CACHE_PREFIX = 'leaderboard'
+    CACHE_TIMEOUT = getattr(settings, 'LEADERBOARD_CACHE_TIMEOUT', 60 * 60)
+    
+    @classmethod
+    def get_leaderboard(cls, metric='earned', window='all', limit=10):
+        """
+        Get the top `limit` affiliates for a metric and window.
+        
+        Args:
+            metric: One of METRICS
+            window: One of WINDOWS keys ('7', '30', '90', 'all')
+            limit: Number of entries to return
+        
+        Returns:
+            dict: {'metric', 'window', 'top_performers', 'total_affiliates', 'generated_at'}
+        
+        Raises:
+            ValueError: If metric or window is not supported
+        """
+        if metric not in cls.METRICS:
+            raise ValueError(f'Invalid metric. Must be one of: {cls.METRICS}')
+        if window not in cls.WINDOWS:
+            raise ValueError(f'Invalid window. Must be one of: {list(cls.WINDOWS)}')
+        
+        key = cls._cache_key(metric, window, limit)
+        result = cache.get(key)
+        if result is None:
+            result = cls._compute(metric, window, limit)
+            cache.set(key, result, cls.CACHE_TIMEOUT)
+        return result
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop all cached leaderboards (called after the nightly aggregation)."""
+        version_key = f'{cls.CACHE_PREFIX}:version'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 2, None)
+    
+    @classmethod
+    def _cache_key(cls, metric, window, limit):
+        version = cache.get_or_set(f'{cls.CACHE_PREFIX}:version', 1, None)
+        return f'{cls.CACHE_PREFIX}:v{version}:{metric}:{window}:{limit}'
+    
+    @classmethod
+    def _compute(cls, metric, window, limit):
+        days = cls.WINDOWS[window]
+        if days is None:
+            rows = cls._rank_all_time(metric, limit)
+        else:
+            rows = cls._rank_from_daily_stats(metric, days, limit)
+            cls._add_window_commission_counts(rows, days)
+        
+        # Fetch display data for the top-k only
+        affiliates = Affiliate.objects.select_related('user').in_bulk([row['affiliate_id'] for row in rows])
+        
+        top_performers = []
+        for row in rows:
+            affiliate = affiliates[row['affiliate_id']]
+            clicks = row['clicks'] or 0
+            conversions = row['conversions'] or 0
+            top_performers.append({
+                'id': affiliate.id,
+                'name': affiliate.user.get_full_name(),
+                'email': affiliate.user.email,
+                'affiliate_code': affiliate.affiliate_code,
+                'total_earned': float(row['earned'] or 0),
+                'commissions_count': row['commissions'] or 0,
+                'referrals_count': conversions,
+                'clicks_count': clicks,
+                'conversion_rate': round((conversions / clicks * 100) if clicks > 0 else 0, 2),
+                'joined_date': affiliate.created_at.isoformat(),
+            })
+        
+        return {
+            'metric': metric,
+            'window': window,
+            'top_performers': top_performers,
+            'total_affiliates': Affiliate.objects.filter(status='approved').count(),
+            'generated_at': timezone.now().isoformat(),
+        }
+    
+    @staticmethod
+    def _conversion_rate_expression(conversions='conversions', clicks='clicks'):
+        return Coalesce(
+            Cast(F(conversions), FloatField()) * 100 / NullIf(Cast(F(clicks), FloatField()), Value(0.0)),
+            Value(0.0)
+        )
+    
+    @classmethod
+    def _rank_from_daily_stats(cls, metric, days, limit):
+        """Rank using DailyStats rows for the last `days` closed days."""
+        today = timezone.localdate()
+        rows = (
+            DailyStats.objects.filter(
+                affiliate__status='approved',
+                date__gte=today - timedelta(days=days),
+                date__lt=today
+            )
+            .order_by()
+            .values('affiliate_id')
+            .annotate(
+                earned=Sum('commission_earned'),
+                conversions=Sum('conversions'),
+                clicks=Sum('clicks'),
+            )
+            .annotate(conversion_rate=cls._conversion_rate_expression())
+            .order_by(F(metric).desc(nulls_last=True), 'affiliate_id')
+        )
+        return list(rows[:limit])
+    
+    @classmethod
+    def _add_window_commission_counts(cls, rows, days):
+        """
+        Set row['commissions'] for the ranked rows only.
+        
+        DailyStats has no commission count, so count commissions created in
+        the same closed days (one grouped query on the affiliate/created_at index).
+        """
+        from apps.commissions.models import Commission
+        
+        today = timezone.localdate()
+        counts = dict(
+            Commission.objects.filter(
+                affiliate_id__in=[row['affiliate_id'] for row in rows],
+                created_at__gte=timezone.make_aware(datetime.combine(today - timedelta(days=days), datetime.min.time())),
+                created_at__lt=timezone.make_aware(datetime.combine(today, datetime.min.time())),
+            )
+            .order_by()
+            .values('affiliate_id')
+            .annotate(total=Count('id'))
+            .values_list('affiliate_id', 'total')
+        )
+        for row in rows:
+            row['commissions'] = counts.get(row['affiliate_id'], 0)
+    
+    @classmethod
+    def _rank_all_time(cls, metric, limit):
+        """Rank on all-time totals from the live counters."""
+        from apps.core.counters import CLICKS, CONVERSIONS, COMMISSION_EARNED, COMMISSIONS
+        from apps.core.models import Counter
+        
+        def counter_value(name):
+            # One unique-index lookup per affiliate instead of aggregating the source tables
+            return Coalesce(
+                Subquery(Counter.objects.filter(name=name, affiliate_id=OuterRef('pk')).values('value')[:1]),
+                Value(0)
+            )
+        
+        # Annotation names must not clash with Affiliate's reverse relations
+        # (e.g. `clicks`), so rank on total_* and rename afterwards.
+        sort_fields = {
+            'earned': 'total_earned',
+            'conversions': 'total_conversions',
+            'clicks': 'total_clicks',
+            'conversion_rate': 'total_conversion_rate',
+        }
+        rows = (
+            Affiliate.objects.filter(status='approved')
+            .annotate(
+                total_earned=counter_value(COMMISSION_EARNED),
+                total_commissions=counter_value(COMMISSIONS),
+                total_conversions=counter_value(CONVERSIONS),
+                total_clicks=counter_value(CLICKS),
+            )
+            .annotate(total_conversion_rate=cls._conversion_rate_expression('total_conversions', 'total_clicks'))
+            .values('pk', 'total_commissions', *sort_fields.values())
+            .order_by(F(sort_fields[metric]).desc(), 'pk')
+        )
+        return [
+            {
+                'affiliate_id': row['pk'],
+                'earned': row['total_earned'],
+                'commissions': row['total_commissions'],
+                'conversions': row['total_conversions'],
+                'clicks': row['total_clicks'],
+                'conversion_rate': row['total_conversion_rate'],
+            }
+            for row in rows[:limit]
+        ]
+
+
+class StatsTimeSeriesService:
+    """
+    Per-affiliate click/conversion/referral series over a date window.
+    
+    'conversions' are confirmed referrals (DailyStats.conversions);
+    'referrals' counts every referral whatever its status, which DailyStats
+    does not store, so it comes from one grouped query on the
+    (affiliate, created_at) index.
+    """
+    
+    GRANULARITIES = ['day', 'week', 'month']
+    METRICS = ['clicks', 'conversions', 'referrals']
+    
+    @classmethod
+    def get_series(cls, affiliate_id, start_date, end_date=None, granularity='day'):
+        """
+        Get zero-filled click, conversion and referral counts per bucket.
+        
+        Costs one DailyStats query, the raw queries for open days and one
+        grouped referral query, so a 365-day window costs about the same as
+        a 7-day one.
+        
+        Args:
+            affiliate_id: Affiliate primary key
+            start_date: First local date of the window
+            end_date: Last local date of the window (default: today)
+            granularity: One of GRANULARITIES; weeks start on Monday
+        
+        Returns:
+            list: [{'date': bucket start date, 'clicks': n, 'conversions': n, 'referrals': n}, ...]
+        
+        Raises:
+            ValueError: If granularity is not supported
+        """
+        if granularity not in cls.GRANULARITIES:
+            raise ValueError(f'Invalid granularity. Must be one of: {cls.GRANULARITIES}')
+        
+        end_date = end_date or timezone.localdate()
+        daily = cls._get_daily_counts(affiliate_id, start_date, end_date)
+        for day, count in cls._get_referral_counts(affiliate_id, start_date, end_date):
+            daily.setdefault(day, dict.fromkeys(cls.METRICS, 0))['referrals'] = count
+        
+        buckets = {}
+        day = start_date
+        while day <= end_date:
+            bucket = buckets.setdefault(cls.bucket_start(day, granularity), dict.fromkeys(cls.METRICS, 0))
+            for metric, count in daily.get(day, {}).items():
+                bucket[metric] += count
+            day += timedelta(days=1)
+        
+        return [{'date': bucket, **counts} for bucket, counts in buckets.items()]
+    
+    @staticmethod
+    def bucket_start(day, granularity):
+        if granularity == 'week':
+            return day - timedelta(days=day.weekday())
+        if granularity == 'month':
+            return day.replace(day=1)
+        return day
+    
+    @classmethod
+    def _get_daily_counts(cls, affiliate_id, start_date, end_date):
+        """Return {date: {'clicks', 'conversions'}} for every day with activity."""
+        today = timezone.localdate()
+        
+        # A day is closed once the nightly job rewrote its row after it ended
+        daily = {}
+        for row in DailyStats.objects.filter(
+            affiliate_id=affiliate_id,
+            date__gte=start_date,
+            date__lte=min(end_date, today - timedelta(days=1))
+        ).values('date', 'clicks', 'conversions', 'updated_at'):
+            if row['updated_at'] >= cls._local_midnight(row['date'] + timedelta(days=1)):
+                daily[row['date']] = {'clicks': row['clicks'], 'conversions': row['conversions']}
+        
+        open_days = [
+            start_date + timedelta(days=offset)
+            for offset in range((min(end_date, today) - start_date).days + 1)
+            if start_date + timedelta(days=offset) not in daily
+        ]
+        if open_days:
+            daily.update(cls._get_raw_daily_counts(affiliate_id, open_days[0], open_days[-1], set(open_days)))
+        return daily
+    
+    @classmethod
+    def _get_raw_daily_counts(cls, affiliate_id, first_day, last_day, days):
+        """Count raw clicks (plus rollups) and confirmed referrals per local day, same rules as aggregate_daily_stats."""
+        start = cls._local_midnight(first_day)
+        end = cls._local_midnight(last_day + timedelta(days=1))
+        tzinfo = timezone.get_current_timezone()
+        
+        daily = {}
+        
+        def add(rows, metric):
+            for day, count in rows:
+                if day in days:
+                    counts = daily.setdefault(day, dict.fromkeys(cls.METRICS, 0))
+                    counts[metric] += count or 0
+        
+        def grouped(queryset, field, aggregate):
+            return (
+                queryset.order_by()
+                .annotate(day=TruncDate(field, tzinfo=tzinfo))
+                .values('day')
+                .annotate(total=aggregate)
+                .values_list('day', 'total')
+            )
+        
+        add(grouped(
+            ReferralClick.objects.filter(affiliate_id=affiliate_id, created_at__gte=start, created_at__lt=end),
+            'created_at', Count('id')
+        ), 'clicks')
+        add(grouped(
+            ClickRollup.objects.filter(affiliate_id=affiliate_id, hour__gte=start, hour__lt=end),
+            'hour', Sum('clicks')
+        ), 'clicks')
+        add(grouped(
+            Referral.objects.filter(
+                affiliate_id=affiliate_id, status='confirmed', created_at__gte=start, created_at__lt=end
+            ),
+            'created_at', Count('id')
+        ), 'conversions')
+        return daily
+    
+    @classmethod
+    def _get_referral_counts(cls, affiliate_id, start_date, end_date):
+        """Count referrals of any status per local day: [(date, count), ...]."""
+        return (
+            Referral.objects.filter(
+                affiliate_id=affiliate_id,
+                created_at__gte=cls._local_midnight(start_date),
+                created_at__lt=cls._local_midnight(end_date + timedelta(days=1)),
+            )
+            .order_by()
+            .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values('day')
+            .annotate(total=Count('id'))
+            .values_list('day', 'total')
+        )
+    
+    @staticmethod
+    def _local_midnight(day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
@@ -3,7 +3,8 @@ from .views import (
     AffiliateProfileView, AffiliateStatusView, AffiliateDashboardView,
     AffiliateReferralsView, ReferralLinkRedirectView, AffiliateStatisticsView,
     TrackClickAPIView,
-    AdminReferralListView, AdminReferralStatusUpdateView, AdminReferralReassignView
+    AdminReferralListView, AdminReferralExportView, AdminReferralStatusUpdateView, AdminReferralReassignView,
+    AdminClickPipelineStatsView
 )
 
 urlpatterns = [
@@ -16,8 +17,10 @@ urlpatterns = [
     
     # Admin Referral Management
     path('admin/referrals/', AdminReferralListView.as_view(), name='admin-referral-list'),
+    path('admin/referrals/export/', AdminReferralExportView.as_view(), name='admin-referral-export'),
     path('admin/referrals/<int:pk>/status/', AdminReferralStatusUpdateView.as_view(), name='admin-referral-status'),
     path('admin/referrals/<int:pk>/reassign/', AdminReferralReassignView.as_view(), name='admin-referral-reassign'),
+    path('admin/click-pipeline/', AdminClickPipelineStatsView.as_view(), name='admin-click-pipeline'),
 ]
 
 # This should be added to main urls.py at root level for /r/{code}/
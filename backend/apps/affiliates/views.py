@@ -8,13 +8,18 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Sum, Q
 
-from .models import Affiliate, ReferralClick, Referral
+from apps.core.exports import StreamingExportMixin
+from apps.core.pagination import KeysetPagination
+from apps.commissions.models import AffiliateBalance
+from .models import Affiliate, DashboardSnapshot, ReferralClick, Referral
+from .ingestion import click_pipeline
+from .resolver import affiliate_code_cache
+from .services import StatsTimeSeriesService
 from .serializers import (
     AffiliateSerializer, AffiliateStatusSerializer, 
     AffiliateProfileUpdateSerializer, AffiliateDashboardSerializer,
-    ReferralSerializer, ReferralClickSerializer
+    ReferralSerializer
 )
 
 
@@ -64,49 +69,42 @@ class AffiliateDashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        # One read: affiliate + dashboard snapshot + balance snapshot
         try:
-            affiliate = Affiliate.objects.get(user=request.user)
+            affiliate = Affiliate.objects.select_related('dashboard_snapshot', 'balance').get(user=request.user)
         except Affiliate.DoesNotExist:
             return Response({'error': 'No affiliate profile'}, status=status.HTTP_404_NOT_FOUND)
         
         if affiliate.status != 'approved':
             return Response({'error': 'Affiliate not approved'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get stats with optimized queries
-        total_clicks = affiliate.clicks.count()
-        total_referrals = affiliate.referrals.count()
-        
-        # Get real commission data
-        from apps.commissions.models import Commission
-        
-        # Get real commission data
-        from apps.commissions.models import Commission
-        
-        commission_summary = Commission.get_affiliate_summary(affiliate.id)
-        pending_commission = commission_summary.get('pending', 0)
-        available_commission = commission_summary.get('available', 0)
-        total_commission = commission_summary.get('total', 0)
-        total_paid = commission_summary.get('paid', 0)
-        
-        # Count Leads (Referred Users)
-        total_leads = affiliate.referred_users.count()
+        # Fall back to building the snapshots from source rows if missing
+        try:
+            snapshot = affiliate.dashboard_snapshot
+        except DashboardSnapshot.DoesNotExist:
+            snapshot = DashboardSnapshot.get_for_affiliate(affiliate.id)
+        try:
+            balance = affiliate.balance
+        except AffiliateBalance.DoesNotExist:
+            balance = AffiliateBalance.get_for_affiliate(affiliate.id)
         
-        # Recent data with select_related for performance
-        recent_clicks = affiliate.clicks.select_related('affiliate').order_by('-created_at')[:5]
-        recent_referrals = affiliate.referrals.select_related('order', 'order__product').order_by('-created_at')[:5]
+        commission_summary = balance.as_summary()
+        total_clicks = snapshot.total_clicks
+        total_referrals = snapshot.total_referrals
         
         data = {
-            'total_clicks': affiliate.clicks.count(),
-            'total_leads': total_leads,
-            'total_referrals': affiliate.referrals.count(),
-            'pending_commission': float(pending_commission),
-            'available_commission': float(available_commission),
-            'total_commission': float(total_commission),
-            'total_paid': float(total_paid),
+            'total_clicks': total_clicks,
+            'total_leads': snapshot.total_leads,
+            'total_referrals': total_referrals,
+            'pending_commission': float(commission_summary['pending']),
+            'available_commission': float(commission_summary['available']),
+            'total_commission': float(commission_summary['total']),
+            'total_paid': float(commission_summary['paid']),
             'conversion_rate': round((total_referrals / total_clicks * 100) if total_clicks > 0 else 0, 2),
-            'recent_clicks': ReferralClickSerializer(recent_clicks, many=True).data,
-            'recent_referrals': ReferralSerializer(recent_referrals, many=True).data,
+            'recent_clicks': snapshot.recent_clicks,
+            'recent_referrals': snapshot.recent_referrals,
             'affiliate_code': affiliate.affiliate_code,
+            'snapshot_at': max(snapshot.updated_at, balance.updated_at).isoformat(),
         }
         
         return Response(data)
@@ -117,6 +115,7 @@ class AffiliateReferralsView(generics.ListAPIView):
     
     permission_classes = [IsAuthenticated]
     serializer_class = ReferralSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         try:
@@ -138,15 +137,14 @@ class ReferralLinkRedirectView(APIView):
     def get(self, request, code):
         from django.conf import settings
         
-        try:
-            affiliate = Affiliate.objects.get(affiliate_code=code, status='approved')
-        except Affiliate.DoesNotExist:
+        affiliate = affiliate_code_cache.get_approved(code)
+        if affiliate is None:
             # Redirect to homepage if invalid code
             return redirect(self._get_frontend_url(request))
         
-        # Record click
-        ReferralClick.objects.create(
-            affiliate=affiliate,
+        # Record click (buffered, written in batches by the click pipeline)
+        click_pipeline.record(
+            affiliate_id=affiliate.id,
             ip_address=self._get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
             referer_url=request.META.get('HTTP_REFERER', '')[:500],
@@ -207,38 +205,34 @@ class AffiliateStatisticsView(APIView):
         # Get period from query params (default: last 30 days)
         period = request.query_params.get('period', '30')
         try:
-            days = int(period)
+            days = min(max(int(period), 1), 366)
         except ValueError:
             days = 30
         
-        start_date = timezone.now() - timezone.timedelta(days=days)
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in StatsTimeSeriesService.GRANULARITIES:
+            return Response(
+                {'error': f'Invalid granularity. Must be one of: {StatsTimeSeriesService.GRANULARITIES}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Clicks over period
-        clicks_by_day = (
-            affiliate.clicks
-            .filter(created_at__gte=start_date)
-            .extra({'date': 'DATE(created_at)'})
-            .values('date')
-            .annotate(count=Count('id'))
-            .order_by('date')
-        )
-        
-        # Referrals over period
-        referrals_by_day = (
-            affiliate.referrals
-            .filter(created_at__gte=start_date)
-            .extra({'date': 'DATE(created_at)'})
-            .values('date')
-            .annotate(count=Count('id'))
-            .order_by('date')
-        )
+        # Local (TIME_ZONE) days, today included
+        end_date = timezone.localdate()
+        start_date = end_date - timezone.timedelta(days=days - 1)
+        series = StatsTimeSeriesService.get_series(affiliate.id, start_date, end_date, granularity)
         
         return Response({
             'period_days': days,
-            'total_clicks': affiliate.clicks.filter(created_at__gte=start_date).count(),
-            'total_referrals': affiliate.referrals.filter(created_at__gte=start_date).count(),
-            'clicks_by_day': list(clicks_by_day),
-            'referrals_by_day': list(referrals_by_day),
+            'granularity': granularity,
+            'timezone': timezone.get_current_timezone_name(),
+            'total_clicks': sum(bucket['clicks'] for bucket in series),
+            # Every referral, whatever its status (as before DailyStats)
+            'total_referrals': sum(bucket['referrals'] for bucket in series),
+            # Confirmed referrals only (DailyStats.conversions)
+            'total_conversions': sum(bucket['conversions'] for bucket in series),
+            'clicks_by_day': [{'date': bucket['date'], 'count': bucket['clicks']} for bucket in series],
+            'referrals_by_day': [{'date': bucket['date'], 'count': bucket['referrals']} for bucket in series],
+            'conversions_by_day': [{'date': bucket['date'], 'count': bucket['conversions']} for bucket in series],
         })
 
 
@@ -259,14 +253,13 @@ class TrackClickAPIView(APIView):
         if not code:
             return Response({'error': 'Code required'}, status=400)
             
-        try:
-            affiliate = Affiliate.objects.get(affiliate_code=code, status='approved')
-        except Affiliate.DoesNotExist:
+        affiliate = affiliate_code_cache.get_approved(code)
+        if affiliate is None:
             return Response({'error': 'Invalid code'}, status=404)
             
-        # Record click
-        ReferralClick.objects.create(
-            affiliate=affiliate,
+        # Record click (buffered, written in batches by the click pipeline)
+        click_pipeline.record(
+            affiliate_id=affiliate.id,
             ip_address=self._get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
             referer_url=request.META.get('HTTP_REFERER', '')[:500],
@@ -293,6 +286,7 @@ class AdminReferralListView(generics.ListAPIView):
     
     permission_classes = [IsAdminUser]
     serializer_class = AdminReferralSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = Referral.objects.all().select_related(
@@ -312,6 +306,30 @@ class AdminReferralListView(generics.ListAPIView):
         return queryset
 
 
+class AdminReferralExportView(StreamingExportMixin, AdminReferralListView):
+    """
+    Admin: Stream all referrals matching the list filters as CSV or XLSX.
+    
+    Query params: status, affiliate_id (as the list), type=csv|xlsx
+    """
+    
+    export_filename = 'referrals'
+    export_columns = [
+        ('Referral ID', 'id'),
+        ('Created At', 'created_at'),
+        ('Status', 'status'),
+        ('Affiliate Code', 'affiliate__affiliate_code'),
+        ('Affiliate Email', 'affiliate__user__email'),
+        ('Order Number', 'order__order_number'),
+        ('Order Status', 'order__status'),
+        ('Order Amount', 'order__final_amount'),
+        ('Product', 'order__product__name'),
+        ('Customer Email', 'customer__email'),
+        ('Commission', 'commission__amount'),
+        ('Commission Status', 'commission__status'),
+    ]
+
+
 class AdminReferralStatusUpdateView(APIView):
     """Admin: Update referral status."""
     
@@ -364,3 +382,15 @@ class AdminReferralReassignView(APIView):
             'message': f'Referral reassigned from {old_affiliate.affiliate_code} to {new_affiliate.affiliate_code}',
             'referral': AdminReferralSerializer(referral).data
         })
+
+
+class AdminClickPipelineStatsView(APIView):
+    """Admin: Click ingestion pipeline and code cache counters for this process."""
+    
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response({
+            **click_pipeline.get_metrics(),
+            'code_cache': affiliate_code_cache.get_metrics(),
+        })
@@ -1,6 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils import timezone
-from .models import Commission, BankAccount, Payout, Coupon
+from .models import Commission, CommissionAttribution, AffiliateBalance, MaturationRun, BankAccount, Payout, PayoutBatch, Coupon
 
 
 @admin.register(Commission)
@@ -8,12 +8,12 @@ class CommissionAdmin(admin.ModelAdmin):
     list_display = ('affiliate', 'order', 'amount', 'commission_rate', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('affiliate__affiliate_code', 'order__order_number')
-    readonly_fields = ('affiliate', 'referral', 'order', 'order_amount', 'commission_rate', 'amount', 'created_at', 'updated_at', 'matured_at', 'voided_at')
+    readonly_fields = ('affiliate', 'referral', 'order', 'order_amount', 'commission_rate', 'amount', 'paid_amount', 'created_at', 'updated_at', 'mature_at', 'matured_at', 'voided_at')
     ordering = ('-created_at',)
     
     fieldsets = (
         ('Commission Info', {'fields': ('affiliate', 'referral', 'order')}),
-        ('Amount', {'fields': ('order_amount', 'commission_rate', 'amount')}),
+        ('Amount', {'fields': ('order_amount', 'commission_rate', 'amount', 'paid_amount')}),
         ('Status', {'fields': ('status', 'payout')}),
         ('Voiding', {'fields': ('voided_at', 'voided_reason')}),
         ('Maturation', {'fields': ('matured_at',)}),
@@ -31,6 +31,28 @@ class CommissionAdmin(admin.ModelAdmin):
         self.message_user(request, f'{count} commissions voided.')
 
 
+@admin.register(CommissionAttribution)
+class CommissionAttributionAdmin(admin.ModelAdmin):
+    list_display = ('key', 'event', 'outcome', 'commission', 'created_at')
+    list_filter = ('event', 'outcome')
+    search_fields = ('key', 'order__order_number')
+    readonly_fields = ('key', 'order', 'event', 'outcome', 'detail', 'commission', 'created_at')
+
+
+@admin.register(AffiliateBalance)
+class AffiliateBalanceAdmin(admin.ModelAdmin):
+    list_display = ('affiliate', 'pending', 'available', 'paid', 'reserved', 'withdrawable', 'version', 'updated_at')
+    search_fields = ('affiliate__affiliate_code',)
+    readonly_fields = ('affiliate', 'pending', 'available', 'paid', 'reserved', 'withdrawable', 'version', 'updated_at')
+
+
+@admin.register(MaturationRun)
+class MaturationRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'cutoff', 'matured_count', 'matured_amount', 'batches', 'daily_stats_applied', 'started_at', 'finished_at')
+    list_filter = ('status', 'daily_stats_applied')
+    readonly_fields = ('status', 'cutoff', 'batch_size', 'batches', 'matured_count', 'matured_amount', 'affiliate_deltas', 'daily_stats_applied', 'error', 'started_at', 'finished_at')
+
+
 @admin.register(BankAccount)
 class BankAccountAdmin(admin.ModelAdmin):
     list_display = ('affiliate', 'bank_name', 'account_holder', 'verification_status', 'is_primary')
@@ -86,21 +108,34 @@ class PayoutAdmin(admin.ModelAdmin):
     
     @admin.action(description='Mark selected payouts as paid')
     def mark_as_paid(self, request, queryset):
-        from .models import Commission
-        count = 0
-        for payout in queryset.filter(status='processing'):
-            payout.status = 'paid'
-            payout.transfer_date = timezone.now()
-            payout.save()
-            count += 1
-        self.message_user(request, f'{count} payouts marked as paid.')
+        from .services import PayoutBatchService
+        outcomes = {
+            payout_id: ('paid', transfer_reference, '')
+            for payout_id, transfer_reference in queryset.filter(status='processing').values_list('id', 'transfer_reference')
+        }
+        # Also marks the payouts' commissions paid
+        result = PayoutBatchService.settle(outcomes)
+        for error in result['errors']:
+            self.message_user(request, error, level=messages.ERROR)
+        self.message_user(request, f'{len(result["paid"])} payouts marked as paid.')
     
     @admin.action(description='Reject selected payouts')
     def reject_payouts(self, request, queryset):
-        count = queryset.filter(status='pending').update(status='rejected')
+        pending = queryset.filter(status='pending')
+        affiliate_ids = set(pending.values_list('affiliate_id', flat=True))
+        count = pending.update(status='rejected')
+        # Bulk update bypasses save(), so release the reserved amounts here
+        AffiliateBalance.rebuild(affiliate_ids)
         self.message_user(request, f'{count} payouts rejected.')
 
 
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ('reference', 'status', 'payout_count', 'total_amount', 'paid_count', 'failed_count', 'created_by', 'created_at', 'completed_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'payout_count', 'total_amount', 'bank_totals', 'paid_count', 'paid_amount', 'failed_count', 'created_by', 'created_at', 'completed_at')
+
+
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
     list_display = ('code', 'affiliate', 'discount_type', 'discount_value', 'usage_count', 'usage_limit', 'is_active', 'valid_until')
@@ -0,0 +1,75 @@
+"""
+Django management command to lock pending payouts into a bulk-transfer batch.
+
+Every pending payout with a verified bank account is moved to 'processing'
+in one transaction (see PayoutBatchService) and one CSV transfer file per
+bank is written to --output-dir. Settle the batch with the bank's response
+file via `ingest_payout_response`.
+
+Usage:
+    python manage.py create_payout_batch
+    python manage.py create_payout_batch --dry-run
+    python manage.py create_payout_batch --limit=2000 --output-dir=/srv/payouts
+"""
+
+import os
+from django.core.management.base import BaseCommand
+from apps.commissions.services import PayoutBatchService
+
+
+class Command(BaseCommand):
+    help = 'Lock pending payouts into a batch and write bank transfer files'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum payouts in the batch, oldest first (default: all)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default='.',
+            help='Directory for the transfer files (default: current directory)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be batched without locking anything'
+        )
+    
+    def handle(self, *args, **options):
+        count, total_amount = PayoutBatchService.preview()
+        
+        if count == 0:
+            self.stdout.write(self.style.WARNING('No pending payouts with a verified bank account'))
+            return
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\n=== DRY RUN MODE ==='))
+            self.stdout.write(f'Would batch {count} payouts')
+            self.stdout.write(f'Total amount: Rp {total_amount:,.0f}')
+            return
+        
+        batch, skipped = PayoutBatchService.create_batch(limit=options['limit'])
+        for payout_id, reason in skipped:
+            self.stdout.write(self.style.WARNING(f'  ⚠ Payout #{payout_id} left pending: {reason}'))
+        if batch is None:
+            self.stdout.write(self.style.ERROR('❌ Nothing could be batched'))
+            return
+        
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for filename, content in PayoutBatchService.build_transfer_files(batch).items():
+            path = os.path.join(options['output_dir'], filename)
+            with open(path, 'wb') as transfer_file:
+                transfer_file.write(content)
+            self.stdout.write(f'   📄 {path}')
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✓ Batch {batch.reference} (#{batch.id}): {batch.payout_count} payouts, '
+                f'Rp {batch.total_amount:,.0f}'
+            )
+        )
+        for bank, entry in batch.bank_totals.items():
+            self.stdout.write(f'  - {bank}: {entry["count"]} payouts, Rp {int(entry["amount"]):,}')
@@ -0,0 +1,46 @@
+"""
+Django management command to settle a payout batch from the bank's response file.
+
+The CSV needs `reference` and `status` columns (optionally
+`transfer_reference` and `message`); successful lines mark payouts and
+their commissions paid, failed lines release the commissions.
+
+Usage:
+    python manage.py ingest_payout_response 12 response.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.commissions.models import PayoutBatch
+from apps.commissions.services import PayoutBatchService
+
+
+class Command(BaseCommand):
+    help = 'Mark a payout batch paid/failed from a bank response file'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('batch_id', type=int, help='PayoutBatch id')
+        parser.add_argument('file', help='Bank response CSV')
+    
+    def handle(self, *args, **options):
+        try:
+            batch = PayoutBatch.objects.get(pk=options['batch_id'])
+        except PayoutBatch.DoesNotExist:
+            raise CommandError(f'Payout batch {options["batch_id"]} does not exist')
+        
+        with open(options['file'], 'rb') as response_file:
+            result = PayoutBatchService.ingest_response(batch, response_file.read())
+        
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f'  ⚠ {error}'))
+        
+        batch.refresh_from_db()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✓ {len(result["paid"])} paid, {len(result["failed"])} failed, '
+                f'{len(result["ignored"])} already settled'
+            )
+        )
+        self.stdout.write(
+            f'Batch {batch.reference}: {batch.status} '
+            f'({batch.paid_count}/{batch.payout_count} paid, Rp {batch.paid_amount:,.0f})'
+        )
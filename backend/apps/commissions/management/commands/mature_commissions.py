@@ -1,17 +1,26 @@
 """
 Django management command to mature pending commissions after 30-day holding period.
 
+Rows are matured set-based in keyset-paginated chunks (see MaturationService);
+each run is recorded as a MaturationRun with per-affiliate deltas. In normal
+operation `run_scheduler` matures commissions at their mature_at; this command
+is a catch-up for rows selected by age.
+
 Usage:
     python manage.py mature_commissions
+    python manage.py mature_commissions --dry-run
+    python manage.py mature_commissions --batch-size=5000
     
-Schedule with cron:
+Optional cron safety net:
     0 0 * * * cd /path/to/backend && python manage.py mature_commissions
 """
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from apps.commissions.models import Commission
+from decimal import Decimal
+from apps.affiliates.models import Affiliate
+from apps.commissions.services import MaturationService
 
 
 class Command(BaseCommand):
@@ -24,6 +33,12 @@ class Command(BaseCommand):
             default=30,
             help='Minimum days before maturation (default: 30)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MaturationService.DEFAULT_BATCH_SIZE,
+            help=f'Commissions matured per transaction (default: {MaturationService.DEFAULT_BATCH_SIZE})'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -36,17 +51,8 @@ class Command(BaseCommand):
         
         cutoff_date = timezone.now() - timedelta(days=days)
         
-        # Get pending commissions older than specified days
-        # Only mature if order is not cancelled/refunded
-        mature_commissions = Commission.objects.filter(
-            status='pending',
-            created_at__lte=cutoff_date
-        ).exclude(
-            order__status__in=['cancelled', 'refunded']
-        ).select_related('affiliate', 'order')
-        
-        count = mature_commissions.count()
-        total_amount = sum(c.amount for c in mature_commissions)
+        # Pending commissions older than specified days whose order is not cancelled/refunded
+        count, total_amount = MaturationService.preview(cutoff_date)
         
         if count == 0:
             self.stdout.write(self.style.WARNING('No commissions ready for maturation'))
@@ -57,7 +63,8 @@ class Command(BaseCommand):
             self.stdout.write(f'Would mature {count} commissions')
             self.stdout.write(f'Total amount: Rp {total_amount:,.0f}')
             self.stdout.write('\nCommissions that would be matured:')
-            for commission in mature_commissions[:10]:  # Show first 10
+            sample = MaturationService.get_eligible(cutoff_date).select_related('affiliate').order_by('id')[:10]
+            for commission in sample:  # Show first 10
                 self.stdout.write(
                     f'  - Commission #{commission.id}: '
                     f'Affiliate {commission.affiliate.affiliate_code}, '
@@ -66,36 +73,35 @@ class Command(BaseCommand):
                 )
             if count > 10:
                 self.stdout.write(f'  ... and {count - 10} more')
-        else:
-            # Actually mature the commissions
-            now = timezone.now()
-            matured = 0
-            
-            for commission in mature_commissions:
-                commission.status = 'available'
-                commission.matured_at = now
-                commission.save(update_fields=['status', 'matured_at', 'updated_at'])
-                matured += 1
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'\n✓ Successfully matured {matured} commissions '
-                    f'(Total: Rp {total_amount:,.0f})'
-                )
+            return
+        
+        def report(run):
+            self.stdout.write(f'   Batch {run.batches}: {run.matured_count}/{count} matured')
+        
+        run = MaturationService.run(cutoff_date, batch_size=options['batch_size'], progress=report)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✓ Successfully matured {run.matured_count} commissions '
+                f'(Total: Rp {run.matured_amount:,.0f}, run #{run.id})'
             )
-            
-            # Group by affiliate for summary
-            from django.db.models import Sum
-            affiliate_summary = mature_commissions.values('affiliate__affiliate_code').annotate(
-                total=Sum('amount'),
-                count=models.Count('id')
-            ).order_by('-total')[:5]
-            
-            if affiliate_summary:
-                self.stdout.write('\nTop 5 affiliates:')
-                for item in affiliate_summary:
-                    self.stdout.write(
-                        f'  - {item["affiliate__affiliate_code"]}: '
-                        f'{item["count"]} commissions, '
-                        f'Rp {item["total"]:,.0f}'
-                    )
+        )
+        
+        # Top affiliates straight from the run's per-affiliate deltas
+        top = sorted(
+            run.affiliate_deltas.items(),
+            key=lambda item: Decimal(item[1]['amount']),
+            reverse=True
+        )[:5]
+        if top:
+            codes = dict(
+                Affiliate.objects.filter(id__in=[int(key) for key, _ in top])
+                .values_list('id', 'affiliate_code')
+            )
+            self.stdout.write('\nTop 5 affiliates:')
+            for affiliate_id, entry in top:
+                self.stdout.write(
+                    f'  - {codes.get(int(affiliate_id), affiliate_id)}: '
+                    f'{entry["count"]} commissions, '
+                    f'Rp {Decimal(entry["amount"]):,.0f}'
+                )
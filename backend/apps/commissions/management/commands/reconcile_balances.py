@@ -0,0 +1,90 @@
+"""
+Django management command to reconcile affiliate balance snapshots.
+
+Recomputes AffiliateBalance from commission and payout rows, reports any
+drift and rewrites the drifted snapshots.
+
+Usage:
+    python manage.py reconcile_balances
+    python manage.py reconcile_balances --dry-run
+    python manage.py reconcile_balances --affiliate=AbC1234
+
+Schedule with cron:
+    30 0 * * * cd /path/to/backend && python manage.py reconcile_balances
+"""
+
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from apps.affiliates.models import Affiliate
+from apps.commissions.models import AffiliateBalance
+
+
+BALANCE_FIELDS = ['pending', 'available', 'paid', 'reserved', 'withdrawable']
+
+
+class Command(BaseCommand):
+    help = 'Recompute affiliate balance snapshots from source rows and report drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--affiliate',
+            type=str,
+            help='Reconcile a specific affiliate code only'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without rewriting snapshots'
+        )
+    
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        
+        affiliates = Affiliate.objects.all()
+        if options.get('affiliate'):
+            affiliates = affiliates.filter(affiliate_code=options['affiliate'])
+            if not affiliates.exists():
+                self.stdout.write(self.style.ERROR(f'Affiliate {options["affiliate"]} not found'))
+                return
+        affiliate_ids = list(affiliates.values_list('id', flat=True))
+        
+        expected = AffiliateBalance.compute_from_source(affiliate_ids)
+        snapshots = {
+            balance.affiliate_id: balance
+            for balance in AffiliateBalance.objects.filter(affiliate_id__in=affiliate_ids)
+        }
+        
+        drifted = []
+        for affiliate_id, values in expected.items():
+            snapshot = snapshots.get(affiliate_id)
+            if snapshot is None:
+                drifted.append(affiliate_id)
+                self.stdout.write(f'  - Affiliate #{affiliate_id}: missing snapshot')
+                continue
+            
+            diffs = [
+                f'{field} {getattr(snapshot, field):,.0f} -> {values[field]:,.0f}'
+                for field in BALANCE_FIELDS
+                if Decimal(getattr(snapshot, field)) != values[field]
+            ]
+            if diffs:
+                drifted.append(affiliate_id)
+                self.stdout.write(f'  - Affiliate #{affiliate_id}: ' + ', '.join(diffs))
+        
+        if not drifted:
+            self.stdout.write(
+                self.style.SUCCESS(f'✓ {len(expected)} balances checked, no drift')
+            )
+            return
+        
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'\n=== DRY RUN MODE ==='))
+            self.stdout.write(f'{len(drifted)} of {len(expected)} balances drifted')
+            return
+        
+        AffiliateBalance.rebuild(drifted)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✓ Rebuilt {len(drifted)} of {len(expected)} balances'
+            )
+        )
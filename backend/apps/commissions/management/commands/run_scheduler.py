@@ -0,0 +1,104 @@
+"""
+Django management command that runs the commission lifecycle scheduler.
+
+Long-running worker: each tick voids commissions whose order was cancelled
+or refunded since the previous tick, matures the commissions whose
+mature_at has passed, then sleeps until the next mature_at (at most
+SCHEDULER_MAX_SLEEP seconds, so cancellations are picked up promptly).
+
+Usage:
+    python manage.py run_scheduler
+    python manage.py run_scheduler --once
+    python manage.py run_scheduler --max-sleep=2
+
+Run under a process supervisor (systemd, supervisord) instead of cron;
+mature_commissions remains available for manual catch-up runs.
+"""
+
+import signal
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.commissions.services import CommissionLifecycleService, MaturationService
+
+
+# Re-scan orders updated slightly before the previous tick, in case a
+# transaction committed after we looked. Voiding is idempotent.
+VOID_SCAN_OVERLAP = timedelta(seconds=60)
+
+
+class Command(BaseCommand):
+    help = 'Run the commission scheduler (mature due commissions, void cancelled ones)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single tick (full void scan) and exit'
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=float,
+            default=getattr(settings, 'SCHEDULER_MAX_SLEEP', 5.0),
+            help='Upper bound on seconds between ticks'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MaturationService.DEFAULT_BATCH_SIZE,
+            help='Commissions updated per transaction'
+        )
+    
+    def handle(self, *args, **options):
+        self._stop = threading.Event()
+        max_sleep = options['max_sleep']
+        batch_size = options['batch_size']
+        
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._request_stop)
+            signal.signal(signal.SIGINT, self._request_stop)
+            self.stdout.write(self.style.SUCCESS(f'⏱️  Commission scheduler started (max sleep {max_sleep}s)'))
+        
+        # First tick scans every cancelled/refunded order, later ticks only recent changes
+        void_since = None
+        while not self._stop.is_set():
+            tick_started = timezone.now()
+            close_old_connections()
+            
+            try:
+                self._tick(tick_started, void_since, batch_size)
+                void_since = tick_started - VOID_SCAN_OVERLAP
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Scheduler tick failed: {e}'))
+            
+            if options['once']:
+                break
+            self._stop.wait(self._seconds_until_next_due(max_sleep))
+        
+        close_old_connections()
+        if not options['once']:
+            self.stdout.write('Commission scheduler stopped')
+    
+    def _tick(self, now, void_since, batch_size):
+        voided = CommissionLifecycleService.void_cancelled(since=void_since, batch_size=batch_size)
+        if voided:
+            self.stdout.write(f'[{timezone.localtime(now):%H:%M:%S}] Voided {voided} commissions (order cancelled/refunded)')
+        
+        run = CommissionLifecycleService.mature_due(now, batch_size=batch_size)
+        if run:
+            self.stdout.write(
+                f'[{timezone.localtime(now):%H:%M:%S}] Matured {run.matured_count} commissions '
+                f'(Rp {run.matured_amount:,.0f}, run #{run.id})'
+            )
+    
+    def _seconds_until_next_due(self, max_sleep):
+        next_due = CommissionLifecycleService.next_due_at()
+        if next_due is None:
+            return max_sleep
+        return min(max(0.0, (next_due - timezone.now()).total_seconds()), max_sleep)
+    
+    def _request_stop(self, signum, frame):
+        self._stop.set()
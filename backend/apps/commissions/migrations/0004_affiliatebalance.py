@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0003_referral_referrals_affilia_62a173_idx_and_more'),
+        ('commissions', '0003_bankaccount_rejection_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AffiliateBalance',
+            fields=[
+                ('affiliate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='affiliates.affiliate')),
+                ('pending', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('available', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('paid', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('reserved', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('withdrawable', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'affiliate_balances',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0004_affiliatebalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaturationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('cutoff', models.DateTimeField(help_text='Commissions created at or before this time were eligible')),
+                ('batch_size', models.PositiveIntegerField()),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('matured_count', models.PositiveIntegerField(default=0)),
+                ('matured_amount', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('affiliate_deltas', models.JSONField(blank=True, default=dict)),
+                ('daily_stats_applied', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'commission_maturation_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
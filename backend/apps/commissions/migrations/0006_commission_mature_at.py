@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:15
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_mature_at(apps, schema_editor):
+    """Give existing pending commissions their due time."""
+    Commission = apps.get_model('commissions', 'Commission')
+    days = getattr(settings, 'COMMISSION_HOLDING_DAYS', 30)
+    Commission.objects.filter(status='pending', mature_at__isnull=True).update(
+        mature_at=F('created_at') + timedelta(days=days)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0005_useragent_clickrollup_and_more'),
+        ('commissions', '0005_maturationrun'),
+        ('orders', '0002_order_orders_referra_5ac971_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commission',
+            name='mature_at',
+            field=models.DateTimeField(blank=True, help_text='When the holding period ends', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['status', 'mature_at'], name='commissions_status_5fff88_idx'),
+        ),
+        migrations.RunPython(set_mature_at, migrations.RunPython.noop),
+    ]
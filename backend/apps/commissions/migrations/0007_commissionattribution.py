@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0006_commission_mature_at'),
+        ('orders', '0002_order_orders_referra_5ac971_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionAttribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('event', models.CharField(max_length=30)),
+                ('outcome', models.CharField(blank=True, choices=[('created', 'Commission created'), ('existing', 'Commission already existed'), ('skipped', 'No commission')], max_length=20)),
+                ('detail', models.CharField(blank=True, help_text='Why no commission was created', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('commission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attributions', to='commissions.commission')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commission_attributions', to='orders.order')),
+            ],
+            options={
+                'db_table': 'commission_attributions',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
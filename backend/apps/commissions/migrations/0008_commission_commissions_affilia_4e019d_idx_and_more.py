@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affiliates', '0006_referral_referrals_affilia_24da46_idx_and_more'),
+        ('commissions', '0007_commissionattribution'),
+        ('orders', '0003_order_invoice_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['affiliate', 'created_at', 'id'], name='commissions_affilia_4e019d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='payouts_status_970a20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(fields=['created_at', 'id'], name='payouts_created_abd7f9_idx'),
+        ),
+    ]
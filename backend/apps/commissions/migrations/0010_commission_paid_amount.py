@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0009_payoutbatch_payout_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commission',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=12),
+        ),
+    ]
@@ -1,15 +1,88 @@
+from django.conf import settings
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch import receiver
+from django.db.models import Sum, F, Q, OuterRef, Subquery
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 
 
-class Commission(models.Model):
+class BalanceTrackedMixin:
+    """
+    Keep AffiliateBalance in sync with a model's (affiliate, status, amount).
+    
+    The state loaded from the database is remembered so save() can move the
+    amount between snapshot buckets inside the same transaction. Deletes,
+    including cascades and queryset deletes, are handled by the
+    pre_delete/post_delete receivers at the bottom of this module.
+    Subclasses define BALANCE_BUCKETS (status -> AffiliateBalance column).
+    """
+    
+    BALANCE_BUCKETS = {}
+    BALANCE_FIELDS = ('affiliate_id', 'status', 'amount')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._balance_state = instance._get_balance_state()
+        return instance
+    
+    @classmethod
+    def get_balance_columns(cls, state):
+        """Return {AffiliateBalance column: amount} a stored state adds to the snapshot."""
+        column = cls.BALANCE_BUCKETS.get(state[1])
+        return {column: state[2]} if column and state[2] else {}
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        current = self._get_balance_state()
+        if fields is None:
+            self._balance_state = current
+            return
+        # Partial refresh (e.g. a deferred field being loaded on access):
+        # only the refreshed fields are known to match the database
+        refreshed = {'affiliate_id' if name == 'affiliate' else name for name in fields}
+        previous = getattr(self, '_balance_state', None) or (None,) * len(self.BALANCE_FIELDS)
+        self._balance_state = tuple(
+            value if name in refreshed else old
+            for name, old, value in zip(self.BALANCE_FIELDS, previous, current)
+        )
+    
+    def _get_balance_state(self):
+        """Return the BALANCE_FIELDS values as currently set on the instance."""
+        return tuple(self.__dict__.get(name) for name in self.BALANCE_FIELDS)
+    
+    def _get_stored_balance_state(self):
+        """
+        Return the BALANCE_FIELDS values stored for this row.
+        
+        Instances loaded with .only()/.defer() miss some of the tracked
+        fields, so those are read from the database (once) instead.
+        """
+        state = getattr(self, '_balance_state', None)
+        if state and None in state and self.pk is not None:
+            state = type(self)._base_manager.filter(pk=self.pk).values_list(*self.BALANCE_FIELDS).first()
+            self._balance_state = state
+        return state
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_state = self._get_stored_balance_state()
+            super().save(*args, **kwargs)
+            new_state = self._get_balance_state()
+            if old_state != new_state:
+                AffiliateBalance.apply_transition(old_state, new_state, self.get_balance_columns)
+            self._balance_state = new_state
+
+
+class Commission(BalanceTrackedMixin, models.Model):
     """
     Commission earned by affiliate from a referral.
     
-    IMPORTANT: Balance is NEVER stored as a field. 
-    It is calculated dynamically to prevent race conditions.
+    IMPORTANT: Balance is NEVER stored on the commission itself.
+    Per-affiliate totals live in AffiliateBalance, which is updated in the
+    same transaction as every status change (see save()).
     """
     
     STATUS_CHOICES = [
@@ -19,6 +92,14 @@ class Commission(models.Model):
         ('voided', 'Voided'),        # Order cancelled/refunded
     ]
     
+    # Status -> AffiliateBalance column
+    BALANCE_BUCKETS = {
+        'pending': 'pending',
+        'available': 'available',
+        'paid': 'paid',
+    }
+    BALANCE_FIELDS = ('affiliate_id', 'status', 'amount', 'paid_amount')
+    
     affiliate = models.ForeignKey('affiliates.Affiliate', on_delete=models.CASCADE, related_name='commissions')
     referral = models.OneToOneField('affiliates.Referral', on_delete=models.CASCADE, related_name='commission')
     order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='commissions')
@@ -28,17 +109,22 @@ class Commission(models.Model):
     commission_rate = models.DecimalField(max_digits=4, decimal_places=2)  # e.g., 5.00 = 5%
     amount = models.DecimalField(max_digits=12, decimal_places=0)
     
+    # Paid out so far: a payout can take part of an available commission,
+    # which stays available for the rest (equals amount once paid)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=0, default=0)
+    
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
-    # Payout reference (when paid)
+    # Payout reference (the last payout that took part of it)
     payout = models.ForeignKey('Payout', on_delete=models.SET_NULL, null=True, blank=True, related_name='commission_items')
     
     # Voiding info
     voided_at = models.DateTimeField(null=True, blank=True)
     voided_reason = models.CharField(max_length=255, blank=True)
     
-    # Maturation
+    # Maturation: due time is fixed when the commission is created
+    mature_at = models.DateTimeField(null=True, blank=True, help_text='When the holding period ends')
     matured_at = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
@@ -50,12 +136,43 @@ class Commission(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['affiliate', 'status', 'created_at']),
+            models.Index(fields=['affiliate', 'created_at', 'id']),
             models.Index(fields=['order']),
+            models.Index(fields=['status', 'mature_at']),
         ]
     
     def __str__(self):
         return f"Commission {self.affiliate.affiliate_code} - Rp {self.amount:,.0f} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        if self.status == 'pending' and self.mature_at is None:
+            self.mature_at = (self.created_at or timezone.now()) + timedelta(
+                days=getattr(settings, 'COMMISSION_HOLDING_DAYS', 30)
+            )
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'mature_at'}
+        adding = self._state.adding
+        old_state = self._get_stored_balance_state()
+        # The dashboard's recent referrals show the commission amount
+        shown_changed = adding or (old_state or (None,) * 3)[2] != self.amount
+        super().save(*args, **kwargs)
+        if shown_changed:
+            from apps.affiliates.models import DashboardSnapshot
+            DashboardSnapshot.schedule_referral_refresh([self.affiliate_id])
+        if (adding or old_state) and old_state != self._balance_state:
+            from apps.core.counters import counters
+            counters.incr_on_commit(counters.commission_deltas(old_state, self._balance_state))
+    
+    @classmethod
+    def get_balance_columns(cls, state):
+        """The paid-out part sits in 'paid', the rest in the status bucket."""
+        affiliate_id, status, amount, paid_amount = state
+        paid_amount = paid_amount or 0
+        columns = super().get_balance_columns((affiliate_id, status, (amount or 0) - paid_amount))
+        if paid_amount:
+            columns['paid'] = columns.get('paid', 0) + paid_amount
+        return columns
+    
     @staticmethod
     def calculate_amount(order_amount, commission_rate):
         """Calculate commission amount from order amount and rate."""
@@ -72,54 +189,345 @@ class Commission(models.Model):
     @classmethod
     def get_affiliate_balance(cls, affiliate_id):
         """
-        Calculate affiliate's real-time balance.
+        Get affiliate's withdrawable balance (available minus pending payouts).
         
-        CRITICAL: This is calculated dynamically from commissions minus payouts
-        to prevent race condition exploits (double-withdraw).
+        Read from the AffiliateBalance snapshot, which is maintained in the
+        same transaction as every commission/payout status change.
         """
-        with transaction.atomic():
-            # Total available commissions
-            available = cls.objects.filter(
-                affiliate_id=affiliate_id,
-                status='available'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal(0)
-            
-            # Minus pending/processing payouts
-            pending_payouts = Payout.objects.filter(
-                affiliate_id=affiliate_id,
-                status__in=['pending', 'processing']
-            ).aggregate(total=Sum('amount'))['total'] or Decimal(0)
-            
-            return available - pending_payouts
+        return AffiliateBalance.get_for_affiliate(affiliate_id).withdrawable
+    
+    @classmethod
+    def get_affiliate_summary(cls, affiliate_id, live=False):
+        """
+        Get summary of affiliate's commissions.
+        
+        Args:
+            affiliate_id: Affiliate primary key
+            live: Compute from source rows (one query) instead of the snapshot
+        """
+        if live:
+            return cls.get_affiliate_summaries([affiliate_id])[affiliate_id]
+        return AffiliateBalance.get_for_affiliate(affiliate_id).as_summary()
     
     @classmethod
-    def get_affiliate_summary(cls, affiliate_id):
-        """Get summary of affiliate's commissions."""
-        pending = cls.objects.filter(
-            affiliate_id=affiliate_id,
-            status='pending'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal(0)
-        
-        available = cls.objects.filter(
-            affiliate_id=affiliate_id,
-            status='available'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal(0)
-        
-        paid = cls.objects.filter(
-            affiliate_id=affiliate_id,
-            status='paid'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal(0)
-        
-        # Actual withdrawable balance (available minus pending payouts)
-        withdrawable = cls.get_affiliate_balance(affiliate_id)
+    def get_affiliate_summaries(cls, affiliate_ids):
+        """
+        Compute commission summaries for many affiliates in one query.
         
+        Returns:
+            dict: affiliate_id -> summary dict (same shape as get_affiliate_summary)
+        """
+        totals = cls.get_balance_totals(affiliate_ids)
         return {
-            'pending': pending,
-            'available': available,
-            'withdrawable': withdrawable,
-            'paid': paid,
-            'total': pending + available + paid,
+            affiliate_id: {
+                'pending': values['pending'],
+                'available': values['available'],
+                'withdrawable': values['withdrawable'],
+                'paid': values['paid'],
+                'total': values['pending'] + values['available'] + values['paid'],
+            }
+            for affiliate_id, values in totals.items()
         }
+    
+    @classmethod
+    def get_balance_totals(cls, affiliate_ids=None):
+        """
+        Compute per-affiliate balance buckets with conditional aggregation.
+        
+        Commission buckets are summed with filtered aggregates over one join,
+        pending/processing payouts come from a correlated subquery, so the
+        whole computation is a single query regardless of affiliate count.
+        
+        Args:
+            affiliate_ids: Optional list of affiliate IDs (default: all affiliates)
+        
+        Returns:
+            dict: affiliate_id -> {pending, available, paid, reserved, withdrawable}
+        """
+        from apps.affiliates.models import Affiliate
+        
+        reserved = (
+            Payout.objects.filter(affiliate_id=OuterRef('pk'), status__in=Payout.BALANCE_BUCKETS)
+            .order_by()
+            .values('affiliate_id')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        
+        # Same split as Commission.get_balance_columns: the paid-out part of
+        # every commission counts as paid, the rest goes to its status bucket
+        open_amount = F('commissions__amount') - F('commissions__paid_amount')
+        buckets = {'paid_out': Sum('commissions__paid_amount')}
+        for status, column in cls.BALANCE_BUCKETS.items():
+            buckets[column] = Sum(
+                open_amount,
+                filter=Q(commissions__status=status),
+                output_field=models.DecimalField(max_digits=14, decimal_places=0)
+            )
+        
+        queryset = Affiliate.objects.all()
+        if affiliate_ids is not None:
+            queryset = queryset.filter(pk__in=affiliate_ids)
+        rows = queryset.order_by().values('pk').annotate(reserved=Subquery(reserved), **buckets)
+        
+        zero = Decimal(0)
+        totals = {}
+        for row in rows:
+            entry = {
+                column: row[column] or zero
+                for column in ['pending', 'available', 'paid', 'reserved']
+            }
+            entry['paid'] += row['paid_out'] or zero
+            entry['withdrawable'] = entry['available'] - entry['reserved']
+            totals[row['pk']] = entry
+        
+        # Unknown IDs still get an (empty) entry
+        if affiliate_ids is not None:
+            for affiliate_id in affiliate_ids:
+                totals.setdefault(affiliate_id, {
+                    'pending': zero, 'available': zero, 'paid': zero,
+                    'reserved': zero, 'withdrawable': zero,
+                })
+        
+        return totals
+
+
+class CommissionAttribution(models.Model):
+    """
+    Idempotency record for one order event processed by the attribution pipeline.
+    
+    `key` is "<order id>:<event>" and is unique, so a duplicate webhook
+    delivery finds the existing record and returns its outcome instead of
+    attributing the order again (see CommissionService.attribute_order).
+    """
+    
+    OUTCOME_CHOICES = [
+        ('created', 'Commission created'),
+        ('existing', 'Commission already existed'),
+        ('skipped', 'No commission'),
+    ]
+    
+    key = models.CharField(max_length=100, unique=True)
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='commission_attributions')
+    event = models.CharField(max_length=30)
+    
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True)
+    detail = models.CharField(max_length=255, blank=True, help_text='Why no commission was created')
+    commission = models.ForeignKey(Commission, on_delete=models.SET_NULL, null=True, blank=True, related_name='attributions')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'commission_attributions'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.key} ({self.outcome})"
+    
+    @staticmethod
+    def make_key(order_id, event):
+        return f'{order_id}:{event}'
+
+
+class AffiliateBalance(models.Model):
+    """
+    Materialized per-affiliate balance snapshot.
+    
+    Updated incrementally inside the transaction that changes a Commission or
+    Payout status. `reconcile_balances` recomputes it from source rows and
+    reports any drift.
+    """
+    
+    affiliate = models.OneToOneField(
+        'affiliates.Affiliate',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance'
+    )
+    
+    # Commission totals by status
+    pending = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    available = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    paid = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    
+    # Pending/processing payouts, and available minus reserved
+    reserved = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    withdrawable = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    
+    # Incremented on every change
+    version = models.PositiveBigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'affiliate_balances'
+    
+    def __str__(self):
+        return f"Balance {self.affiliate_id} - Rp {self.withdrawable:,.0f} (v{self.version})"
+    
+    def as_summary(self):
+        """Return the dict shape used by CommissionSummarySerializer."""
+        return {
+            'pending': self.pending,
+            'available': self.available,
+            'withdrawable': self.withdrawable,
+            'paid': self.paid,
+            'total': self.pending + self.available + self.paid,
+        }
+    
+    @classmethod
+    def get_for_affiliate(cls, affiliate_id, lock=False):
+        """
+        Get the snapshot row, building it from source rows if missing.
+        
+        Args:
+            affiliate_id: Affiliate primary key
+            lock: Take a row lock (select_for_update); caller must be in a transaction
+        """
+        queryset = cls.objects.select_for_update() if lock else cls.objects
+        try:
+            return queryset.get(pk=affiliate_id)
+        except cls.DoesNotExist:
+            cls.rebuild([affiliate_id])
+            return queryset.get(pk=affiliate_id)
+    
+    @classmethod
+    def apply_transition(cls, old_state, new_state, get_columns, rebuild_missing=True):
+        """
+        Move an amount between buckets after a source row changed.
+        
+        Args:
+            old_state: BALANCE_FIELDS values before the change, or None if created
+            new_state: BALANCE_FIELDS values after the change, or None if deleted
+            get_columns: The source model's get_balance_columns (state -> {column: amount})
+            rebuild_missing: See apply_delta()
+        """
+        deltas = {}
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if not state:
+                continue
+            for column, amount in get_columns(state).items():
+                key = (state[0], column)
+                deltas[key] = deltas.get(key, Decimal(0)) + sign * Decimal(amount)
+        
+        per_affiliate = {}
+        for (affiliate_id, column), amount in deltas.items():
+            if amount:
+                per_affiliate.setdefault(affiliate_id, {})[column] = amount
+        
+        for affiliate_id, columns in per_affiliate.items():
+            cls.apply_delta(affiliate_id, rebuild_missing=rebuild_missing, **columns)
+    
+    @classmethod
+    def apply_delta(cls, affiliate_id, pending=0, available=0, paid=0, reserved=0, rebuild_missing=True):
+        """
+        Add deltas to an affiliate's snapshot with F() expressions.
+        
+        A missing snapshot is rebuilt from source rows unless
+        rebuild_missing is False (deletes: the affiliate itself may be
+        going away in the same cascade).
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(pk=affiliate_id).update(
+                pending=F('pending') + pending,
+                available=F('available') + available,
+                paid=F('paid') + paid,
+                reserved=F('reserved') + reserved,
+                withdrawable=F('withdrawable') + available - reserved,
+                version=F('version') + 1,
+                updated_at=timezone.now(),
+            )
+            if not updated and rebuild_missing:
+                # No snapshot yet: source rows already include this change
+                cls.rebuild([affiliate_id])
+    
+    @classmethod
+    def compute_from_source(cls, affiliate_ids=None):
+        """
+        Recompute balance totals from commissions and payouts.
+        
+        Args:
+            affiliate_ids: Optional list of affiliate IDs (default: all affiliates)
+        
+        Returns:
+            dict: affiliate_id -> {pending, available, paid, reserved, withdrawable}
+        """
+        return Commission.get_balance_totals(affiliate_ids)
+    
+    @classmethod
+    def rebuild(cls, affiliate_ids):
+        """Overwrite snapshots for the given affiliates from source rows."""
+        totals = cls.compute_from_source(list(affiliate_ids))
+        with transaction.atomic():
+            for affiliate_id, values in totals.items():
+                balance, created = cls.objects.select_for_update().get_or_create(
+                    affiliate_id=affiliate_id,
+                    defaults=values
+                )
+                if not created:
+                    cls.objects.filter(pk=affiliate_id).update(
+                        version=F('version') + 1,
+                        updated_at=timezone.now(),
+                        **values
+                    )
+        return totals
+
+
+class MaturationRun(models.Model):
+    """
+    Record of one bulk maturation pass (see MaturationService).
+    
+    Counters and per-affiliate deltas are written in the same transaction as
+    each matured chunk, so a failed run still describes exactly what it moved.
+    `affiliate_deltas` maps affiliate id (str) -> {'count': int, 'amount': str}.
+    """
+    
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    cutoff = models.DateTimeField(help_text='Commissions created at or before this time were eligible')
+    batch_size = models.PositiveIntegerField()
+    
+    # Totals
+    batches = models.PositiveIntegerField(default=0)
+    matured_count = models.PositiveIntegerField(default=0)
+    matured_amount = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    affiliate_deltas = models.JSONField(default=dict, blank=True)
+    
+    # Set once the deltas have been added onto DailyStats.commission_matured
+    daily_stats_applied = models.BooleanField(default=False)
+    
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'commission_maturation_runs'
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Maturation {self.started_at:%Y-%m-%d %H:%M} - {self.matured_count} (Rp {self.matured_amount:,.0f})"
+    
+    def add_chunk(self, per_affiliate):
+        """
+        Fold one chunk's {affiliate_id: (count, amount)} into the run totals and save.
+        """
+        for affiliate_id, (count, amount) in per_affiliate.items():
+            entry = self.affiliate_deltas.setdefault(str(affiliate_id), {'count': 0, 'amount': '0'})
+            entry['count'] += count
+            entry['amount'] = str(Decimal(entry['amount']) + amount)
+            self.matured_count += count
+            self.matured_amount += amount
+        self.batches += 1
+        self.save(update_fields=['batches', 'matured_count', 'matured_amount', 'affiliate_deltas'])
+    
+    def get_amounts_by_affiliate(self):
+        """Return {affiliate_id: Decimal amount} from the recorded deltas."""
+        return {int(key): Decimal(entry['amount']) for key, entry in self.affiliate_deltas.items()}
 
 
 class BankAccount(models.Model):
@@ -161,7 +569,7 @@ class BankAccount(models.Model):
         super().save(*args, **kwargs)
 
 
-class Payout(models.Model):
+class Payout(BalanceTrackedMixin, models.Model):
     """Payout request from affiliate."""
     
     STATUS_CHOICES = [
@@ -172,6 +580,12 @@ class Payout(models.Model):
         ('failed', 'Failed'),         # Transfer failed
     ]
     
+    # Pending/processing payouts are reserved against the available balance
+    BALANCE_BUCKETS = {
+        'pending': 'reserved',
+        'processing': 'reserved',
+    }
+    
     affiliate = models.ForeignKey('affiliates.Affiliate', on_delete=models.CASCADE, related_name='payouts')
     bank_account = models.ForeignKey(BankAccount, on_delete=models.PROTECT, related_name='payouts')
     
@@ -191,6 +605,9 @@ class Payout(models.Model):
     transfer_reference = models.CharField(max_length=100, blank=True)
     transfer_date = models.DateTimeField(null=True, blank=True)
     
+    # Bulk transfer run this payout was sent in (see PayoutBatchService)
+    batch = models.ForeignKey('PayoutBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='payouts')
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -199,6 +616,10 @@ class Payout(models.Model):
     class Meta:
         db_table = 'payouts'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Payout {self.affiliate.affiliate_code} - Rp {self.amount:,.0f} ({self.status})"
@@ -218,15 +639,10 @@ class Payout(models.Model):
         
         CRITICAL: Uses transaction and row locking to prevent race conditions.
         """
-        from django.db import IntegrityError
-        
         with transaction.atomic():
-            # Lock the affiliate row to prevent concurrent modifications
-            from apps.affiliates.models import Affiliate
-            locked_affiliate = Affiliate.objects.select_for_update().get(pk=affiliate.pk)
-            
-            # Calculate actual balance
-            actual_balance = Commission.get_affiliate_balance(affiliate.id)
+            # Lock the balance snapshot row to prevent concurrent withdrawals
+            balance = AffiliateBalance.get_for_affiliate(affiliate.id, lock=True)
+            actual_balance = balance.withdrawable
             
             # Validate amount
             if amount > actual_balance:
@@ -245,6 +661,68 @@ class Payout(models.Model):
             return payout
 
 
+class PayoutBatch(models.Model):
+    """
+    One bulk bank-transfer run (see PayoutBatchService).
+    
+    Pending payouts with a verified bank account are locked into the batch
+    as 'processing' and grouped by bank into transfer files. The bank's
+    response file then settles them in bulk: paid payouts mark their linked
+    commissions paid, failed ones release them.
+    `bank_totals` maps bank name -> {'count': int, 'amount': str}.
+    """
+    
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),  # Transfer files generated, awaiting bank response
+        ('completed', 'Completed'),    # Every payout settled (paid or failed)
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    
+    # Totals
+    payout_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    bank_totals = models.JSONField(default=dict, blank=True)
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payout_batches'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'payout_batches'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.reference} - {self.payout_count} payouts (Rp {self.total_amount:,.0f}, {self.status})"
+    
+    @property
+    def reference(self):
+        return f"PB{self.created_at:%y%m%d}-{self.pk:05d}"
+    
+    @staticmethod
+    def line_reference(payout_id):
+        """Reference written on each transfer line and expected back in the bank response."""
+        return f"QTB-PO-{payout_id}"
+    
+    @staticmethod
+    def parse_line_reference(reference):
+        """Return the payout id from a line reference, or None."""
+        prefix = 'QTB-PO-'
+        reference = (reference or '').strip().upper()
+        if reference.startswith(prefix) and reference[len(prefix):].isdigit():
+            return int(reference[len(prefix):])
+        return None
+
+
 class Coupon(models.Model):
     """
     Discount coupons created for affiliates.
@@ -388,6 +866,58 @@ class Coupon(models.Model):
         return max(Decimal('0'), amount - discount)
     
     def increment_usage(self):
-        """Increment usage count (called when coupon is used)."""
-        self.usage_count += 1
-        self.save(update_fields=['usage_count', 'updated_at'])
+        """
+        Atomically use the coupon once (called when coupon is used).
+        
+        A single conditional UPDATE, so concurrent checkouts can never push
+        usage_count past usage_limit.
+        
+        Returns:
+            bool: False if the usage limit was already reached
+        """
+        used = Coupon.objects.filter(pk=self.pk).filter(
+            Q(usage_limit__isnull=True) | Q(usage_limit=0) | Q(usage_count__lt=F('usage_limit'))
+        ).update(
+            usage_count=F('usage_count') + 1,
+            updated_at=timezone.now()
+        ) == 1
+        if used:
+            self.refresh_from_db(fields=['usage_count'])
+        return used
+    
+    @staticmethod
+    def release_usage(coupon_id):
+        """Give back one use (the order that used it was never paid)."""
+        Coupon.objects.filter(pk=coupon_id, usage_count__gt=0).update(
+            usage_count=F('usage_count') - 1,
+            updated_at=timezone.now()
+        )
+
+
+# Deletes bypass save(): cascades (Referral, Order, Affiliate) and queryset
+# .delete() never call Model.delete(), so the snapshot and the live
+# counters are adjusted here
+@receiver(pre_delete, sender=Commission)
+@receiver(pre_delete, sender=Payout)
+def capture_balance_state(sender, instance, **kwargs):
+    # The row is still there: load deferred (or never loaded) tracked fields now
+    if getattr(instance, '_balance_state', None) is None:
+        instance._balance_state = (None,) * len(sender.BALANCE_FIELDS)
+    instance._get_stored_balance_state()
+
+
+@receiver(post_delete, sender=Commission)
+@receiver(post_delete, sender=Payout)
+def release_balance_state(sender, instance, **kwargs):
+    state = getattr(instance, '_balance_state', None)
+    if state and None not in state:
+        AffiliateBalance.apply_transition(state, None, sender.get_balance_columns, rebuild_missing=False)
+
+
+@receiver(post_delete, sender=Commission)
+def release_commission_counters(sender, instance, **kwargs):
+    from apps.core.counters import counters
+    
+    state = getattr(instance, '_balance_state', None)
+    if state and None not in state:
+        counters.incr_on_commit(counters.commission_deltas(state, None))
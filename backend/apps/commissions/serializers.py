@@ -12,7 +12,7 @@ class CommissionSerializer(serializers.ModelSerializer):
         model = Commission
         fields = [
             'id', 'order_number', 'product_name',
-            'order_amount', 'commission_rate', 'amount',
+            'order_amount', 'commission_rate', 'amount', 'paid_amount',
             'status', 'created_at', 'matured_at', 'voided_at'
         ]
 
@@ -123,6 +123,10 @@ class AdminPayoutSerializer(serializers.ModelSerializer):
     account_number = serializers.CharField(source='account_number_snapshot', read_only=True)
     account_holder = serializers.CharField(source='account_holder_snapshot', read_only=True)
     
+    transaction_id = serializers.CharField(source='transfer_reference', read_only=True)
+    notes = serializers.CharField(source='admin_notes', read_only=True)
+    requested_at = serializers.DateTimeField(source='created_at', read_only=True)
+    
     class Meta:
         model = Payout
         fields = [
@@ -136,6 +140,24 @@ class AdminPayoutSerializer(serializers.ModelSerializer):
         return f"{user.first_name} {user.last_name}".strip() or user.email
 
 
+from .models import PayoutBatch
+
+
+class PayoutBatchSerializer(serializers.ModelSerializer):
+    """Serializer for bulk payout runs."""
+    
+    reference = serializers.CharField(read_only=True)
+    created_by = serializers.EmailField(source='created_by.email', read_only=True, default=None)
+    
+    class Meta:
+        model = PayoutBatch
+        fields = [
+            'id', 'reference', 'status', 'payout_count', 'total_amount', 'bank_totals',
+            'paid_count', 'paid_amount', 'failed_count',
+            'created_by', 'created_at', 'completed_at'
+        ]
+
+
 from .models import Coupon
 
 
@@ -1,84 +1,779 @@
+import csv
+import io
+import logging
+import re
+import zipfile
 from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Count, F, Sum, Q
 
-from apps.commissions.models import Commission
+from apps.commissions.models import (
+    Commission, CommissionAttribution, AffiliateBalance, MaturationRun, Payout, PayoutBatch
+)
 from apps.affiliates.models import Affiliate, Referral
+from apps.affiliates.resolver import affiliate_code_cache
+from apps.core.counters import counters, commission_count, commission_amount
 from apps.products.models import Product
 
+logger = logging.getLogger(__name__)
+
+
 class CommissionService:
-    """Service to handle commission calculations and creation."""
+    """
+    Commission attribution pipeline.
     
-    @staticmethod
-    def calculate_commission(order):
+    Every path that turns a paid order into a referral + commission
+    (payment webhooks, admin "mark as paid", mock transactions) goes through
+    attribute_order(), which is idempotent per (order, event).
+    """
+    
+    DEFAULT_RATE = Decimal('5.00')
+    
+    # Order statuses at which the referral counts as a conversion
+    CONFIRMED_ORDER_STATUSES = ['paid', 'processing', 'completed', 'distributed']
+    
+    @classmethod
+    def calculate_commission(cls, order):
+        """
+        Calculate and create commission for a paid/completed order.
+        Kept for existing callers; see attribute_order().
         """
-        Calculate and create commission for a completed order.
-        Idempotent: Checks if commission/referral exists first.
+        return cls.attribute_order(order, event='paid')
+    
+    @classmethod
+    def attribute_order(cls, order, event='paid'):
         """
+        Attribute an order to its affiliate exactly once per (order, event).
+        
+        Runs in one transaction holding a row lock on the order, so
+        concurrent duplicate deliveries queue behind the first one and then
+        find its CommissionAttribution record. Referral (one per order) and
+        Commission (one per referral) uniqueness back this up at the DB level.
+        
+        Returns:
+            Commission or None
+        """
+        from apps.orders.models import Order
+        
         if not order.referral_code:
             return None
         
-        # 1. Find Affiliate
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            attribution, created = CommissionAttribution.objects.get_or_create(
+                key=CommissionAttribution.make_key(order.pk, event),
+                defaults={'order': order, 'event': event}
+            )
+            if not created:
+                # Duplicate delivery: replay the first outcome
+                return attribution.commission
+            
+            commission, outcome, detail = cls._attribute(order)
+            attribution.commission = commission
+            attribution.outcome = outcome
+            attribution.detail = detail
+            attribution.save(update_fields=['commission', 'outcome', 'detail'])
+        
+        if outcome == 'created':
+            logger.info(f'Commission created for affiliate {order.referral_code}: Rp {commission.amount:,.0f}')
+        elif outcome == 'skipped':
+            logger.info(f'Commission skipped for order {order.order_number}: {detail}')
+        return commission
+    
+    @classmethod
+    def _attribute(cls, order):
+        """Create the referral and commission for a locked order. Returns (commission, outcome, detail)."""
+        # 1. Find Affiliate (cached code resolution, no query on a hit)
+        affiliate = affiliate_code_cache.get_approved(order.referral_code)
+        if affiliate is None:
+            return None, 'skipped', f'Invalid or unapproved affiliate code {order.referral_code}'
+        
+        # 2. Prevent self-referral (mock transactions are allowed for testing)
+        if order.user_id == affiliate.user_id and order.payment_method != 'mock_test':
+            return None, 'skipped', 'Self-referral'
+        
+        # 3. Ensure Referral Exists (one per order)
+        customer = order.user
+        referral, _ = Referral.objects.get_or_create(
+            order=order,
+            defaults={
+                'affiliate_id': affiliate.id,
+                'customer': customer,
+                'status': 'confirmed' if order.status in cls.CONFIRMED_ORDER_STATUSES else 'pending',
+                'customer_name_masked': Referral.mask_name(customer.get_full_name() or order.recipient_name),
+                'customer_email_masked': Referral.mask_email(customer.email),
+            }
+        )
+        
+        # 4. Commission already exists (attributed before idempotency keys existed)
+        existing = Commission.objects.filter(referral=referral).first()
+        if existing:
+            return existing, 'existing', ''
+        
+        # 5. Determine Commission Rate
+        # Priority: Affiliate Custom > Product > Global Default (5%)
+        rate = cls.DEFAULT_RATE
+        if order.product_id:
+            rate = order.product.commission_rate
+        if affiliate.custom_commission_rate:
+            rate = affiliate.custom_commission_rate
+        
+        # 6. Create Commission on the order's final amount (pending until mature_at)
+        commission = Commission.objects.create(
+            affiliate_id=referral.affiliate_id,
+            referral=referral,
+            order=order,
+            order_amount=order.final_amount,
+            commission_rate=rate,
+            amount=Commission.calculate_amount(order.final_amount, rate),
+            status='pending'
+        )
+        return commission, 'created', ''
+
+
+class MaturationService:
+    """
+    Set-based maturation of pending commissions.
+    
+    Eligible rows are walked in id order (keyset pagination). Each chunk is
+    one short transaction: UPDATE ... WHERE id IN (chunk), a grouped SUM of
+    what was matured, AffiliateBalance deltas and the run record. No model
+    instances are loaded, so save() hooks do not run; balances are moved
+    explicitly instead.
+    """
+    
+    DEFAULT_BATCH_SIZE = 2000
+    
+    @staticmethod
+    def get_eligible(cutoff):
+        """Pending commissions created at or before cutoff whose order still stands."""
+        return Commission.objects.filter(
+            status='pending',
+            created_at__lte=cutoff
+        ).exclude(
+            order__status__in=['cancelled', 'refunded']
+        )
+    
+    @staticmethod
+    def get_due(now=None):
+        """Pending commissions whose mature_at has passed and whose order still stands."""
+        return Commission.objects.filter(
+            status='pending',
+            mature_at__lte=now or timezone.now()
+        ).exclude(
+            order__status__in=['cancelled', 'refunded']
+        )
+    
+    @classmethod
+    def preview(cls, cutoff):
+        """Count and total of what a run would mature (one aggregate query)."""
+        totals = cls.get_eligible(cutoff).aggregate(count=Count('id'), total=Sum('amount'))
+        return totals['count'], totals['total'] or Decimal(0)
+    
+    @classmethod
+    def run(cls, cutoff, batch_size=None, progress=None, eligible=None):
+        """
+        Mature every eligible commission and return the MaturationRun.
+        
+        Args:
+            cutoff: Commissions created at or before this time are matured
+            batch_size: Rows per chunk/transaction
+            progress: Optional callable(run) invoked after each chunk
+            eligible: Queryset to mature instead of get_eligible(cutoff)
+        """
+        batch_size = batch_size or cls.DEFAULT_BATCH_SIZE
+        run = MaturationRun.objects.create(cutoff=cutoff, batch_size=batch_size)
+        if eligible is None:
+            eligible = cls.get_eligible(cutoff)
+        last_id = 0
+        
         try:
-            affiliate = Affiliate.objects.get(affiliate_code=order.referral_code, status='approved')
-        except Affiliate.DoesNotExist:
-            print(f"Commission skipped: Invalid or unapproved affiliate code {order.referral_code}")
+            while True:
+                ids = list(
+                    eligible.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                last_id = ids[-1]
+                cls._mature_chunk(run, ids)
+                if progress:
+                    progress(run)
+        except Exception as e:
+            run.status = 'failed'
+            run.error = str(e)
+            run.finished_at = timezone.now()
+            run.save(update_fields=['status', 'error', 'finished_at'])
+            raise
+        
+        run.status = 'completed'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at'])
+        cls.apply_to_daily_stats(run)
+        return run
+    
+    @staticmethod
+    def _mature_chunk(run, ids):
+        now = timezone.now()
+        with transaction.atomic():
+            # status guard: rows voided since the id scan are left alone
+            Commission.objects.filter(id__in=ids, status='pending').update(
+                status='available',
+                matured_at=now,
+                updated_at=now
+            )
+            per_affiliate = {
+                row['affiliate_id']: (row['count'], row['total'])
+                for row in Commission.objects.filter(id__in=ids, status='available', matured_at=now)
+                .order_by()
+                .values('affiliate_id')
+                .annotate(count=Count('id'), total=Sum('amount'))
+            }
+            deltas = {}
+            for affiliate_id, (count, amount) in per_affiliate.items():
+                AffiliateBalance.apply_delta(affiliate_id, pending=-amount, available=amount)
+                counters.add(deltas, commission_count('pending'), -count)
+                counters.add(deltas, commission_count('available'), count)
+                counters.add(deltas, commission_amount('pending'), -amount)
+                counters.add(deltas, commission_amount('available'), amount)
+            counters.incr_on_commit(deltas)
+            run.add_chunk(per_affiliate)
+    
+    @staticmethod
+    def apply_to_daily_stats(run):
+        """Add a completed run's matured amounts onto today's DailyStats rows (once)."""
+        from apps.affiliates.models import DailyStats
+        
+        if run.daily_stats_applied or not run.affiliate_deltas:
+            return
+        with transaction.atomic():
+            DailyStats.add_commission_matured(
+                timezone.localdate(run.finished_at or timezone.now()),
+                run.get_amounts_by_affiliate()
+            )
+            run.daily_stats_applied = True
+            run.save(update_fields=['daily_stats_applied'])
+
+
+class CommissionLifecycleService:
+    """
+    Due-time commission lifecycle driven by `run_scheduler`.
+    
+    A tick matures exactly the commissions whose mature_at has passed
+    (range scan on the status/mature_at index) and voids pending/available
+    commissions whose order was cancelled or refunded.
+    """
+    
+    VOID_ORDER_STATUSES = ['cancelled', 'refunded']
+    
+    @classmethod
+    def next_due_at(cls):
+        """Earliest mature_at among commissions still waiting, or None."""
+        return (
+            Commission.objects.filter(status='pending', mature_at__isnull=False)
+            .exclude(order__status__in=cls.VOID_ORDER_STATUSES)
+            .order_by('mature_at')
+            .values_list('mature_at', flat=True)
+            .first()
+        )
+    
+    @staticmethod
+    def mature_due(now=None, batch_size=None):
+        """Mature commissions due at `now`. Returns the MaturationRun, or None if nothing was due."""
+        now = now or timezone.now()
+        due = MaturationService.get_due(now)
+        if not due.exists():
             return None
+        return MaturationService.run(now, batch_size=batch_size, eligible=due)
+    
+    @classmethod
+    def void_cancelled(cls, since=None, batch_size=None):
+        """
+        Void pending/available commissions whose order is cancelled or refunded.
+        
+        Args:
+            since: Only look at orders updated after this time (None = all)
+            batch_size: Rows per chunk/transaction
+        
+        Returns:
+            int: Number of commissions voided
+        """
+        batch_size = batch_size or MaturationService.DEFAULT_BATCH_SIZE
+        candidates = Commission.objects.filter(
+            status__in=['pending', 'available'],
+            order__status__in=cls.VOID_ORDER_STATUSES
+        )
+        if since is not None:
+            candidates = candidates.filter(order__updated_at__gt=since)
+        
+        voided = 0
+        last_id = 0
+        while True:
+            ids = list(
+                candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            voided += cls._void_chunk(ids)
+        return voided
+    
+    @staticmethod
+    def _void_chunk(ids):
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                Commission.objects.select_for_update(of=('self',))
+                .filter(id__in=ids, status__in=['pending', 'available'])
+                .values_list('id', 'affiliate_id', 'status', 'amount', 'paid_amount', 'order__status')
+            )
             
-        # 2. Prevent self-referral (unless allowed for dev/mock, but logic typically forbids it)
-        # For Mock Checkout, we might want to allow it if order.user == affiliate.user.
-        # But logically, you can't earn commission on your own purchase.
-        # I'll add a check but maybe skip it for 'mock_test' payment method?
-        if order.user == affiliate.user and order.payment_method != 'mock_test':
-            print("Commission skipped: Self-referral")
-            return None
+            by_reason = {}
+            deltas = {}
+            counter_deltas = {}
+            for commission_id, affiliate_id, status, amount, paid_amount, order_status in rows:
+                by_reason.setdefault(order_status, []).append(commission_id)
+                columns = deltas.setdefault(affiliate_id, {})
+                # A part already paid out stays in 'paid'
+                columns[status] = columns.get(status, Decimal(0)) - (amount - paid_amount)
+                counters.add(counter_deltas, commission_count(status), -1)
+                counters.add(counter_deltas, commission_count('voided'), 1)
+                counters.add(counter_deltas, commission_amount(status), -amount)
+                counters.add(counter_deltas, commission_amount('voided'), amount)
+            
+            for order_status, commission_ids in by_reason.items():
+                Commission.objects.filter(id__in=commission_ids).update(
+                    status='voided',
+                    voided_at=now,
+                    voided_reason=f'Order {order_status}',
+                    updated_at=now
+                )
+            for affiliate_id, columns in deltas.items():
+                AffiliateBalance.apply_delta(affiliate_id, **columns)
+            counters.incr_on_commit(counter_deltas)
+        
+        return len(rows)
+
 
+class PayoutBatchService:
+    """
+    Bulk payout processing with bank-transfer files.
+    
+    create_batch() locks every pending payout with a verified bank account
+    in one transaction and moves it to 'processing'. Transfer files are
+    generated per bank, and the bank's response file is applied with
+    settle(): set-based updates of payouts and their commissions plus
+    explicit AffiliateBalance deltas.
+    
+    Payout amounts are whatever the affiliate requested (never changed), so
+    a paid payout takes its amount from the affiliate's available
+    commissions oldest first; the last one may be taken only in part
+    (Commission.paid_amount) and stays available for the rest. A payout is
+    batched or marked paid only if the open commission amount covers it.
+    """
+    
+    SUCCESS_STATUSES = {'success', 'successful', 'paid', 'ok', 'done', 'sukses', 'berhasil'}
+    FAILED_STATUSES = {'failed', 'fail', 'error', 'rejected', 'gagal', 'ditolak'}
+    
+    TRANSFER_FILE_HEADERS = ['Reference', 'Bank', 'Account Number', 'Account Holder', 'Amount', 'Remark']
+    
+    @staticmethod
+    def bank_key(bank_name):
+        """Normalized bank name used to group transfer lines."""
+        return ' '.join((bank_name or '').split()).upper() or 'UNKNOWN'
+    
+    @staticmethod
+    def get_eligible():
+        """Pending payouts not yet in a batch whose bank account is verified."""
+        return Payout.objects.filter(
+            status='pending',
+            batch__isnull=True,
+            bank_account__verification_status='verified'
+        )
+    
+    @classmethod
+    def preview(cls):
+        """Count and total of what a new batch would pick up (one aggregate query)."""
+        totals = cls.get_eligible().aggregate(count=Count('id'), total=Sum('amount'))
+        return totals['count'], totals['total'] or Decimal(0)
+    
+    @classmethod
+    def create_batch(cls, created_by=None, limit=None):
+        """
+        Lock eligible payouts into a new PayoutBatch.
+        
+        Args:
+            created_by: Admin user starting the run
+            limit: Maximum number of payouts (oldest first)
+        
+        Returns:
+            tuple: (PayoutBatch or None if nothing could be batched,
+                    list of (payout_id, reason) left pending)
+        """
         with transaction.atomic():
-            # 3. Ensure Referral Exists
-            referral, created = Referral.objects.get_or_create(
-                order=order,
-                defaults={
-                    'affiliate': affiliate,
-                    'customer': order.user,
-                    'status': 'confirmed' if order.status == 'completed' else 'pending',
-                    'customer_name_masked': Referral.mask_name(order.recipient_name or order.user.get_full_name()),
-                    'customer_email_masked': Referral.mask_email(order.user.email),
-                }
+            payouts = cls.get_eligible().select_for_update(of=('self',)).order_by('created_at', 'id')
+            if limit:
+                payouts = payouts[:limit]
+            rows = list(payouts.values_list('id', 'affiliate_id', 'amount', 'bank_name_snapshot'))
+            if not rows:
+                return None, []
+            
+            allocations, skipped = cls._check_cover([row[:3] for row in rows])
+            if not allocations:
+                return None, skipped
+            
+            now = timezone.now()
+            batch = PayoutBatch.objects.create(created_by=created_by, created_at=now)
+            Payout.objects.filter(id__in=allocations).update(
+                status='processing',
+                batch=batch,
+                processed_at=now,
+                updated_at=now
             )
-
-            # 4. Check if commission already exists
-            if hasattr(referral, 'commission'):
-                return referral.commission
             
-            # 5. Determine Commission Rate
-            # Priority: Affiliate Custom > Product > Global Default (5%)
-            rate = Decimal('5.00') # Default
+            bank_totals = {}
+            for payout_id, affiliate_id, amount, bank_name in rows:
+                if payout_id not in allocations:
+                    continue
+                entry = bank_totals.setdefault(cls.bank_key(bank_name), {'count': 0, 'amount': Decimal(0)})
+                entry['count'] += 1
+                entry['amount'] += allocations[payout_id]
             
-            # Check product logic
-            # If order has multiple items, we might need to loop items.
-            # But Order model (checked earlier) seems to link to ONE product (Field: product) directly?
-            # Let's re-verify Order model. Views.py line 212: product=product.
-            # Yes, simplified model for now.
+            batch.payout_count = len(allocations)
+            batch.total_amount = sum(allocations.values())
+            batch.bank_totals = {
+                bank: {'count': entry['count'], 'amount': str(entry['amount'])}
+                for bank, entry in sorted(bank_totals.items())
+            }
+            batch.save(update_fields=['payout_count', 'total_amount', 'bank_totals'])
+        
+        logger.info(f'Payout batch {batch.reference}: {batch.payout_count} payouts, Rp {batch.total_amount:,.0f}')
+        return batch, skipped
+    
+    @staticmethod
+    def _get_open_commissions(affiliate_ids, lock=False):
+        """
+        Available commissions not yet fully paid out, oldest first.
+        
+        Returns:
+            dict: {affiliate_id: [[commission_id, amount, paid_amount], ...]}
+        """
+        queryset = Commission.objects.filter(
+            affiliate_id__in=affiliate_ids,
+            status='available',
+            paid_amount__lt=F('amount')
+        )
+        if lock:
+            queryset = queryset.select_for_update(of=('self',))
+        open_commissions = {}
+        for commission_id, affiliate_id, amount, paid_amount in (
+            queryset.order_by('matured_at', 'created_at', 'id')
+            .values_list('id', 'affiliate_id', 'amount', 'paid_amount')
+        ):
+            open_commissions.setdefault(affiliate_id, []).append([commission_id, amount, paid_amount])
+        return open_commissions
+    
+    @classmethod
+    def _check_cover(cls, payouts):
+        """
+        Keep the payouts whose affiliate's open commissions cover them.
+        
+        Payouts already processing in earlier batches are counted first, then
+        the given ones in order. Caller must hold the payout row locks.
+        
+        Args:
+            payouts: List of (payout_id, affiliate_id, amount)
+        
+        Returns:
+            tuple: ({payout_id: amount}, [(payout_id, reason)])
+        """
+        affiliate_ids = {affiliate_id for _, affiliate_id, _ in payouts}
+        remaining = {
+            affiliate_id: sum((amount - paid_amount for _, amount, paid_amount in rows), Decimal(0))
+            for affiliate_id, rows in cls._get_open_commissions(affiliate_ids).items()
+        }
+        for affiliate_id, total in (
+            Payout.objects.filter(affiliate_id__in=affiliate_ids, status='processing')
+            .order_by()
+            .values('affiliate_id')
+            .annotate(total=Sum('amount'))
+            .values_list('affiliate_id', 'total')
+        ):
+            remaining[affiliate_id] = remaining.get(affiliate_id, Decimal(0)) - total
+        
+        allocations = {}
+        skipped = []
+        for payout_id, affiliate_id, amount in payouts:
+            available = remaining.get(affiliate_id, Decimal(0))
+            if available < amount:
+                skipped.append((
+                    payout_id,
+                    f'Available commissions (Rp {max(available, 0):,.0f}) do not cover Rp {amount:,.0f}'
+                ))
+                continue
+            remaining[affiliate_id] = available - amount
+            allocations[payout_id] = amount
+        return allocations, skipped
+    
+    @classmethod
+    def get_transfer_rows(cls, batch, bank=None):
+        """Transfer lines of a batch ([reference, bank, account, holder, amount, remark]), grouped by bank."""
+        rows = batch.payouts.order_by('bank_name_snapshot', 'id').values_list(
+            'id', 'bank_name_snapshot', 'account_number_snapshot', 'account_holder_snapshot', 'amount'
+        )
+        for payout_id, bank_name, account_number, account_holder, amount in rows:
+            if bank and cls.bank_key(bank_name) != cls.bank_key(bank):
+                continue
+            yield [
+                PayoutBatch.line_reference(payout_id),
+                cls.bank_key(bank_name),
+                account_number,
+                account_holder,
+                amount,
+                f'Komisi Qutab {batch.reference}',
+            ]
+    
+    @classmethod
+    def build_transfer_files(cls, batch):
+        """
+        Build one CSV bulk-transfer file per bank.
+        
+        Returns:
+            dict: {filename: bytes}
+        """
+        files = {}
+        for bank in batch.bank_totals or {}:
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(cls.TRANSFER_FILE_HEADERS)
+            writer.writerows(cls.get_transfer_rows(batch, bank))
+            files[cls.transfer_filename(batch, bank)] = output.getvalue().encode()
+        return files
+    
+    @staticmethod
+    def transfer_filename(batch, bank):
+        slug = re.sub(r'[^A-Z0-9]+', '-', bank).strip('-') or 'BANK'
+        return f'{batch.reference}-{slug}.csv'
+    
+    @classmethod
+    def build_transfer_archive(cls, batch):
+        """All of a batch's transfer files in one zip (bytes)."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for filename, content in cls.build_transfer_files(batch).items():
+                archive.writestr(filename, content)
+        return buffer.getvalue()
+    
+    @classmethod
+    def parse_response(cls, content):
+        """
+        Parse a bank response CSV.
+        
+        Expected columns (case-insensitive): reference, status, and
+        optionally transfer_reference (or bank_reference) and message (or reason).
+        
+        Returns:
+            tuple: ({payout_id: (outcome, transfer_reference, message)}, [error strings])
+        """
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig')
+        reader = csv.DictReader(io.StringIO(content))
+        fields = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+        if 'reference' not in fields or 'status' not in fields:
+            return {}, ['Response file needs "reference" and "status" columns']
+        
+        def column(row, *names):
+            for name in names:
+                if name in fields:
+                    return (row.get(fields[name]) or '').strip()
+            return ''
+        
+        outcomes, errors = {}, []
+        for line, row in enumerate(reader, start=2):
+            payout_id = PayoutBatch.parse_line_reference(column(row, 'reference'))
+            status = column(row, 'status').lower()
+            if payout_id is None:
+                errors.append(f'Line {line}: unknown reference "{column(row, "reference")}"')
+            elif status in cls.SUCCESS_STATUSES:
+                outcomes[payout_id] = ('paid', column(row, 'transfer_reference', 'bank_reference'), '')
+            elif status in cls.FAILED_STATUSES:
+                outcomes[payout_id] = ('failed', '', column(row, 'message', 'reason') or 'Transfer failed')
+            else:
+                errors.append(f'Line {line}: unknown status "{status}"')
+        return outcomes, errors
+    
+    @classmethod
+    def settle(cls, outcomes):
+        """
+        Mark pending/processing payouts paid or failed in bulk.
+        
+        Each paid payout takes its amount from the affiliate's open available
+        commissions, oldest first: fully taken commissions are marked paid,
+        the last one may be taken in part (paid_amount) and stays available.
+        A payout the open commissions cannot cover (e.g. they were voided
+        since it was requested) is left as is and reported in 'errors'.
+        Everything runs in one transaction with explicit AffiliateBalance
+        and counter deltas.
+        
+        Args:
+            outcomes: {payout_id: ('paid' | 'failed', transfer_reference, message)}
+        
+        Returns:
+            dict: {'paid': [...], 'failed': [...], 'ignored': [...]} payout ids
+                  and 'errors' (payouts that could not be marked paid)
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                Payout.objects.select_for_update(of=('self',))
+                .filter(id__in=list(outcomes), status__in=['pending', 'processing'])
+                .order_by('created_at', 'id')
+                .values_list('id', 'affiliate_id', 'amount', 'batch_id')
+            )
+            settled = {row[0] for row in rows}
+            paid = [row for row in rows if outcomes[row[0]][0] == 'paid']
+            failed = [row for row in rows if outcomes[row[0]][0] == 'failed']
+            
+            balance_deltas = {}
+            
+            def add_balance(affiliate_id, **columns):
+                entry = balance_deltas.setdefault(affiliate_id, {})
+                for column, amount in columns.items():
+                    entry[column] = entry.get(column, Decimal(0)) + amount
             
-            if order.product:
-                rate = order.product.commission_rate
+            # Take each paid payout's amount from open commissions, oldest first
+            open_commissions = cls._get_open_commissions({row[1] for row in paid}, lock=True)
+            taken = {}
+            errors = []
+            covered = []
+            for payout_id, affiliate_id, amount, batch_id in paid:
+                commissions = open_commissions.get(affiliate_id, [])
+                available = sum((row[1] - row[2] for row in commissions), Decimal(0))
+                if available < amount:
+                    errors.append(
+                        f'Payout {payout_id} not marked paid: available commissions total '
+                        f'Rp {available:,.0f}, payout is Rp {amount:,.0f}'
+                    )
+                    continue
+                covered.append((payout_id, affiliate_id, amount, batch_id))
+                need = amount
+                while need:
+                    commission = commissions[0]
+                    take = min(commission[1] - commission[2], need)
+                    commission[2] += take
+                    need -= take
+                    taken[commission[0]] = (affiliate_id, commission[1], commission[2], payout_id)
+                    add_balance(affiliate_id, available=-take, paid=take)
+                    if commission[2] == commission[1]:
+                        commissions.pop(0)
+            if errors:
+                logger.error('; '.join(errors))
+            paid = covered
             
-            if affiliate.custom_commission_rate:
-                rate = affiliate.custom_commission_rate
+            if paid:
+                Payout.objects.filter(id__in=[row[0] for row in paid]).update(
+                    status='paid',
+                    transfer_date=now,
+                    processed_at=now,
+                    updated_at=now
+                )
+                Payout.objects.bulk_update([
+                    Payout(id=payout_id, transfer_reference=outcomes[payout_id][1][:100])
+                    for payout_id, _, _, _ in paid
+                    if outcomes[payout_id][1]
+                ], ['transfer_reference'], batch_size=500)
                 
-            # 6. Calculate Amount
-            # Base amount: Order Final Amount (Revenue)
-            amount = Commission.calculate_amount(order.final_amount, rate)
+                Commission.objects.bulk_update([
+                    Commission(
+                        id=commission_id,
+                        status='paid' if paid_amount == amount else 'available',
+                        paid_amount=paid_amount,
+                        payout_id=payout_id,
+                        updated_at=now
+                    )
+                    for commission_id, (_, amount, paid_amount, payout_id) in taken.items()
+                ], ['status', 'paid_amount', 'payout', 'updated_at'], batch_size=500)
+                
+                counter_deltas = {}
+                for _, amount, paid_amount, _ in taken.values():
+                    if paid_amount == amount:
+                        counters.add(counter_deltas, commission_count('available'), -1)
+                        counters.add(counter_deltas, commission_count('paid'), 1)
+                        counters.add(counter_deltas, commission_amount('available'), -amount)
+                        counters.add(counter_deltas, commission_amount('paid'), amount)
+                counters.incr_on_commit(counter_deltas)
+                
+                for _, affiliate_id, amount, _ in paid:
+                    add_balance(affiliate_id, reserved=-amount)
             
-            # 7. Create Commission
-            commission = Commission.objects.create(
-                affiliate=affiliate,
-                referral=referral,
-                order=order,
-                order_amount=order.final_amount,
-                commission_rate=rate,
-                amount=amount,
-                status='pending' # Always pending initially (waiting for maturation)
-            )
+            if failed:
+                # Banks send few distinct reasons: one update per reason
+                by_reason = {}
+                for payout_id, _, _, _ in failed:
+                    by_reason.setdefault(outcomes[payout_id][2][:255], []).append(payout_id)
+                for reason, payout_ids in by_reason.items():
+                    Payout.objects.filter(id__in=payout_ids).update(
+                        status='failed',
+                        rejection_reason=reason,
+                        processed_at=now,
+                        updated_at=now
+                    )
+                for _, affiliate_id, amount, _ in failed:
+                    add_balance(affiliate_id, reserved=-amount)
+            
+            # Bulk updates bypass save(), so move the balances here
+            for affiliate_id, columns in balance_deltas.items():
+                AffiliateBalance.apply_delta(affiliate_id, **columns)
             
-            return commission
+            for batch_id in {row[3] for row in rows if row[3]}:
+                cls._refresh_batch(batch_id, now)
+        
+        return {
+            'paid': [row[0] for row in paid],
+            'failed': [row[0] for row in failed],
+            'ignored': sorted(set(outcomes) - settled),
+            'errors': errors,
+        }
+    
+    @staticmethod
+    def _refresh_batch(batch_id, now):
+        """Recount a batch's settled payouts and close it once none is processing."""
+        totals = Payout.objects.filter(batch_id=batch_id).aggregate(
+            paid_count=Count('id', filter=Q(status='paid')),
+            paid_amount=Sum('amount', filter=Q(status='paid')),
+            failed_count=Count('id', filter=Q(status='failed')),
+            processing=Count('id', filter=Q(status='processing')),
+        )
+        updates = {
+            'paid_count': totals['paid_count'],
+            'paid_amount': totals['paid_amount'] or 0,
+            'failed_count': totals['failed_count'],
+        }
+        if not totals['processing']:
+            updates.update(status='completed', completed_at=now)
+        PayoutBatch.objects.filter(pk=batch_id).update(**updates)
+    
+    @classmethod
+    def ingest_response(cls, batch, content):
+        """
+        Apply a bank response file to a batch.
+        
+        Returns:
+            dict: settle() result plus 'errors' (unparseable lines and
+                  references that belong to another batch)
+        """
+        outcomes, errors = cls.parse_response(content)
+        in_batch = set(batch.payouts.filter(id__in=list(outcomes)).values_list('id', flat=True))
+        for payout_id in sorted(set(outcomes) - in_batch):
+            errors.append(f'{PayoutBatch.line_reference(payout_id)} is not in batch {batch.reference}')
+            del outcomes[payout_id]
+        
+        result = cls.settle(outcomes)
+        result['errors'] = errors + result['errors']
+        logger.info(
+            f'Payout batch {batch.reference}: {len(result["paid"])} paid, {len(result["failed"])} failed, '
+            f'{len(result["ignored"])} already settled, {len(result["errors"])} errors'
+        )
+        return result
@@ -4,7 +4,9 @@ from .views import (
     BankAccountListView, BankAccountDetailView,
     PayoutListView, PayoutRequestView,
     AdminBankAccountListView, AdminVerifyBankAccountView, AdminRejectBankAccountView, AdminDeleteBankAccountView,
-    AdminPayoutListView, AdminPayoutConfirmView, AdminPayoutRejectView,
+    AdminPayoutListView, AdminPayoutExportView, AdminPayoutConfirmView, AdminPayoutRejectView,
+    AdminCommissionExportView,
+    AdminPayoutBatchListView, AdminPayoutBatchDetailView, AdminPayoutBatchFileView, AdminPayoutBatchResponseView,
     CouponListView, CouponDetailView, CouponValidateView
 )
 
@@ -32,8 +34,18 @@ urlpatterns = [
     path('admin/bank-accounts/<int:pk>/reject/', AdminRejectBankAccountView.as_view(), name='admin-bank-account-reject'),
     path('admin/bank-accounts/<int:pk>/delete/', AdminDeleteBankAccountView.as_view(), name='admin-bank-account-delete'),
     
+    # Admin Commissions
+    path('admin/export/', AdminCommissionExportView.as_view(), name='admin-commission-export'),
+    
     # Admin Payouts
     path('admin/payouts/', AdminPayoutListView.as_view(), name='admin-payout-list'),
+    path('admin/payouts/export/', AdminPayoutExportView.as_view(), name='admin-payout-export'),
     path('admin/payouts/<int:pk>/confirm/', AdminPayoutConfirmView.as_view(), name='admin-payout-confirm'),
     path('admin/payouts/<int:pk>/reject/', AdminPayoutRejectView.as_view(), name='admin-payout-reject'),
+    
+    # Admin Payout Batches
+    path('admin/payout-batches/', AdminPayoutBatchListView.as_view(), name='admin-payout-batch-list'),
+    path('admin/payout-batches/<int:pk>/', AdminPayoutBatchDetailView.as_view(), name='admin-payout-batch-detail'),
+    path('admin/payout-batches/<int:pk>/file/', AdminPayoutBatchFileView.as_view(), name='admin-payout-batch-file'),
+    path('admin/payout-batches/<int:pk>/response/', AdminPayoutBatchResponseView.as_view(), name='admin-payout-batch-response'),
 ]
@@ -14,6 +14,8 @@ from .serializers import (
     PayoutSerializer, PayoutRequestSerializer
 )
 from apps.affiliates.models import Affiliate
+from apps.core.exports import StreamingExportMixin
+from apps.core.pagination import KeysetPagination
 
 
 class CommissionListView(generics.ListAPIView):
@@ -21,6 +23,7 @@ class CommissionListView(generics.ListAPIView):
     
     permission_classes = [IsAuthenticated]
     serializer_class = CommissionSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         try:
@@ -52,7 +55,7 @@ class CommissionSummaryView(APIView):
         return Response(CommissionSummarySerializer(summary).data)
 
 
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 class BankAccountListView(generics.ListCreateAPIView):
     """List and create bank accounts."""
@@ -248,10 +251,11 @@ from .serializers import AdminPayoutSerializer
 
 
 class AdminPayoutListView(generics.ListAPIView):
-    """Admin: List all payout requests."""
+    """Admin: List all payout requests (pending first; newest first with ?cursor=)."""
     
     permission_classes = [IsAdminUser]
     serializer_class = AdminPayoutSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = Payout.objects.all().select_related(
@@ -262,7 +266,7 @@ class AdminPayoutListView(generics.ListAPIView):
                 models.When(status='pending', then=0),
                 default=1
             ),
-            '-requested_at'
+            '-created_at'
         )
         
         # Filter by status
@@ -273,6 +277,72 @@ class AdminPayoutListView(generics.ListAPIView):
         return queryset
 
 
+class AdminPayoutExportView(StreamingExportMixin, AdminPayoutListView):
+    """
+    Admin: Stream all payouts matching the list filters as CSV or XLSX.
+    
+    Query params: status (as the list), type=csv|xlsx
+    """
+    
+    export_filename = 'payouts'
+    export_columns = [
+        ('Payout ID', 'id'),
+        ('Created At', 'created_at'),
+        ('Status', 'status'),
+        ('Affiliate Code', 'affiliate__affiliate_code'),
+        ('Affiliate Email', 'affiliate__user__email'),
+        ('Amount', 'amount'),
+        ('Bank', 'bank_name_snapshot'),
+        ('Account Number', 'account_number_snapshot'),
+        ('Account Holder', 'account_holder_snapshot'),
+        ('Transfer Reference', 'transfer_reference'),
+        ('Transfer Date', 'transfer_date'),
+        ('Processed At', 'processed_at'),
+        ('Rejection Reason', 'rejection_reason'),
+    ]
+
+
+class AdminCommissionExportView(StreamingExportMixin, generics.ListAPIView):
+    """
+    Admin: Stream all commissions as CSV or XLSX.
+    
+    Query params: status, affiliate_id, type=csv|xlsx
+    """
+    
+    permission_classes = [IsAdminUser]
+    export_filename = 'commissions'
+    export_columns = [
+        ('Commission ID', 'id'),
+        ('Created At', 'created_at'),
+        ('Status', 'status'),
+        ('Affiliate Code', 'affiliate__affiliate_code'),
+        ('Affiliate Email', 'affiliate__user__email'),
+        ('Order Number', 'order__order_number'),
+        ('Order Amount', 'order_amount'),
+        ('Rate (%)', 'commission_rate'),
+        ('Amount', 'amount'),
+        ('Paid Amount', 'paid_amount'),
+        ('Mature At', 'mature_at'),
+        ('Matured At', 'matured_at'),
+        ('Payout ID', 'payout_id'),
+        ('Voided At', 'voided_at'),
+        ('Voided Reason', 'voided_reason'),
+    ]
+    
+    def get_queryset(self):
+        queryset = Commission.objects.all().order_by('-created_at')
+        
+        status_param = self.request.query_params.get('status')
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+        
+        affiliate_id = self.request.query_params.get('affiliate_id')
+        if affiliate_id:
+            queryset = queryset.filter(affiliate_id=affiliate_id)
+        
+        return queryset
+
+
 class AdminPayoutConfirmView(APIView):
     """Admin: Confirm a payout request (mark as paid)."""
     
@@ -294,11 +364,14 @@ class AdminPayoutConfirmView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Mark as paid
-        payout.status = 'paid'
-        payout.transaction_id = transaction_id
-        payout.processed_at = timezone.now()
-        payout.save(update_fields=['status', 'transaction_id', 'processed_at'])
+        # Mark as paid (and the commissions it covers)
+        result = PayoutBatchService.settle({payout.id: ('paid', transaction_id, '')})
+        if payout.id not in result['paid']:
+            return Response(
+                {'error': result['errors'][0] if result['errors'] else 'Payout could not be marked paid'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        payout.refresh_from_db()
         
         return Response({
             'message': f'Payout confirmed. Transaction ID: {transaction_id}',
@@ -326,9 +399,9 @@ class AdminPayoutRejectView(APIView):
         # Find related pending commissions and make them available again
         # For now, we just mark as failed
         payout.status = 'failed'
-        payout.notes = reason
+        payout.rejection_reason = reason[:255]
         payout.processed_at = timezone.now()
-        payout.save(update_fields=['status', 'notes', 'processed_at'])
+        payout.save(update_fields=['status', 'rejection_reason', 'processed_at', 'updated_at'])
         
         return Response({
             'message': 'Payout rejected.',
@@ -337,6 +410,118 @@ class AdminPayoutRejectView(APIView):
         })
 
 
+# --- Admin Payout Batch Views ---
+
+from django.http import HttpResponse
+from .models import PayoutBatch
+from .serializers import PayoutBatchSerializer
+from .services import PayoutBatchService
+
+
+class AdminPayoutBatchListView(generics.ListCreateAPIView):
+    """
+    Admin: List payout batches, or start one (POST).
+    
+    POST locks every pending payout with a verified bank account into a
+    new batch. Body: limit (optional, oldest payouts first).
+    """
+    
+    permission_classes = [IsAdminUser]
+    serializer_class = PayoutBatchSerializer
+    queryset = PayoutBatch.objects.select_related('created_by')
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            limit = int(request.data.get('limit') or 0) or None
+        except (TypeError, ValueError):
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        batch, skipped = PayoutBatchService.create_batch(created_by=request.user, limit=limit)
+        skipped = [{'payout_id': payout_id, 'reason': reason} for payout_id, reason in skipped]
+        if batch is None:
+            return Response(
+                {'error': 'No pending payouts with a verified bank account to batch', 'skipped': skipped},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'message': f'Batch {batch.reference} created with {batch.payout_count} payouts.',
+            'batch': PayoutBatchSerializer(batch).data,
+            'skipped': skipped
+        }, status=status.HTTP_201_CREATED)
+
+
+class AdminPayoutBatchDetailView(generics.RetrieveAPIView):
+    """Admin: Payout batch totals."""
+    
+    permission_classes = [IsAdminUser]
+    serializer_class = PayoutBatchSerializer
+    queryset = PayoutBatch.objects.select_related('created_by')
+
+
+class AdminPayoutBatchFileView(APIView):
+    """
+    Admin: Download a batch's bulk-transfer files.
+    
+    Query params: bank (one bank's CSV; without it, a zip of every bank's file)
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, pk):
+        batch = get_object_or_404(PayoutBatch, pk=pk)
+        files = PayoutBatchService.build_transfer_files(batch)
+        
+        bank = request.query_params.get('bank')
+        if bank:
+            key = PayoutBatchService.bank_key(bank)
+            if key not in (batch.bank_totals or {}):
+                return Response(
+                    {'error': f'Bank not in batch. Must be one of: {list(batch.bank_totals)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filename = PayoutBatchService.transfer_filename(batch, key)
+            response = HttpResponse(files[filename], content_type='text/csv; charset=utf-8')
+        else:
+            filename = f'{batch.reference}.zip'
+            response = HttpResponse(PayoutBatchService.build_transfer_archive(batch), content_type='application/zip')
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class AdminPayoutBatchResponseView(APIView):
+    """
+    Admin: Ingest the bank's response file for a batch.
+    
+    Upload the CSV as `file` (multipart) or send it as `content`. Columns:
+    reference, status, transfer_reference, message.
+    """
+    
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    def post(self, request, pk):
+        batch = get_object_or_404(PayoutBatch, pk=pk)
+        
+        upload = request.FILES.get('file')
+        content = upload.read() if upload else request.data.get('content')
+        if not content:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = PayoutBatchService.ingest_response(batch, content)
+        except UnicodeDecodeError:
+            return Response({'error': 'Response file must be UTF-8 CSV'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        batch.refresh_from_db()
+        return Response({
+            'message': f'{len(result["paid"])} payouts paid, {len(result["failed"])} failed.',
+            'batch': PayoutBatchSerializer(batch).data,
+            **result
+        })
+
+
 # --- Coupon Views ---
 
 from .models import Coupon
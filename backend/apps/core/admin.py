@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Counter
+
+
+@admin.register(Counter)
+class CounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'affiliate', 'value', 'updated_at')
+    list_filter = ('name',)
+    search_fields = ('name', 'affiliate__affiliate_code')
+    readonly_fields = ('name', 'affiliate', 'value', 'updated_at')
@@ -0,0 +1,340 @@
+"""
+Live counters for clicks, conversions, commissions and revenue.
+
+Writers add to sharded in-process dicts (each thread sticks to one shard,
+so increments rarely contend on a lock) and return immediately. A
+background thread merges the shards every COUNTER_FLUSH_INTERVAL seconds
+and applies them to the live_counters table with one F() increment per
+counter, so concurrent processes never overwrite each other. Readers get
+the stored value plus this process's unflushed deltas: one indexed lookup,
+whatever the size of the source tables.
+
+Counters are bumped by click ingestion, Referral saves (conversions),
+process_payment_success (paid orders and revenue) and Commission status
+changes, including the bulk maturation/void updates, and taken back by
+pre/post_delete receivers when referrals, commissions, paid orders or
+affiliates (their clicks) are deleted, cascades included. `rebuild_counters`
+recomputes every counter from the source tables to verify or repair them.
+"""
+
+import atexit
+import itertools
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+CLICKS = 'clicks'                        # global and per affiliate
+CONVERSIONS = 'conversions'              # referrals, global and per affiliate
+COMMISSION_EARNED = 'commission_earned'  # all commission amounts, global and per affiliate
+COMMISSIONS = 'commissions'              # number of commissions, global and per affiliate
+ORDERS_PAID = 'orders_paid'
+REVENUE_PAID = 'revenue_paid'
+
+
+def commission_count(status):
+    return f'commissions_{status}'
+
+
+def commission_amount(status):
+    return f'commission_amount_{status}'
+
+
+class CounterService:
+    """Sharded in-process counters with a periodic F() flusher."""
+    
+    def __init__(self, shards=None, flush_interval=None):
+        self.shard_count = shards or getattr(settings, 'COUNTER_SHARDS', 16)
+        self.flush_interval = flush_interval or getattr(settings, 'COUNTER_FLUSH_INTERVAL', 5.0)
+        
+        self._shards = [({}, threading.Lock()) for _ in range(self.shard_count)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        
+        self.metrics = {
+            'flushes': 0,
+            'flushed_counters': 0,
+            'failed': 0,
+            'last_flush_at': None,
+        }
+    
+    @staticmethod
+    def add(deltas, name, amount, affiliate_id=None):
+        """Add `amount` to the global counter `name` in `deltas` (and the affiliate's, if given)."""
+        for key in [(name, None)] + ([(name, affiliate_id)] if affiliate_id else []):
+            deltas[key] = deltas.get(key, 0) + int(amount)
+        return deltas
+    
+    def incr(self, name, amount=1, affiliate_id=None):
+        """Add `amount` to one counter (global when affiliate_id is None)."""
+        self.incr_many({(name, affiliate_id): amount})
+    
+    def incr_many(self, deltas):
+        """
+        Add {(name, affiliate_id): amount} to this thread's shard.
+        
+        Set COUNTER_FLUSH_ASYNC=False to write every increment immediately.
+        """
+        deltas = {key: int(amount) for key, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        
+        pending, lock = self._get_shard()
+        with lock:
+            for key, amount in deltas.items():
+                pending[key] = pending.get(key, 0) + amount
+        
+        if not getattr(settings, 'COUNTER_FLUSH_ASYNC', True):
+            self.flush()
+            return
+        self._ensure_started()
+    
+    def incr_on_commit(self, deltas):
+        """Apply `deltas` once the current transaction commits (dropped on rollback)."""
+        transaction.on_commit(lambda: self.incr_many(deltas))
+    
+    def get(self, name, affiliate_id=None):
+        return self.get_many([name], affiliate_id)[name]
+    
+    def get_many(self, names, affiliate_id=None):
+        """
+        Read several counters of one scope with a single query.
+        
+        Returns:
+            dict: {name: stored value + this process's unflushed delta}
+        """
+        from .models import Counter
+        
+        stored = dict(
+            Counter.objects.filter(name__in=names, affiliate_id=affiliate_id).values_list('name', 'value')
+        )
+        keys = [(name, affiliate_id) for name in names]
+        pending = self._pending_for(keys)
+        return {name: stored.get(name, 0) + pending.get((name, affiliate_id), 0) for name in names}
+    
+    def flush(self):
+        """Write all pending deltas. Returns the number of counters updated."""
+        with self._flush_lock:
+            pending = self._drain()
+            if not pending:
+                return 0
+            
+            try:
+                self._write(pending)
+            except Exception as e:
+                logger.error(f'Failed to flush {len(pending)} counters: {e}')
+                # Keep the deltas for the next flush
+                self._merge(pending)
+                self.metrics['failed'] += 1
+                return 0
+            
+            self.metrics['flushes'] += 1
+            self.metrics['flushed_counters'] += len(pending)
+            self.metrics['last_flush_at'] = timezone.now().isoformat()
+            return len(pending)
+    
+    def get_metrics(self):
+        """Return flusher metrics and the number of counters waiting to be flushed."""
+        buffered = 0
+        for pending, lock in self._shards:
+            with lock:
+                buffered += len(pending)
+        return {**self.metrics, 'buffered': buffered, 'shards': self.shard_count}
+    
+    def shutdown(self):
+        """Stop the flusher thread and flush remaining deltas."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+    
+    def compute_from_source(self, get_model=None):
+        """
+        Compute every counter from the source tables.
+        
+        Args:
+            get_model: Model lookup (defaults to the app registry; migrations
+                pass their historical `apps.get_model`)
+        
+        Returns:
+            dict: {(name, affiliate_id): value}
+        """
+        if get_model is None:
+            from django.apps import apps
+            get_model = apps.get_model
+        
+        ReferralClick = get_model('affiliates', 'ReferralClick')
+        ClickRollup = get_model('affiliates', 'ClickRollup')
+        Referral = get_model('affiliates', 'Referral')
+        Commission = get_model('commissions', 'Commission')
+        Order = get_model('orders', 'Order')
+        
+        def grouped(queryset, fields, aggregate):
+            return queryset.order_by().values_list(*fields).annotate(total=aggregate)
+        
+        values = {}
+        # Pruned clicks live on as hourly rollups
+        for affiliate_id, total in grouped(ReferralClick.objects.all(), ['affiliate_id'], Count('id')):
+            self.add(values, CLICKS, total, affiliate_id)
+        for affiliate_id, total in grouped(ClickRollup.objects.all(), ['affiliate_id'], Sum('clicks')):
+            self.add(values, CLICKS, total or 0, affiliate_id)
+        for affiliate_id, total in grouped(Referral.objects.all(), ['affiliate_id'], Count('id')):
+            self.add(values, CONVERSIONS, total, affiliate_id)
+        
+        commissions = grouped(Commission.objects.all(), ['affiliate_id', 'status'], Count('id')).annotate(amount=Sum('amount'))
+        for affiliate_id, status, count, amount in commissions:
+            self.add(values, COMMISSION_EARNED, amount or 0, affiliate_id)
+            self.add(values, COMMISSIONS, count, affiliate_id)
+            self.add(values, commission_count(status), count)
+            self.add(values, commission_amount(status), amount or 0)
+        
+        paid = Order.objects.filter(paid_at__isnull=False).aggregate(count=Count('id'), revenue=Sum('final_amount'))
+        self.add(values, ORDERS_PAID, paid['count'])
+        self.add(values, REVENUE_PAID, paid['revenue'] or 0)
+        return values
+    
+    def rebuild(self, dry_run=False):
+        """
+        Compare stored counters with the source tables and overwrite them.
+        
+        Pending deltas are flushed first. Increments flushed by other
+        processes while the rebuild runs can be lost, so run it when
+        traffic is low.
+        
+        Returns:
+            list: (name, affiliate_id, stored, actual) for every counter that drifted
+        """
+        from .models import Counter
+        
+        self.flush()
+        with transaction.atomic():
+            actual = self.compute_from_source()
+            rows = {(row.name, row.affiliate_id): row for row in Counter.objects.select_for_update()}
+            
+            drift = []
+            for key in sorted(set(actual) | set(rows), key=lambda key: (key[0], key[1] or 0)):
+                stored = rows[key].value if key in rows else 0
+                if stored != actual.get(key, 0):
+                    drift.append((*key, stored, actual.get(key, 0)))
+            
+            if not dry_run:
+                now = timezone.now()
+                to_update = []
+                for name, affiliate_id, stored, value in drift:
+                    row = rows.get((name, affiliate_id))
+                    if row is None:
+                        rows[(name, affiliate_id)] = Counter(name=name, affiliate_id=affiliate_id, value=value)
+                    else:
+                        row.value = value
+                        row.updated_at = now
+                        to_update.append(row)
+                Counter.objects.bulk_create([row for row in rows.values() if row.pk is None])
+                Counter.objects.bulk_update(to_update, ['value', 'updated_at'])
+        return drift
+    
+    def commission_deltas(self, old_state, new_state):
+        """
+        Counter deltas for a commission moving between (affiliate_id, status, amount)
+        states. `old_state` is None for a new commission.
+        """
+        deltas = {}
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if not state or state[1] is None:
+                continue
+            affiliate_id, status, amount = state[:3]
+            amount = int(amount or 0)
+            self.add(deltas, COMMISSION_EARNED, sign * amount, affiliate_id)
+            self.add(deltas, COMMISSIONS, sign, affiliate_id)
+            self.add(deltas, commission_count(status), sign)
+            self.add(deltas, commission_amount(status), sign * amount)
+        return deltas
+    
+    def _get_shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next_shard) % self.shard_count]
+        return shard
+    
+    def _pending_for(self, keys):
+        totals = {}
+        for pending, lock in self._shards:
+            with lock:
+                for key in keys:
+                    if key in pending:
+                        totals[key] = totals.get(key, 0) + pending[key]
+        return totals
+    
+    def _drain(self):
+        merged = {}
+        for pending, lock in self._shards:
+            with lock:
+                items = list(pending.items())
+                pending.clear()
+            for key, amount in items:
+                merged[key] = merged.get(key, 0) + amount
+        return {key: amount for key, amount in merged.items() if amount}
+    
+    def _merge(self, deltas):
+        pending, lock = self._get_shard()
+        with lock:
+            for key, amount in deltas.items():
+                pending[key] = pending.get(key, 0) + amount
+    
+    def _write(self, pending):
+        from apps.affiliates.models import Affiliate
+        from .models import Counter
+        
+        # Rows of deleted affiliates went with them: drop their deltas
+        affiliate_ids = {affiliate_id for _, affiliate_id in pending if affiliate_id}
+        if affiliate_ids:
+            existing = set(Affiliate.objects.filter(pk__in=affiliate_ids).values_list('pk', flat=True))
+            pending = {key: amount for key, amount in pending.items() if not key[1] or key[1] in existing}
+        
+        now = timezone.now()
+        # Same lock order in every process
+        items = sorted(pending.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+        with transaction.atomic():
+            Counter.objects.bulk_create(
+                [Counter(name=name, affiliate_id=affiliate_id) for (name, affiliate_id), _ in items],
+                ignore_conflicts=True
+            )
+            for (name, affiliate_id), amount in items:
+                Counter.objects.filter(name=name, affiliate_id=affiliate_id).update(
+                    value=F('value') + amount,
+                    updated_at=now
+                )
+    
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+    
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Counter flush failed: {e}')
+            finally:
+                close_old_connections()
+
+
+# Singleton instance
+counters = CounterService()
@@ -0,0 +1,42 @@
+"""
+Django management command to reconcile the live counters.
+
+Flushes this process's pending increments, recomputes every counter
+(clicks, conversions, commissions by status, paid orders and revenue) from
+the source tables, reports drifted counters and overwrites them.
+
+Usage:
+    python manage.py rebuild_counters
+    python manage.py rebuild_counters --dry-run
+
+Schedule with cron (a quiet hour; increments flushed meanwhile can be lost):
+    50 0 * * * cd /path/to/backend && python manage.py rebuild_counters
+"""
+
+from django.core.management.base import BaseCommand
+from apps.core.counters import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute live counters from source tables and report drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without rewriting counters'
+        )
+    
+    def handle(self, *args, **options):
+        drift = counters.rebuild(dry_run=options['dry_run'])
+        
+        for name, affiliate_id, stored, actual in drift:
+            scope = f'affiliate #{affiliate_id}' if affiliate_id else 'global'
+            self.stdout.write(f'  - {name} ({scope}): {stored:,} -> {actual:,}')
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\n=== DRY RUN MODE ==='))
+            self.stdout.write(f'{len(drift)} counters drifted')
+            return
+        
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(drift)} drifted counters rewritten'))
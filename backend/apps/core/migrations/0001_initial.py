@@ -0,0 +1,82 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_counters(apps, schema_editor):
+    """
+    Start the live counters from the current source tables.
+    
+    The aggregation is inlined (not CounterService.compute_from_source) so
+    later changes to apps.core.counters cannot change this migration.
+    """
+    Counter = apps.get_model('core', 'Counter')
+    ReferralClick = apps.get_model('affiliates', 'ReferralClick')
+    ClickRollup = apps.get_model('affiliates', 'ClickRollup')
+    Referral = apps.get_model('affiliates', 'Referral')
+    Commission = apps.get_model('commissions', 'Commission')
+    Order = apps.get_model('orders', 'Order')
+
+    values = {}
+
+    def add(name, amount, affiliate_id=None):
+        for key in [(name, None)] + ([(name, affiliate_id)] if affiliate_id else []):
+            values[key] = values.get(key, 0) + int(amount or 0)
+
+    def grouped(queryset, fields, aggregate):
+        return queryset.order_by().values_list(*fields).annotate(total=aggregate)
+
+    # Pruned clicks live on as hourly rollups
+    for affiliate_id, total in grouped(ReferralClick.objects.all(), ['affiliate_id'], Count('id')):
+        add('clicks', total, affiliate_id)
+    for affiliate_id, total in grouped(ClickRollup.objects.all(), ['affiliate_id'], Sum('clicks')):
+        add('clicks', total, affiliate_id)
+    for affiliate_id, total in grouped(Referral.objects.all(), ['affiliate_id'], Count('id')):
+        add('conversions', total, affiliate_id)
+
+    commissions = grouped(Commission.objects.all(), ['affiliate_id', 'status'], Count('id')).annotate(amount=Sum('amount'))
+    for affiliate_id, status, count, amount in commissions:
+        add('commission_earned', amount, affiliate_id)
+        add(f'commissions_{status}', count)
+        add(f'commission_amount_{status}', amount)
+
+    paid = Order.objects.filter(paid_at__isnull=False).aggregate(count=Count('id'), revenue=Sum('final_amount'))
+    add('orders_paid', paid['count'])
+    add('revenue_paid', paid['revenue'])
+
+    Counter.objects.bulk_create([
+        Counter(name=name, affiliate_id=affiliate_id, value=value)
+        for (name, affiliate_id), value in values.items()
+        if value
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('affiliates', '0007_dashboardsnapshot'),
+        ('commissions', '0008_commission_commissions_affilia_4e019d_idx_and_more'),
+        ('orders', '0004_remove_order_orders_status_11db6c_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('affiliate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='affiliates.affiliate')),
+            ],
+            options={
+                'db_table': 'live_counters',
+                'constraints': [models.UniqueConstraint(fields=('name', 'affiliate'), name='unique_counter_per_affiliate'), models.UniqueConstraint(condition=models.Q(('affiliate__isnull', True)), fields=('name',), name='unique_global_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
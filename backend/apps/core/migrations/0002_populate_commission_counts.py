@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:05
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def populate_commission_counts(apps, schema_editor):
+    """Start the 'commissions' counters (global and per affiliate) from the Commission table."""
+    Counter = apps.get_model('core', 'Counter')
+    Commission = apps.get_model('commissions', 'Commission')
+
+    values = {}
+    for affiliate_id, total in Commission.objects.order_by().values_list('affiliate_id').annotate(total=Count('id')):
+        values[None] = values.get(None, 0) + total
+        values[affiliate_id] = total
+
+    Counter.objects.filter(name='commissions').delete()
+    Counter.objects.bulk_create([
+        Counter(name='commissions', affiliate_id=affiliate_id, value=value)
+        for affiliate_id, value in values.items()
+        if value
+    ], batch_size=1000)
+
+
+def remove_commission_counts(apps, schema_editor):
+    apps.get_model('core', 'Counter').objects.filter(name='commissions').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_commission_counts, remove_commission_counts),
+    ]
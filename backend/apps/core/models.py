@@ -0,0 +1,35 @@
+from django.db import models
+from django.db.models import Q
+
+
+class Counter(models.Model):
+    """
+    Persisted value of a live counter (see apps.core.counters).
+    
+    One row per (name, affiliate); affiliate is null for the site-wide
+    total. Values only change through F() increments from the counter
+    flusher and through `rebuild_counters`.
+    """
+    
+    name = models.CharField(max_length=50)
+    affiliate = models.ForeignKey(
+        'affiliates.Affiliate',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='counters'
+    )
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'live_counters'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'affiliate'], name='unique_counter_per_affiliate'),
+            # NULLs are distinct in the constraint above
+            models.UniqueConstraint(fields=['name'], condition=Q(affiliate__isnull=True), name='unique_global_counter'),
+        ]
+    
+    def __str__(self):
+        scope = f"affiliate {self.affiliate_id}" if self.affiliate_id else "global"
+        return f"{self.name} ({scope}) = {self.value}"
@@ -0,0 +1,123 @@
+"""
+Keyset (cursor) pagination for high-volume list endpoints.
+
+Views opt in with `pagination_class = KeysetPagination`. Without a
+`cursor` query param they keep the page-number behaviour; with `?cursor=`
+(empty for the first page) they return newest-first pages over
+(created_at, id):
+
+    WHERE created_at <= :ts AND NOT (created_at = :ts AND id >= :id)
+    ORDER BY created_at DESC, id DESC LIMIT page_size + 1
+
+which walks a (created_at, id) index, so page N costs the same as page 1
+and no COUNT(*) is run. Pass `count=approx` to get an approximate total in
+the X-Approximate-Count header (the planner's row estimate on PostgreSQL).
+"""
+
+import base64
+import json
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.db import connection
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Approximate row count of a queryset.
+    
+    Uses the planner's estimate on PostgreSQL (no table scan); other
+    databases fall back to an exact COUNT(*).
+    """
+    queryset = queryset.order_by()
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page numbers by default, (created_at, id) keyset pages when ?cursor= is given."""
+    
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_header = 'X-Approximate-Count'
+    ordering_field = 'created_at'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.ordering_field
+        
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.approximate_count = estimate_count(queryset)
+        
+        queryset = queryset.order_by(f'-{field}', '-id')
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position:
+            value, pk = position
+            try:
+                pk = queryset.model._meta.pk.to_python(pk)
+            except ValidationError:
+                raise NotFound('Invalid cursor.')
+            queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'id__gte': pk})
+        
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            self.next_position = (getattr(last, field), last.pk)
+        return rows[:page_size]
+    
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        
+        response = Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+        if self.approximate_count is not None:
+            response[self.count_header] = str(self.approximate_count)
+        return response
+    
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+    
+    @staticmethod
+    def encode_cursor(position):
+        value, pk = position
+        raw = f'{value.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(encoded):
+        """Return (datetime, raw id) for a cursor, or None for the first page."""
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+            value, pk = raw.split('|')
+            return datetime.fromisoformat(value), pk
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor.')
@@ -0,0 +1,194 @@
+"""
+System statistics service for the admin dashboard.
+
+Every counter comes from one grouped query per table. Results are cached
+with stale-while-revalidate semantics: within STATS_FRESH_SECONDS the cached
+copy is served as-is, after that the stale copy is still served while a
+single background thread recomputes it. get_live() reads the live
+counters (apps.core.counters) instead and is never cached.
+"""
+
+import logging
+import threading
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class SystemStatsService:
+    """Compute and cache admin dashboard counters."""
+    
+    CACHE_KEY = 'system_stats'
+    LOCK_KEY = 'system_stats:refreshing'
+    
+    # Serve without revalidating for this long
+    FRESH_SECONDS = getattr(settings, 'STATS_FRESH_SECONDS', 30)
+    # Keep the stale copy around for this long
+    STALE_SECONDS = getattr(settings, 'STATS_STALE_SECONDS', 10 * 60)
+    
+    @classmethod
+    def get_stats(cls, fresh=False):
+        """
+        Get system statistics.
+        
+        Args:
+            fresh: Bypass the cache and recompute synchronously
+        
+        Returns:
+            dict: Stats payload including 'generated_at'
+        """
+        if not fresh:
+            entry = cache.get(cls.CACHE_KEY)
+            if entry is not None:
+                age = timezone.now().timestamp() - entry['computed_at']
+                if age > cls.FRESH_SECONDS:
+                    cls._revalidate_in_background()
+                return entry['stats']
+        
+        return cls.refresh()
+    
+    @classmethod
+    def refresh(cls):
+        """Recompute stats and store them in the cache."""
+        stats = cls.compute()
+        cache.set(
+            cls.CACHE_KEY,
+            {'stats': stats, 'computed_at': timezone.now().timestamp()},
+            cls.STALE_SECONDS
+        )
+        return stats
+    
+    @staticmethod
+    def get_live():
+        """Site-wide totals from the live counters (one query, no cache)."""
+        from apps.commissions.models import Commission
+        from apps.core.counters import (
+            counters, CLICKS, CONVERSIONS, COMMISSION_EARNED, ORDERS_PAID, REVENUE_PAID,
+            commission_count, commission_amount,
+        )
+        
+        statuses = [status for status, _ in Commission.STATUS_CHOICES]
+        names = [CLICKS, CONVERSIONS, COMMISSION_EARNED, ORDERS_PAID, REVENUE_PAID]
+        for status in statuses:
+            names += [commission_count(status), commission_amount(status)]
+        values = counters.get_many(names)
+        
+        return {
+            'clicks': values[CLICKS],
+            'conversions': values[CONVERSIONS],
+            'orders_paid': values[ORDERS_PAID],
+            'revenue_paid': float(values[REVENUE_PAID]),
+            'commission_earned': float(values[COMMISSION_EARNED]),
+            'commissions': {
+                status: {
+                    'count': values[commission_count(status)],
+                    'amount': float(values[commission_amount(status)]),
+                }
+                for status in statuses
+            },
+        }
+    
+    @classmethod
+    def _revalidate_in_background(cls):
+        # Only one refresher at a time across all requests
+        if not cache.add(cls.LOCK_KEY, True, cls.FRESH_SECONDS):
+            return
+        
+        def run():
+            try:
+                cls.refresh()
+            except Exception as e:
+                logger.error(f'Failed to refresh system stats: {e}')
+            finally:
+                cache.delete(cls.LOCK_KEY)
+                close_old_connections()
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    @staticmethod
+    def _count_by(queryset, field):
+        """Return {value: count} from one GROUP BY query."""
+        return dict(
+            queryset.order_by().values(field).annotate(count=Count('id')).values_list(field, 'count')
+        )
+    
+    @classmethod
+    def compute(cls):
+        """Compute all counters with one grouped query per table."""
+        from apps.affiliates.models import Affiliate
+        from apps.commissions.models import Commission
+        from apps.orders.models import Order
+        from apps.products.models import Product
+        
+        User = get_user_model()
+        
+        users = cls._count_by(User.objects.all(), 'role')
+        affiliates = cls._count_by(Affiliate.objects.all(), 'status')
+        
+        orders = Order.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='completed')),
+            pending=Count('id', filter=Q(status='pending')),
+            mock_tests=Count('id', filter=Q(payment_method='mock_test')),
+            revenue=Sum('final_amount', filter=Q(status='completed')),
+        )
+        
+        commissions = {
+            row['status']: row
+            for row in Commission.objects.order_by().values('status').annotate(
+                count=Count('id'),
+                total=Sum('amount'),
+            )
+        }
+        
+        products = Product.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            featured=Count('id', filter=Q(is_featured=True)),
+        )
+        
+        total_revenue = orders['revenue'] or 0
+        total_commissions = sum((row['total'] or 0) for row in commissions.values())
+        
+        return {
+            'users': {
+                'total': sum(users.values()),
+                'customers': users.get('customer', 0),
+                'affiliates': users.get('affiliate', 0),
+                'admins': users.get('admin', 0),
+            },
+            'affiliates': {
+                'total': sum(affiliates.values()),
+                'pending': affiliates.get('pending', 0),
+                'approved': affiliates.get('approved', 0),
+                'rejected': affiliates.get('rejected', 0),
+            },
+            'orders': {
+                'total': orders['total'],
+                'completed': orders['completed'],
+                'pending': orders['pending'],
+                'mock_tests': orders['mock_tests'],
+            },
+            'commissions': {
+                'total': sum(row['count'] for row in commissions.values()),
+                'pending': commissions.get('pending', {}).get('count', 0),
+                'available': commissions.get('available', {}).get('count', 0),
+                'paid': commissions.get('paid', {}).get('count', 0),
+            },
+            'products': {
+                'total': products['total'],
+                'active': products['active'],
+                'featured': products['featured'],
+            },
+            'financial': {
+                'total_revenue': float(total_revenue),
+                'total_commissions': float(total_commissions),
+                'commission_rate': round((float(total_commissions) / float(total_revenue) * 100) if total_revenue > 0 else 0, 2),
+            },
+            'generated_at': timezone.now().isoformat(),
+        }
@@ -6,8 +6,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, F, OuterRef, Subquery, Value, DecimalField, IntegerField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
@@ -25,7 +27,12 @@ def is_admin(user):
 
 
 class SystemStatsView(APIView):
-    """Get system-wide statistics for admin dashboard."""
+    """
+    Get system-wide statistics for admin dashboard.
+    
+    Served from a short-lived cache; pass ?fresh=1 to recompute. The
+    'live' block comes from the live counters and is never cached.
+    """
     
     permission_classes = [IsAuthenticated]
     
@@ -34,59 +41,24 @@ class SystemStatsView(APIView):
         if not is_admin(request.user):
             return Response({'error': 'Admin access required'}, status=403)
         
-        # Basic counts
-        stats = {
-            'users': {
-                'total': User.objects.count(),
-                'customers': User.objects.filter(role='customer').count(),
-                'affiliates': User.objects.filter(role='affiliate').count(),
-                'admins': User.objects.filter(role='admin').count(),
-            },
-            'affiliates': {
-                'total': Affiliate.objects.count(),
-                'pending': Affiliate.objects.filter(status='pending').count(),
-                'approved': Affiliate.objects.filter(status='approved').count(),
-                'rejected': Affiliate.objects.filter(status='rejected').count(),
-            },
-            'orders': {
-                'total': Order.objects.count(),
-                'completed': Order.objects.filter(status='completed').count(),
-                'pending': Order.objects.filter(status='pending').count(),
-                'mock_tests': Order.objects.filter(payment_method='mock_test').count(),
-            },
-            'commissions': {
-                'total': Commission.objects.count(),
-                'pending': Commission.objects.filter(status='pending').count(),
-                'available': Commission.objects.filter(status='available').count(),
-                'paid': Commission.objects.filter(status='paid').count(),
-            },
-            'products': {
-                'total': Product.objects.count(),
-                'active': Product.objects.filter(is_active=True).count(),
-                'featured': Product.objects.filter(is_featured=True).count(),
-            }
-        }
-        
-        # Financial summary
-        total_revenue = Order.objects.filter(status='completed').aggregate(
-            total=Sum('final_amount')
-        )['total'] or 0
-        
-        total_commissions = Commission.objects.aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        stats['financial'] = {
-            'total_revenue': float(total_revenue),
-            'total_commissions': float(total_commissions),
-            'commission_rate': round((float(total_commissions) / float(total_revenue) * 100) if total_revenue > 0 else 0, 2)
-        }
+        from apps.core.services.stats import SystemStatsService
         
-        return Response(stats)
+        fresh = request.query_params.get('fresh') in ['1', 'true']
+        return Response({
+            **SystemStatsService.get_stats(fresh=fresh),
+            'live': SystemStatsService.get_live(),
+        })
 
 
 class TopPerformersView(APIView):
-    """Get top performing affiliates."""
+    """
+    Get top performing affiliates.
+    
+    Query params:
+        metric: earned (default), conversions, clicks, conversion_rate
+        window: 7, 30, 90 (days, from DailyStats) or all (default)
+        limit: number of affiliates (default 10, max 100)
+    """
     
     permission_classes = [IsAuthenticated]
     
@@ -94,96 +66,160 @@ class TopPerformersView(APIView):
         if not is_admin(request.user):
             return Response({'error': 'Admin access required'}, status=403)
         
-        # Top affiliates by commission earned
-        top_affiliates = []
-        
-        for affiliate in Affiliate.objects.filter(status='approved'):
-            commissions = Commission.objects.filter(affiliate=affiliate)
-            total_earned = commissions.aggregate(total=Sum('amount'))['total'] or 0
-            referrals_count = affiliate.referrals.count()
-            clicks_count = affiliate.clicks.count()
-            
-            conversion_rate = (referrals_count / clicks_count * 100) if clicks_count > 0 else 0
-            
-            top_affiliates.append({
-                'id': affiliate.id,
-                'name': affiliate.user.get_full_name(),
-                'email': affiliate.user.email,
-                'affiliate_code': affiliate.affiliate_code,
-                'total_earned': float(total_earned),
-                'commissions_count': commissions.count(),
-                'referrals_count': referrals_count,
-                'clicks_count': clicks_count,
-                'conversion_rate': round(conversion_rate, 2),
-                'joined_date': affiliate.created_at.isoformat(),
-            })
+        from apps.affiliates.services import LeaderboardService
         
-        # Sort by total earned
-        top_affiliates.sort(key=lambda x: x['total_earned'], reverse=True)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
         
-        return Response({
-            'top_performers': top_affiliates[:10],
-            'total_affiliates': len(top_affiliates)
-        })
+        try:
+            leaderboard = LeaderboardService.get_leaderboard(
+                metric=request.query_params.get('metric', 'earned'),
+                window=request.query_params.get('window', 'all'),
+                limit=limit,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(leaderboard)
 
 
 # ============================================================
 # ADMIN AFFILIATE MANAGEMENT VIEWS
 # ============================================================
 
+def annotate_affiliate_totals(queryset):
+    """
+    Annotate affiliates with commission totals and referral count.
+    
+    Uses correlated subqueries so the whole listing is one query and the
+    totals can be filtered and sorted in the database.
+    """
+    from apps.affiliates.models import Referral
+    
+    def commission_sum(field='amount', **filters):
+        return Coalesce(
+            Subquery(
+                Commission.objects.filter(affiliate_id=OuterRef('pk'), **filters)
+                .order_by()
+                .values('affiliate_id')
+                .annotate(total=Sum(field))
+                .values('total'),
+                output_field=DecimalField(max_digits=14, decimal_places=0)
+            ),
+            Value(0),
+            output_field=DecimalField(max_digits=14, decimal_places=0)
+        )
+    
+    referral_count = Coalesce(
+        Subquery(
+            Referral.objects.filter(affiliate_id=OuterRef('pk'))
+            .order_by()
+            .values('affiliate_id')
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+    
+    return queryset.annotate(
+        total_earned=commission_sum(),
+        # Partly paid-out commissions stay available with their paid_amount
+        paid_commission=commission_sum(status='paid') + commission_sum('paid_amount', status__in=['available', 'voided']),
+        referral_count=referral_count,
+    ).annotate(
+        outstanding_balance=F('total_earned') - F('paid_commission')
+    )
+
+
+def serialize_admin_affiliate(aff):
+    """Serialize an affiliate annotated by annotate_affiliate_totals()."""
+    return {
+        'id': aff.id,
+        'user': {
+            'id': aff.user.id,
+            'email': aff.user.email,
+            'full_name': aff.user.get_full_name() or aff.user.email,
+            'first_name': aff.user.first_name,
+            'last_name': aff.user.last_name,
+        },
+        'affiliate_code': aff.affiliate_code,
+        'status': aff.status,
+        'phone_number': aff.whatsapp,
+        'city': aff.city,
+        'instagram_handle': aff.instagram,
+        'tiktok_handle': aff.tiktok,
+        'youtube_handle': aff.youtube,
+        'facebook_handle': aff.facebook,
+        'platform': aff.primary_platform,
+        'reason': aff.reason,
+        'rejection_reason': aff.rejection_reason,
+        'date_joined': aff.created_at.isoformat(),
+        'approved_at': aff.approved_at.isoformat() if aff.approved_at else None,
+        'referral_count': aff.referral_count,
+        'balance': float(aff.outstanding_balance),
+        'paid_commission': float(aff.paid_commission),
+        'total_earned': float(aff.total_earned),
+    }
+
+
+class AdminAffiliatePagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
 class AdminAffiliateListView(APIView):
-    """List all affiliates for admin dashboard."""
+    """
+    List affiliates for admin dashboard.
+    
+    Query params:
+        status: pending/approved/rejected/suspended (or 'all')
+        ordering: one of SORT_FIELDS, prefix with '-' for descending
+        page, page_size: server-side pagination
+    """
     
     permission_classes = [IsAuthenticated]
     
+    SORT_FIELDS = {
+        'total_earned': 'total_earned',
+        'paid_commission': 'paid_commission',
+        'balance': 'outstanding_balance',
+        'referral_count': 'referral_count',
+        'date_joined': 'created_at',
+        'id': 'id',
+    }
+    
     def get(self, request):
         if not is_admin(request.user):
             return Response({'error': 'Admin access required'}, status=403)
         
-        # Get all affiliates with related user data
-        affiliates = Affiliate.objects.select_related('user').all().order_by('-created_at')
+        affiliates = Affiliate.objects.select_related('user')
         
         # Optional status filter
         status_filter = request.query_params.get('status')
         if status_filter and status_filter != 'all':
             affiliates = affiliates.filter(status=status_filter)
         
-        result = []
-        for aff in affiliates:
-            # Get commission data
-            commissions = Commission.objects.filter(affiliate=aff)
-            total_earned = commissions.aggregate(total=Sum('amount'))['total'] or 0
-            paid_amount = commissions.filter(status='paid').aggregate(total=Sum('amount'))['total'] or 0
-            
-            result.append({
-                'id': aff.id,
-                'user': {
-                    'id': aff.user.id,
-                    'email': aff.user.email,
-                    'full_name': aff.user.get_full_name() or aff.user.email,
-                    'first_name': aff.user.first_name,
-                    'last_name': aff.user.last_name,
-                },
-                'affiliate_code': aff.affiliate_code,
-                'status': aff.status,
-                'phone_number': aff.whatsapp,
-                'city': aff.city,
-                'instagram_handle': aff.instagram,
-                'tiktok_handle': aff.tiktok,
-                'youtube_handle': aff.youtube,
-                'facebook_handle': aff.facebook,
-                'platform': aff.primary_platform,
-                'reason': aff.reason,
-                'rejection_reason': aff.rejection_reason,
-                'date_joined': aff.created_at.isoformat(),
-                'approved_at': aff.approved_at.isoformat() if aff.approved_at else None,
-                'referral_count': aff.referrals.count(),
-                'balance': float(total_earned - paid_amount),
-                'paid_commission': float(paid_amount),
-                'total_earned': float(total_earned),
-            })
-        
-        return Response(result)
+        affiliates = annotate_affiliate_totals(affiliates)
+        
+        # Sorting (default: newest first)
+        ordering = request.query_params.get('ordering', '-date_joined')
+        descending = ordering.startswith('-')
+        sort_field = self.SORT_FIELDS.get(ordering.lstrip('-'))
+        if not sort_field:
+            return Response(
+                {'error': f'Invalid ordering. Must be one of: {list(self.SORT_FIELDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        prefix = '-' if descending else ''
+        affiliates = affiliates.order_by(f'{prefix}{sort_field}', f'{prefix}id')
+        
+        paginator = AdminAffiliatePagination()
+        page = paginator.paginate_queryset(affiliates, request, view=self)
+        return paginator.get_paginated_response([serialize_admin_affiliate(aff) for aff in page])
 
 
 class AdminAffiliateDetailView(APIView):
@@ -195,40 +231,9 @@ class AdminAffiliateDetailView(APIView):
         if not is_admin(request.user):
             return Response({'error': 'Admin access required'}, status=403)
         
-        aff = get_object_or_404(Affiliate, pk=pk)
+        aff = get_object_or_404(annotate_affiliate_totals(Affiliate.objects.select_related('user')), pk=pk)
         
-        # Get commission data
-        commissions = Commission.objects.filter(affiliate=aff)
-        total_earned = commissions.aggregate(total=Sum('amount'))['total'] or 0
-        paid_amount = commissions.filter(status='paid').aggregate(total=Sum('amount'))['total'] or 0
-        
-        return Response({
-            'id': aff.id,
-            'user': {
-                'id': aff.user.id,
-                'email': aff.user.email,
-                'full_name': aff.user.get_full_name() or aff.user.email,
-                'first_name': aff.user.first_name,
-                'last_name': aff.user.last_name,
-            },
-            'affiliate_code': aff.affiliate_code,
-            'status': aff.status,
-            'phone_number': aff.whatsapp,
-            'city': aff.city,
-            'instagram_handle': aff.instagram,
-            'tiktok_handle': aff.tiktok,
-            'youtube_handle': aff.youtube,
-            'facebook_handle': aff.facebook,
-            'platform': aff.primary_platform,
-            'reason': aff.reason,
-            'rejection_reason': aff.rejection_reason,
-            'date_joined': aff.created_at.isoformat(),
-            'approved_at': aff.approved_at.isoformat() if aff.approved_at else None,
-            'referral_count': aff.referrals.count(),
-            'balance': float(total_earned - paid_amount),
-            'paid_commission': float(paid_amount),
-            'total_earned': float(total_earned),
-        })
+        return Response(serialize_admin_affiliate(aff))
 
 
 class AdminAffiliateApproveView(APIView):
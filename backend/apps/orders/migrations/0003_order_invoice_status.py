@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+def mark_existing_invoices(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.exclude(zendit_payment_url__isnull=True).exclude(zendit_payment_url='').update(invoice_status='created')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_orders_referra_5ac971_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice_status',
+            field=models.CharField(blank=True, choices=[('', 'No Invoice'), ('pending', 'Invoice Pending'), ('created', 'Invoice Created'), ('failed', 'Invoice Failed')], default='', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_invoices, migrations.RunPython.noop),
+    ]
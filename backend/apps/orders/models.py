@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.conf import settings
 import uuid
 
@@ -6,6 +8,13 @@ import uuid
 class Order(models.Model):
     """Customer order for Qurban products."""
     
+    INVOICE_STATUS_CHOICES = [
+        ('', 'No Invoice'),
+        ('pending', 'Invoice Pending'),  # Queued for the invoice worker pool
+        ('created', 'Invoice Created'),
+        ('failed', 'Invoice Failed'),    # Customer can retry via payments/create/
+    ]
+    
     STATUS_CHOICES = [
         ('pending', 'Pending Payment'),
         ('paid', 'Paid'),
@@ -48,6 +57,9 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=50, blank=True)
     zendit_invoice_id = models.CharField(max_length=100, blank=True, null=True)
     zendit_payment_url = models.URLField(blank=True, null=True)
+    invoice_status = models.CharField(max_length=20, choices=INVOICE_STATUS_CHOICES, blank=True, default='')
+    # Set by the worker that is creating the invoice (see InvoiceDispatcher.claim)
+    invoice_claimed_at = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -60,7 +72,8 @@ class Order(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['referral_code', 'created_at']),
-            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
             models.Index(fields=['user', 'status']),
         ]
     
@@ -78,6 +91,12 @@ class Order(models.Model):
             unique_str = f"{now.microsecond:06d}"[-4:] + f"{random.randint(0, 99):02d}"
             self.order_number = f"QTB-{date_str}-{unique_str}"
         super().save(*args, **kwargs)
+        if self.referral_code:
+            # Order status is shown in the affiliate's recent referrals
+            from apps.affiliates.models import DashboardSnapshot, Referral
+            transaction.on_commit(lambda: DashboardSnapshot.refresh_referrals(
+                Referral.objects.filter(order_id=self.pk).values_list('affiliate_id', flat=True)
+            ))
 
 
 class OrderTracking(models.Model):
@@ -109,3 +128,13 @@ class Wishlist(models.Model):
     
     def __str__(self):
         return f"{self.user.email} - {self.product.name}"
+
+
+# Queryset deletes and cascades skip Model.delete(): take paid orders off
+# the live counters here (dropped again if the delete rolls back)
+@receiver(pre_delete, sender=Order)
+def release_paid_order_counters(sender, instance, **kwargs):
+    from apps.core.counters import counters, ORDERS_PAID, REVENUE_PAID
+    
+    if instance.paid_at:
+        counters.incr_on_commit({(ORDERS_PAID, None): -1, (REVENUE_PAID, None): -instance.final_amount})
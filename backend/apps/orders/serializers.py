@@ -42,7 +42,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'recipient_name', 'recipient_location',
             'status', 'status_display', 'payment_method',
             'referral_code', 'coupon_code',
-            'zendit_payment_url',
+            'zendit_payment_url', 'invoice_status',
             'created_at', 'paid_at', 'completed_at',
             'tracking_updates'
         ]
@@ -3,7 +3,7 @@ from .views import (
     OrderListView, OrderDetailView, CreateOrderView, OrderTrackingView,
     WishlistListView, WishlistAddView, WishlistRemoveView, MockCheckoutView,
     BulkMockDataView,
-    AdminOrderListView, AdminOrderDetailView, AdminOrderStatusUpdateView
+    AdminOrderListView, AdminOrderExportView, AdminOrderDetailView, AdminOrderStatusUpdateView
 )
 
 urlpatterns = [
@@ -25,6 +25,7 @@ urlpatterns = [
     # Admin Management
     # Endpoint: /api/orders/admin/...
     path('admin/', AdminOrderListView.as_view(), name='admin-order-list'),
+    path('admin/export/', AdminOrderExportView.as_view(), name='admin-order-export'),
     path('admin/<uuid:id>/', AdminOrderDetailView.as_view(), name='admin-order-detail'),
     path('admin/<uuid:id>/status/', AdminOrderStatusUpdateView.as_view(), name='admin-order-status'),
 ]
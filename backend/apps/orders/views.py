@@ -2,16 +2,22 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from datetime import timedelta
 
 from .models import Order, OrderTracking, Wishlist
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, CreateOrderSerializer,
     WishlistSerializer, WishlistCreateSerializer, AdminOrderSerializer
 )
-from apps.payments.zendit import zendit_service
-from apps.products.models import Product
+from apps.commissions.models import Coupon
+from apps.core.exports import StreamingExportMixin
+from apps.core.pagination import KeysetPagination
+from apps.payments.invoicing import invoice_dispatcher
+from apps.products.models import Product, StockReservation
 
 
 class OrderListView(generics.ListAPIView):
@@ -46,7 +52,7 @@ class CreateOrderView(APIView):
         data = serializer.validated_data
         product = get_object_or_404(Product, id=data['product_id'], is_active=True)
         
-        # Check stock
+        # Quick rejection; the conditional decrement below is authoritative
         if product.stock < data['quantity']:
             return Response(
                 {'error': 'Insufficient stock.'},
@@ -59,79 +65,90 @@ class CreateOrderView(APIView):
         discount_amount = 0
         
         # Apply coupon discount if provided
+        coupon = None
         coupon_code = data.get('coupon_code', '')
         if coupon_code:
             try:
-                from apps.commissions.models import Coupon
-                
-                coupon = Coupon.objects.get(code=coupon_code.strip().upper())
-                is_valid, message = coupon.is_valid(order_amount=total_amount)
-                
-                if not is_valid:
-                    return Response(
-                        {'error': f'Coupon invalid: {message}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Calculate discount
-                discount_amount = coupon.calculate_discount(total_amount)
-                
-                # Increment coupon usage
-                coupon.increment_usage()
-                
-                # ATTRBUTION FIX: If no referral link was used, attribute to Coupon owner
-                if not data.get('referral_code') and coupon.affiliate:
-                    data['referral_code'] = coupon.affiliate.affiliate_code
-                
+                coupon = Coupon.objects.select_related('affiliate').get(code=coupon_code.strip().upper())
             except Coupon.DoesNotExist:
                 return Response(
                     {'error': 'Invalid coupon code'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            is_valid, message = coupon.is_valid(order_amount=total_amount)
+            if not is_valid:
+                return Response(
+                    {'error': f'Coupon invalid: {message}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Calculate discount
+            discount_amount = coupon.calculate_discount(total_amount)
+            
+            # ATTRBUTION FIX: If no referral link was used, attribute to Coupon owner
+            if not data.get('referral_code') and coupon.affiliate:
+                data['referral_code'] = coupon.affiliate.affiliate_code
         
         final_amount = total_amount - discount_amount
         
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            product=product,
-            quantity=data['quantity'],
-            unit_price=unit_price,
-            total_amount=total_amount,
-            discount_amount=discount_amount,
-            final_amount=final_amount,
-            recipient_name=data['recipient_name'],
-            recipient_location=data.get('recipient_location', ''),
-            referral_code=data.get('referral_code', ''),
-            coupon_code=coupon_code,
-        )
-        
-        # Create initial tracking
-        OrderTracking.objects.create(
-            order=order,
-            status='pending',
-            message='Order created, awaiting payment.'
-        )
-        
-        # Create Zendit payment invoice
-        payment_info = {}
-        try:
-            result = zendit_service.create_invoice(order)
-            if result['success']:
-                order.zendit_invoice_id = result['invoice_id']
-                order.zendit_payment_url = result['payment_url']
-                order.save()
-                payment_info = {'payment_url': result['payment_url']}
-            else:
-                # Log error but don't fail order creation (user can retry payment)
-                print(f"Failed to create invoice: {result.get('error')}")
-        except Exception as e:
-            print(f"Payment error: {str(e)}")
+        with transaction.atomic():
+            # Reserve stock: UPDATE ... SET stock = stock - n WHERE stock >= n
+            if not Product.take_stock(product.id, data['quantity']):
+                return Response(
+                    {'error': 'Insufficient stock.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Use the coupon: UPDATE ... WHERE usage_count < usage_limit
+            if coupon and not coupon.increment_usage():
+                transaction.set_rollback(True)
+                return Response(
+                    {'error': 'Coupon invalid: Coupon usage limit reached'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Create order; the payment invoice is created in the background
+            order = Order.objects.create(
+                user=request.user,
+                product=product,
+                quantity=data['quantity'],
+                unit_price=unit_price,
+                total_amount=total_amount,
+                discount_amount=discount_amount,
+                final_amount=final_amount,
+                recipient_name=data['recipient_name'],
+                recipient_location=data.get('recipient_location', ''),
+                referral_code=data.get('referral_code', ''),
+                coupon_code=coupon_code,
+                invoice_status='pending',
+            )
+            
+            # Held until paid; released if the invoice expires unpaid
+            StockReservation.objects.create(
+                order=order,
+                product=product,
+                quantity=data['quantity'],
+                coupon=coupon,
+                expires_at=timezone.now() + timedelta(hours=getattr(settings, 'INVOICE_EXPIRY_HOURS', 24)),
+            )
+            
+            # Create initial tracking
+            OrderTracking.objects.create(
+                order=order,
+                status='pending',
+                message='Order created, awaiting payment.'
+            )
+            
+            # Create Zendit payment invoice on the worker pool (after commit).
+            # The frontend waits for the URL via /api/payments/invoice/<id>/.
+            invoice_dispatcher.submit(order.id)
         
         return Response({
             'message': 'Order created successfully.',
             'order': OrderDetailSerializer(order).data,
             'payment_url': order.zendit_payment_url,
+            'invoice_status': order.invoice_status,
         }, status=status.HTTP_201_CREATED)
 
 
@@ -251,6 +268,7 @@ class AdminOrderListView(generics.ListAPIView):
     """
     permission_classes = [IsAdminUser]
     serializer_class = AdminOrderSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = Order.objects.all().order_by('-created_at')
@@ -268,6 +286,34 @@ class AdminOrderListView(generics.ListAPIView):
         return queryset
 
 
+class AdminOrderExportView(StreamingExportMixin, AdminOrderListView):
+    """
+    Admin: Stream all orders matching the list filters as CSV or XLSX.
+    
+    Query params: status, search (as the list), type=csv|xlsx
+    """
+    export_filename = 'orders'
+    export_columns = [
+        ('Order Number', 'order_number'),
+        ('Created At', 'created_at'),
+        ('Status', 'status'),
+        ('Customer Email', 'user__email'),
+        ('Product', 'product__name'),
+        ('Quantity', 'quantity'),
+        ('Unit Price', 'unit_price'),
+        ('Total Amount', 'total_amount'),
+        ('Discount', 'discount_amount'),
+        ('Final Amount', 'final_amount'),
+        ('Coupon Code', 'coupon_code'),
+        ('Referral Code', 'referral_code'),
+        ('Payment Method', 'payment_method'),
+        ('Invoice ID', 'zendit_invoice_id'),
+        ('Paid At', 'paid_at'),
+        ('Completed At', 'completed_at'),
+        ('Recipient Name', 'recipient_name'),
+    ]
+
+
 class AdminOrderDetailView(generics.RetrieveAPIView):
     """
     Admin: Get full details of a specific order.
@@ -312,6 +358,10 @@ class AdminOrderStatusUpdateView(APIView):
         
         order.save()
         
+        # Unpaid order given up: return its reserved stock and coupon use
+        if new_status in ['cancelled', 'refunded']:
+            StockReservation.release(order.id)
+        
         # Log the change
         OrderTracking.objects.create(
             order=order,
@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import WebhookEvent
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_type', 'external_id', 'status', 'attempts', 'next_attempt_at', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('external_id', 'dedup_key')
+    readonly_fields = ('dedup_key', 'event_type', 'external_id', 'payload', 'attempts', 'locked_at', 'last_error', 'received_at', 'processed_at')
+    ordering = ('-received_at',)
+    
+    actions = ['requeue_events']
+    
+    @admin.action(description='Requeue selected webhooks')
+    def requeue_events(self, request, queryset):
+        count = queryset.exclude(status='processing').update(
+            status='pending',
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            last_error=''
+        )
+        self.message_user(request, f'{count} webhooks requeued.')
@@ -0,0 +1,182 @@
+"""
+Webhook inbox processing.
+
+Workers claim due WebhookEvent rows in batches (pending -> processing),
+apply each event to its order and mark it done. A failed event goes back to
+pending with exponential backoff plus jitter and becomes dead after
+WEBHOOK_MAX_ATTEMPTS. Rows left in processing by a crashed worker are
+released after WEBHOOK_CLAIM_TIMEOUT seconds.
+"""
+
+import json
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderTracking
+from apps.products.models import StockReservation
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+
+PAID_EVENTS = ['paid', 'PAID', 'payment.success', 'success']
+EXPIRED_EVENTS = ['expired', 'EXPIRED', 'payment.expired']
+FAILED_EVENTS = ['failed', 'FAILED', 'payment.failed']
+
+
+class SkipEvent(Exception):
+    """The event needs no processing (unknown order or event type)."""
+
+
+def parse_event(data):
+    """Return (event_type, external_id) from a webhook payload."""
+    event_type = data.get('event') or data.get('status')
+    external_id = data.get('external_id') or data.get('data', {}).get('external_id')
+    return event_type, external_id
+
+
+def handle_event(event):
+    """Apply one inbox event to its order. Raises SkipEvent if there is nothing to do."""
+    data = json.loads(event.payload)
+    event_type, external_id = parse_event(data)
+    
+    try:
+        order = Order.objects.get(id=external_id)
+    except (Order.DoesNotExist, ValidationError, ValueError, TypeError):
+        raise SkipEvent(f'Order not found: {external_id}')
+    
+    if event_type in PAID_EVENTS:
+        from .utils import process_payment_success
+        process_payment_success(order, data.get('payment_method', 'zendit'))
+    elif event_type in EXPIRED_EVENTS:
+        handle_payment_expired(order)
+    elif event_type in FAILED_EVENTS:
+        handle_payment_failed(order)
+    else:
+        raise SkipEvent(f'Unhandled webhook event: {event_type}')
+
+
+def handle_payment_expired(order):
+    """Handle expired payment."""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.status != 'pending':
+            return
+        
+        order.status = 'cancelled'
+        order.save()
+        
+        # Give the reserved stock and coupon use back
+        StockReservation.release(order.pk)
+        
+        OrderTracking.objects.create(
+            order=order,
+            status='cancelled',
+            message='Payment expired. Order cancelled.'
+        )
+    
+    logger.info(f'Order {order.order_number} cancelled due to expired payment')
+
+
+def handle_payment_failed(order):
+    """Handle failed payment."""
+    if order.status != 'pending':
+        return
+    
+    # Don't cancel yet, allow retry
+    OrderTracking.objects.create(
+        order=order,
+        status='pending',
+        message='Payment failed. Please try again.'
+    )
+    
+    logger.info(f'Order {order.order_number} payment failed')
+
+
+def get_retry_delay(attempts):
+    """Exponential backoff with full jitter, capped at WEBHOOK_RETRY_MAX_DELAY."""
+    base = getattr(settings, 'WEBHOOK_RETRY_BASE_DELAY', 30)
+    cap = getattr(settings, 'WEBHOOK_RETRY_MAX_DELAY', 60 * 60)
+    return random.uniform(base, min(cap, base * 2 ** attempts))
+
+
+def release_stale_claims():
+    """Put events claimed by a worker that died back in the queue."""
+    timeout = getattr(settings, 'WEBHOOK_CLAIM_TIMEOUT', 5 * 60)
+    return WebhookEvent.objects.filter(
+        status='processing',
+        locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status='pending', locked_at=None)
+
+
+def claim_batch(batch_size):
+    """Atomically move up to batch_size due events to processing and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        WebhookEvent.objects.filter(id__in=ids, status='pending').update(status='processing', locked_at=now)
+    return list(WebhookEvent.objects.filter(id__in=ids, status='processing', locked_at=now).order_by('id'))
+
+
+def process_event(event):
+    """Run one claimed event and record the outcome. Returns the new status."""
+    max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+    event.attempts += 1
+    now = timezone.now()
+    
+    try:
+        handle_event(event)
+        event.status = 'done'
+        event.last_error = ''
+        event.processed_at = now
+    except SkipEvent as e:
+        logger.info(f'Webhook {event.id} skipped: {e}')
+        event.status = 'skipped'
+        event.last_error = str(e)
+        event.processed_at = now
+    except Exception as e:
+        logger.error(f'Webhook {event.id} failed (attempt {event.attempts}): {e}')
+        event.last_error = f'{type(e).__name__}: {e}'
+        if event.attempts >= max_attempts:
+            event.status = 'dead'
+            event.processed_at = now
+        else:
+            event.status = 'pending'
+            event.next_attempt_at = now + timedelta(seconds=get_retry_delay(event.attempts))
+    
+    event.locked_at = None
+    event.save(update_fields=[
+        'status', 'attempts', 'next_attempt_at', 'locked_at', 'last_error', 'processed_at'
+    ])
+    return event.status
+
+
+def drain(batch_size=100):
+    """
+    Process due events until none are left.
+    
+    Returns:
+        dict: count per resulting status
+    """
+    results = {}
+    release_stale_claims()
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        for event in batch:
+            outcome = process_event(event)
+            results[outcome] = results.get(outcome, 0) + 1
+    return results
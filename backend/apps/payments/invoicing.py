@@ -0,0 +1,181 @@
+"""
+Background invoice creation.
+
+CreateOrderView marks the order invoice_status='pending' and hands its id
+to the process-local worker pool once the transaction commits, so checkout
+latency no longer depends on the gateway. A worker calls
+zendit_service.create_invoice() and stores the result with one UPDATE.
+InvoiceStatusView is polled (waiting at most a couple of seconds per request)
+until the payment URL is available.
+
+A worker first claims the order with a conditional UPDATE, so an invoice
+is created at most once however many processes queue the same order. Orders
+left 'pending' by a process that died before or during the job are
+re-queued by `reconcile_invoices` (see requeue_stale()).
+
+Set INVOICE_ASYNC=False to create invoices inline (single-process dev).
+"""
+
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderTracking
+from .zendit import zendit_service
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceDispatcher:
+    """Runs invoice creation on a bounded thread pool and wakes waiting pollers."""
+    
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or getattr(settings, 'INVOICE_WORKERS', 4)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._in_flight = set()
+    
+    def submit(self, order_id):
+        """Queue invoice creation for an order after the current transaction commits."""
+        transaction.on_commit(lambda: self._dispatch(order_id))
+    
+    def _dispatch(self, order_id):
+        if not getattr(settings, 'INVOICE_ASYNC', True):
+            self.create_invoice(order_id)
+            return
+        
+        with self._lock:
+            if order_id in self._in_flight:
+                return
+            self._in_flight.add(order_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='invoice-worker'
+                )
+                atexit.register(self.shutdown)
+        self._executor.submit(self._run, order_id)
+    
+    def _run(self, order_id):
+        close_old_connections()
+        try:
+            self.create_invoice(order_id)
+        except Exception as e:
+            logger.error(f'Invoice worker failed for order {order_id}: {e}')
+            Order.objects.filter(pk=order_id, invoice_status='pending').update(invoice_status='failed')
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._in_flight.discard(order_id)
+                self._done.notify_all()
+    
+    @staticmethod
+    def claim(order_id):
+        """
+        Claim a pending order's invoice creation for this worker.
+        
+        Only one UPDATE can match: an unclaimed pending invoice, or one whose
+        claim is older than INVOICE_CLAIM_TIMEOUT (its worker died).
+        
+        Returns:
+            bool: True if this worker should create the invoice
+        """
+        now = timezone.now()
+        expired = now - timedelta(seconds=getattr(settings, 'INVOICE_CLAIM_TIMEOUT', 120))
+        return bool(
+            Order.objects.filter(pk=order_id, status='pending', invoice_status='pending')
+            .filter(Q(invoice_claimed_at__isnull=True) | Q(invoice_claimed_at__lt=expired))
+            .update(invoice_claimed_at=now)
+        )
+    
+    @classmethod
+    def create_invoice(cls, order_id):
+        """
+        Create the gateway invoice for a pending order and store the result.
+        
+        Returns:
+            str: resulting invoice_status
+        """
+        if not cls.claim(order_id):
+            # Already created, failed, or being created by another worker
+            return Order.objects.filter(pk=order_id).values_list('invoice_status', flat=True).first()
+        
+        order = Order.objects.select_related('product', 'user').get(pk=order_id)
+        if order.zendit_payment_url:
+            return order.invoice_status
+        
+        result = zendit_service.create_invoice(order)
+        if not result['success']:
+            logger.error(f"Zendit error for order {order.order_number}: {result.get('error')}")
+            Order.objects.filter(pk=order_id).update(invoice_status='failed')
+            return 'failed'
+        
+        with transaction.atomic():
+            Order.objects.filter(pk=order_id).update(
+                zendit_invoice_id=result['invoice_id'],
+                zendit_payment_url=result['payment_url'],
+                invoice_status='created',
+            )
+            OrderTracking.objects.create(
+                order=order,
+                status='pending',
+                message='Payment invoice created. Awaiting payment.'
+            )
+        return 'created'
+    
+    def requeue_stale(self):
+        """
+        Re-queue invoices stuck in 'pending'.
+        
+        Picks up orders queued more than INVOICE_REQUEUE_AFTER seconds ago
+        and never claimed (the process died between commit and submit, or
+        with the job still queued), and orders whose claim expired (the
+        worker died during the gateway call). The claim in create_invoice()
+        keeps this from creating duplicates.
+        
+        Returns:
+            int: number of orders re-queued
+        """
+        now = timezone.now()
+        queued_before = now - timedelta(seconds=getattr(settings, 'INVOICE_REQUEUE_AFTER', 60))
+        claimed_before = now - timedelta(seconds=getattr(settings, 'INVOICE_CLAIM_TIMEOUT', 120))
+        max_age = now - timedelta(seconds=getattr(settings, 'INVOICE_RECONCILE_MAX_AGE', 48 * 60 * 60))
+        order_ids = list(
+            Order.objects.filter(status='pending', invoice_status='pending', created_at__gte=max_age)
+            .filter(
+                Q(invoice_claimed_at__isnull=True, created_at__lt=queued_before)
+                | Q(invoice_claimed_at__lt=claimed_before)
+            )
+            .values_list('id', flat=True)
+        )
+        for order_id in order_ids:
+            self.submit(order_id)
+        if order_ids:
+            logger.warning(f'Re-queued {len(order_ids)} stale pending invoices')
+        return len(order_ids)
+    
+    def wait(self, order_id, timeout):
+        """Block until this process has no work in flight for the order, or timeout."""
+        with self._lock:
+            return self._done.wait_for(lambda: order_id not in self._in_flight, timeout=timeout)
+    
+    def is_in_flight(self, order_id):
+        with self._lock:
+            return order_id in self._in_flight
+    
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+# Singleton instance
+invoice_dispatcher = InvoiceDispatcher()
@@ -0,0 +1,73 @@
+"""
+Django management command that drains the payment webhook inbox.
+
+Claims due WebhookEvent rows in batches and applies them to orders.
+Failures are retried with exponential backoff; after WEBHOOK_MAX_ATTEMPTS
+an event is marked dead (requeue it from the Django admin).
+
+Usage:
+    python manage.py process_webhooks
+    python manage.py process_webhooks --once
+    python manage.py process_webhooks --batch-size=200 --sleep=0.5
+
+Run under a process supervisor alongside the web server.
+"""
+
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.payments import inbox
+
+
+class Command(BaseCommand):
+    help = 'Process queued payment webhooks (retry with backoff, dead-letter after max attempts)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the due events once and exit'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Events claimed per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the inbox is empty (default: 1)'
+        )
+    
+    def handle(self, *args, **options):
+        self._stop = threading.Event()
+        
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+            signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+            self.stdout.write(self.style.SUCCESS('📥 Webhook worker started'))
+        
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                results = inbox.drain(batch_size=options['batch_size'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Webhook drain failed: {e}'))
+                results = {}
+            
+            if results:
+                summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(results.items()))
+                self.stdout.write(f'[{timezone.localtime():%H:%M:%S}] Processed webhooks: {summary}')
+            
+            if options['once']:
+                break
+            if not results:
+                self._stop.wait(options['sleep'])
+        
+        close_old_connections()
+        if not options['once']:
+            self.stdout.write('Webhook worker stopped')
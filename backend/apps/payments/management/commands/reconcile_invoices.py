@@ -0,0 +1,76 @@
+"""
+Django management command that reconciles pending invoices with Zendit.
+
+Every --interval seconds, checks the gateway status of pending orders that
+have an invoice (concurrently, bounded by --concurrency) and marks them
+paid or cancelled. Webhooks remain the primary path; this catches missed
+deliveries and feeds the status shown by PaymentStatusView. It also
+re-queues invoices whose creation was lost with a dead worker process.
+
+Usage:
+    python manage.py reconcile_invoices
+    python manage.py reconcile_invoices --once
+    python manage.py reconcile_invoices --interval=30 --concurrency=16
+"""
+
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.payments import reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Periodically reconcile pending invoice statuses with the payment gateway'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single sweep and exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'INVOICE_RECONCILE_INTERVAL', 60),
+            help='Seconds between sweeps'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'INVOICE_RECONCILE_CONCURRENCY', 8),
+            help='Concurrent gateway status checks'
+        )
+    
+    def handle(self, *args, **options):
+        self._stop = threading.Event()
+        
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+            signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+            self.stdout.write(self.style.SUCCESS(f'🔄 Invoice reconciler started (every {options["interval"]}s)'))
+        
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                stats = reconciliation.sweep(concurrency=options['concurrency'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Invoice sweep failed: {e}'))
+                stats = None
+            
+            if stats and (stats['checked'] or stats['requeued']):
+                self.stdout.write(
+                    f'[{timezone.localtime():%H:%M:%S}] Checked {stats["checked"]} invoices: '
+                    f'{stats["paid"]} paid, {stats["expired"]} expired, {stats["errors"]} errors, '
+                    f'{stats["requeued"]} re-queued'
+                )
+            
+            if options['once']:
+                break
+            self._stop.wait(options['interval'])
+        
+        close_old_connections()
+        if not options['once']:
+            self.stdout.write('Invoice reconciler stopped')
@@ -13,6 +13,7 @@ from apps.orders.models import Order
 from apps.products.models import Product
 from apps.affiliates.models import Affiliate, Referral
 from apps.commissions.services import CommissionService
+from apps.core.counters import counters, ORDERS_PAID, REVENUE_PAID
 
 User = get_user_model()
 
@@ -125,6 +126,9 @@ class MockPaymentService:
                 import time
                 time.sleep(0.1)
         
+        # Backdated paid_at, so not via process_payment_success(): count it here
+        counters.incr_on_commit({(ORDERS_PAID, None): 1, (REVENUE_PAID, None): order.final_amount})
+        
         # Calculate commission
         commission = CommissionService.calculate_commission(order)
         
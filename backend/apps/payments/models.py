@@ -0,0 +1,66 @@
+import hashlib
+from django.db import models
+from django.utils import timezone
+
+
+class WebhookEvent(models.Model):
+    """
+    Durable inbox of payment gateway webhooks.
+    
+    PaymentWebhookView only verifies the signature and inserts the raw
+    payload here; `process_webhooks` applies the events to orders later,
+    retrying failures with backoff until they succeed or go dead.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),        # Waiting for (another) attempt
+        ('processing', 'Processing'),  # Claimed by a worker
+        ('done', 'Done'),
+        ('skipped', 'Skipped'),        # Nothing to do (unknown order/event)
+        ('dead', 'Dead'),              # Gave up after max attempts
+    ]
+    
+    dedup_key = models.CharField(max_length=64, unique=True, help_text='SHA-256 of the raw payload')
+    event_type = models.CharField(max_length=50, blank=True)
+    external_id = models.CharField(max_length=100, blank=True, help_text='Our order ID')
+    payload = models.TextField()
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'payment_webhook_inbox'
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['external_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type or 'webhook'} {self.external_id} ({self.status})"
+    
+    @staticmethod
+    def make_dedup_key(raw_body):
+        """Gateway retries resend the same body, so the body hash identifies a delivery."""
+        return hashlib.sha256(raw_body).hexdigest()
+    
+    @classmethod
+    def append(cls, raw_body, event_type='', external_id=''):
+        """
+        Store a delivery with one INSERT; a duplicate delivery is a no-op.
+        """
+        cls.objects.bulk_create(
+            [cls(
+                dedup_key=cls.make_dedup_key(raw_body),
+                event_type=(event_type or '')[:50],
+                external_id=(external_id or '')[:100],
+                payload=raw_body.decode('utf-8', 'replace'),
+            )],
+            ignore_conflicts=True
+        )
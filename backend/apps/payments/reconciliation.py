@@ -0,0 +1,103 @@
+"""
+Invoice status reconciliation.
+
+`reconcile_invoices` periodically sweeps pending orders that have a Zendit
+invoice, asks the gateway for their status on a bounded thread pool
+(sharing the pooled client) and applies transitions through the same
+handlers as webhooks. Each result is cached per invoice so
+PaymentStatusView can show the gateway status without calling it. Every
+sweep also re-queues invoices whose creation never finished (see
+InvoiceDispatcher.requeue_stale).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.orders.models import Order
+from .inbox import EXPIRED_EVENTS, PAID_EVENTS, handle_payment_expired
+from .invoicing import invoice_dispatcher
+from .utils import process_payment_success
+from .zendit import zendit_service
+
+logger = logging.getLogger(__name__)
+
+
+def status_cache_key(invoice_id):
+    return f'invoice-status:{invoice_id}'
+
+
+def get_cached_status(invoice_id):
+    """Last gateway status seen by the reconciler, or None."""
+    return cache.get(status_cache_key(invoice_id))
+
+
+def get_candidates():
+    """Pending orders with an invoice that could still change state."""
+    max_age = getattr(settings, 'INVOICE_RECONCILE_MAX_AGE', 48 * 60 * 60)
+    return Order.objects.filter(
+        status='pending',
+        zendit_invoice_id__isnull=False,
+        created_at__gte=timezone.now() - timedelta(seconds=max_age),
+    ).exclude(zendit_invoice_id='')
+
+
+def _check(invoice_id):
+    try:
+        return invoice_id, zendit_service.check_invoice_status(invoice_id)
+    except Exception as e:
+        return invoice_id, {'success': False, 'error': str(e)}
+
+
+def apply_result(order, result):
+    """Apply one gateway status to its order. Returns 'paid', 'expired' or None."""
+    gateway_status = result.get('status')
+    if gateway_status in PAID_EVENTS:
+        process_payment_success(order, result.get('payment_method') or 'zendit')
+        return 'paid'
+    if gateway_status in EXPIRED_EVENTS:
+        handle_payment_expired(order)
+        return 'expired'
+    return None
+
+
+def sweep(concurrency=None):
+    """
+    Check every candidate invoice once.
+    
+    Returns:
+        dict: counts of checked / paid / expired / errors / requeued
+    """
+    concurrency = concurrency or getattr(settings, 'INVOICE_RECONCILE_CONCURRENCY', 8)
+    ttl = getattr(settings, 'INVOICE_STATUS_CACHE_TTL', 120)
+    requeued = invoice_dispatcher.requeue_stale()
+    orders = {order.zendit_invoice_id: order for order in get_candidates().select_related('user')}
+    stats = {'checked': len(orders), 'paid': 0, 'expired': 0, 'errors': 0, 'requeued': requeued}
+    if not orders:
+        return stats
+    
+    # Only HTTP runs on the pool; DB writes stay on this thread
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='invoice-reconcile') as pool:
+        results = list(pool.map(_check, orders))
+    
+    for invoice_id, result in results:
+        if not result['success']:
+            stats['errors'] += 1
+            logger.warning(f'Invoice {invoice_id} status check failed: {result.get("error")}')
+            continue
+        cache.set(status_cache_key(invoice_id), result['status'], ttl)
+        try:
+            outcome = apply_result(orders[invoice_id], result)
+        except Exception as e:
+            stats['errors'] += 1
+            logger.error(f'Failed to apply invoice {invoice_id} status {result["status"]}: {e}')
+            continue
+        if outcome:
+            stats[outcome] += 1
+    
+    close_old_connections()
+    return stats
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import CreatePaymentView, PaymentWebhookView, PaymentStatusView
+from .views import CreatePaymentView, InvoiceStatusView, PaymentWebhookView, PaymentStatusView
 
 urlpatterns = [
     path('create/<uuid:order_id>/', CreatePaymentView.as_view(), name='payment-create'),
+    path('invoice/<uuid:order_id>/', InvoiceStatusView.as_view(), name='payment-invoice-status'),
     path('webhook/', PaymentWebhookView.as_view(), name='payment-webhook'),
     path('status/<uuid:order_id>/', PaymentStatusView.as_view(), name='payment-status'),
 ]
@@ -1,6 +1,9 @@
 import logging
+from django.db import transaction
 from django.utils import timezone
-from apps.orders.models import OrderTracking
+from apps.orders.models import Order, OrderTracking
+from apps.products.models import StockReservation
+from apps.core.counters import counters, ORDERS_PAID, REVENUE_PAID
 
 logger = logging.getLogger(__name__)
 
@@ -10,64 +13,48 @@ def process_payment_success(order, payment_method='zendit'):
     1. Update order status to 'paid'
     2. Create OrderTracking entry
     3. Generate Affiliate Commission if referral_code exists
-    """
-    if order.status in ['paid', 'processing', 'completed', 'distributed']:
-        logger.info(f'Order {order.order_number} already processed')
-        return
-
-    order.status = 'paid'
-    order.paid_at = timezone.now()
-    order.payment_method = payment_method
-    order.save()
     
-    # Add tracking
-    OrderTracking.objects.create(
-        order=order,
-        status='paid',
-        message=f'Payment received successfully via {payment_method}.'
-    )
+    Runs in one transaction with the order row locked, so duplicate
+    deliveries of the same webhook are processed exactly once.
+    """
+    from apps.commissions.services import CommissionService
     
-    logger.info(f'Order {order.order_number} marked as paid')
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        if locked.status in ['paid', 'processing', 'completed', 'distributed']:
+            logger.info(f'Order {locked.order_number} already processed')
+            return
+        
+        locked.status = 'paid'
+        locked.paid_at = timezone.now()
+        locked.payment_method = payment_method
+        locked.save()
+        
+        # Add tracking
+        OrderTracking.objects.create(
+            order=locked,
+            status='paid',
+            message=f'Payment received successfully via {payment_method}.'
+        )
+        
+        # Reserved stock is now sold. Late payments that could not take their
+        # stock or coupon use back are flagged on the order for ops.
+        for issue in StockReservation.commit(locked.pk):
+            logger.error(f'Order {locked.order_number}: {issue}')
+            OrderTracking.objects.create(order=locked, status='needs_review', message=issue)
+        
+        logger.info(f'Order {locked.order_number} marked as paid')
+        counters.incr_on_commit({(ORDERS_PAID, None): 1, (REVENUE_PAID, None): locked.final_amount})
+        
+        # Create commission for affiliate if referral_code exists. A savepoint
+        # keeps the payment recorded even if attribution fails.
+        if locked.referral_code:
+            try:
+                with transaction.atomic():
+                    CommissionService.attribute_order(locked, event='paid')
+            except Exception as e:
+                logger.error(f'Error creating commission for order {locked.order_number}: {str(e)}')
     
-    # Create commission for affiliate if referral_code exists
-    if order.referral_code:
-        try:
-            from apps.affiliates.models import Affiliate, Referral
-            from apps.commissions.models import Commission
-            
-            affiliate = Affiliate.objects.get(
-                affiliate_code=order.referral_code,
-                status='approved'
-            )
-            
-            # Create referral record with masked customer data
-            referral = Referral.objects.create(
-                affiliate=affiliate,
-                order=order,
-                customer=order.user,
-                customer_name_masked=Referral.mask_name(order.user.get_full_name()),
-                customer_email_masked=Referral.mask_email(order.user.email),
-                status='confirmed'
-            )
-            
-            # Calculate commission amount
-            commission_rate = affiliate.custom_commission_rate or order.product.commission_rate
-            commission_amount = Commission.calculate_amount(order.final_amount, commission_rate)
-            
-            # Create commission record (status=pending, will mature after 30 days)
-            Commission.objects.create(
-                affiliate=affiliate,
-                referral=referral,
-                order=order,
-                order_amount=order.final_amount,
-                commission_rate=commission_rate,
-                amount=commission_amount,
-                status='pending'
-            )
-            
-            logger.info(f'Commission created for affiliate {affiliate.affiliate_code}: Rp {commission_amount:,.0f}')
-            
-        except Affiliate.DoesNotExist:
-            logger.warning(f'Invalid or inactive referral code: {order.referral_code}')
-        except Exception as e:
-            logger.error(f'Error creating commission for order {order.order_number}: {str(e)}')
+    order.status = locked.status
+    order.paid_at = locked.paid_at
+    order.payment_method = locked.payment_method
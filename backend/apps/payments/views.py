@@ -1,6 +1,7 @@
 import json
 import logging
-from django.utils import timezone
+import time
+from django.conf import settings
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -8,14 +9,23 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
-from apps.orders.models import Order, OrderTracking
-from .zendit import zendit_service, ZenditService
+from apps.orders.models import Order
+from .inbox import parse_event
+from .invoicing import invoice_dispatcher
+from .reconciliation import get_cached_status
+from .models import WebhookEvent
+from .zendit import ZenditService
 
 logger = logging.getLogger(__name__)
 
 
 class CreatePaymentView(APIView):
-    """Create payment invoice for an order."""
+    """
+    Create (or retry) the payment invoice for an order.
+    
+    Invoice creation runs on the background worker pool; poll
+    InvoiceStatusView for the payment URL.
+    """
     
     permission_classes = [IsAuthenticated]
     
@@ -40,40 +50,86 @@ class CreatePaymentView(APIView):
             return Response({
                 'message': 'Payment already initiated.',
                 'payment_url': order.zendit_payment_url,
+                'invoice_status': 'created',
             })
         
-        # Create Zendit invoice
-        result = zendit_service.create_invoice(order)
-        
-        if result['success']:
-            # Update order with payment info
-            order.zendit_invoice_id = result['invoice_id']
-            order.zendit_payment_url = result['payment_url']
-            order.save()
-            
-            # Add tracking
-            OrderTracking.objects.create(
-                order=order,
-                status='pending',
-                message='Payment invoice created. Awaiting payment.'
+        # Queue invoice creation. An order already pending keeps its claim,
+        # so a worker creating it elsewhere is not raced (the claim makes
+        # re-submitting it a no-op).
+        if order.invoice_status != 'pending':
+            Order.objects.filter(pk=order.pk).exclude(invoice_status='pending').update(
+                invoice_status='pending',
+                invoice_claimed_at=None
             )
-            
-            return Response({
-                'message': 'Payment initiated.',
-                'payment_url': result['payment_url'],
-                'invoice_id': result['invoice_id'],
-            })
-        else:
-            logger.error(f"Zendit error for order {order.order_number}: {result.get('error')}")
+        if not invoice_dispatcher.is_in_flight(order.id):
+            invoice_dispatcher.submit(order.id)
+        
+        return Response({
+            'message': 'Payment is being prepared.',
+            'invoice_status': 'pending',
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class InvoiceStatusView(APIView):
+    """
+    Poll for an order's payment URL: GET /api/payments/invoice/<order_id>/?wait=2
+    
+    Returns as soon as the invoice is created or has failed, or after `wait`
+    seconds with invoice_status 'pending' and a Retry-After header. The wait
+    is capped at INVOICE_LONG_POLL_MAX (a couple of seconds) so a polling
+    customer never holds a sync web worker for long.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    POLL_INTERVAL = 0.5
+    
+    def get(self, request, order_id):
+        fields = ('status', 'invoice_status', 'zendit_payment_url')
+        order = Order.objects.filter(id=order_id, user=request.user).values(*fields).first()
+        if order is None:
             return Response(
-                {'error': 'Failed to create payment. Please try again.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Order not found.'},
+                status=status.HTTP_404_NOT_FOUND
             )
+        
+        max_wait = getattr(settings, 'INVOICE_LONG_POLL_MAX', 2)
+        try:
+            wait = float(request.query_params.get('wait', max_wait))
+        except ValueError:
+            wait = max_wait
+        deadline = time.monotonic() + max(0.0, min(wait, max_wait))
+        
+        while order['invoice_status'] == 'pending':
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Woken as soon as the job finishes if this process runs it,
+            # otherwise another process does: re-check the DB periodically
+            if invoice_dispatcher.is_in_flight(order_id):
+                invoice_dispatcher.wait(order_id, min(remaining, self.POLL_INTERVAL))
+            else:
+                time.sleep(min(remaining, self.POLL_INTERVAL))
+            order = Order.objects.filter(id=order_id).values(*fields).first()
+        
+        response = Response({
+            'status': order['status'],
+            'invoice_status': order['invoice_status'],
+            'payment_url': order['zendit_payment_url'],
+        })
+        if order['invoice_status'] == 'pending':
+            response['Retry-After'] = str(getattr(settings, 'INVOICE_POLL_RETRY_AFTER', 1))
+        return response
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class PaymentWebhookView(APIView):
-    """Handle Zendit payment webhooks."""
+    """
+    Receive Zendit payment webhooks.
+    
+    The delivery is only verified and appended to the WebhookEvent inbox;
+    `process_webhooks` applies it to the order asynchronously.
+    """
     
     permission_classes = [AllowAny]
     authentication_classes = []  # No auth for webhooks
@@ -101,70 +157,26 @@ class PaymentWebhookView(APIView):
             )
         
         # Get the event type and external_id (our order ID)
-        event_type = data.get('event') or data.get('status')
-        external_id = data.get('external_id') or data.get('data', {}).get('external_id')
+        event_type, external_id = parse_event(data)
         
         if not external_id:
             logger.warning(f'Webhook missing external_id: {data}')
             return Response({'status': 'ignored - no external_id'})
         
-        try:
-            order = Order.objects.get(id=external_id)
-        except Order.DoesNotExist:
-            logger.warning(f'Order not found for webhook: {external_id}')
-            return Response({'status': 'ignored - order not found'})
-        
-        # Handle different event types
-        if event_type in ['paid', 'PAID', 'payment.success', 'success']:
-            self._handle_payment_success(order, data)
-        elif event_type in ['expired', 'EXPIRED', 'payment.expired']:
-            self._handle_payment_expired(order, data)
-        elif event_type in ['failed', 'FAILED', 'payment.failed']:
-            self._handle_payment_failed(order, data)
-        else:
-            logger.info(f'Unhandled webhook event: {event_type}')
+        # One INSERT (duplicates are dropped by the dedup key)
+        WebhookEvent.append(request.body, event_type=event_type, external_id=str(external_id))
         
         return Response({'status': 'received'})
-    
-    def _handle_payment_success(self, order, data):
-        """Handle successful payment."""
-        from .utils import process_payment_success
-        payment_method = data.get('payment_method', 'zendit')
-        process_payment_success(order, payment_method)
-    
-    def _handle_payment_expired(self, order, data):
-        """Handle expired payment."""
-        if order.status != 'pending':
-            return
-        
-        order.status = 'cancelled'
-        order.save()
-        
-        OrderTracking.objects.create(
-            order=order,
-            status='cancelled',
-            message='Payment expired. Order cancelled.'
-        )
-        
-        logger.info(f'Order {order.order_number} cancelled due to expired payment')
-    
-    def _handle_payment_failed(self, order, data):
-        """Handle failed payment."""
-        if order.status != 'pending':
-            return
-        
-        # Don't cancel yet, allow retry
-        OrderTracking.objects.create(
-            order=order,
-            status='pending',
-            message='Payment failed. Please try again.'
-        )
-        
-        logger.info(f'Order {order.order_number} payment failed')
 
 
 class PaymentStatusView(APIView):
-    """Check payment status for an order."""
+    """
+    Check payment status for an order.
+    
+    Answered from the database plus the gateway status cached by
+    `reconcile_invoices`; webhooks and the reconciler move the order, so a
+    refresh never triggers a gateway call.
+    """
     
     permission_classes = [IsAuthenticated]
     
@@ -177,7 +189,7 @@ class PaymentStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # If already paid, return from database
+        # Already paid
         if order.status in ['paid', 'processing', 'distributed', 'completed']:
             return Response({
                 'status': order.status,
@@ -185,30 +197,12 @@ class PaymentStatusView(APIView):
                 'payment_method': order.payment_method,
             })
         
-        # Check with Zendit if we have invoice_id
-        if order.zendit_invoice_id:
-            result = zendit_service.check_invoice_status(order.zendit_invoice_id)
-            if result['success']:
-                # Update order if paid
-                if result['status'] in ['paid', 'PAID']:
-                    order.status = 'paid'
-                    order.paid_at = result.get('paid_at') or timezone.now()
-                    order.payment_method = result.get('payment_method', 'zendit')
-                    order.save()
-                    
-                    OrderTracking.objects.create(
-                        order=order,
-                        status='paid',
-                        message='Payment confirmed via status check.'
-                    )
-                
-                return Response({
-                    'status': order.status,
-                    'zendit_status': result['status'],
-                    'paid_at': order.paid_at,
-                })
-        
-        return Response({
+        data = {
             'status': order.status,
+            'invoice_status': order.invoice_status,
+            'payment_url': order.zendit_payment_url,
             'message': 'Payment pending.',
-        })
+        }
+        if order.zendit_invoice_id:
+            data['zendit_status'] = get_cached_status(order.zendit_invoice_id)
+        return Response(data)
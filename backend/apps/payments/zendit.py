@@ -7,15 +7,33 @@ Documentation: https://docs.zendit.id/
 Configure these in settings.py or environment variables:
 - ZENDIT_API_KEY: Your Zendit API key
 - ZENDIT_CALLBACK_URL: Webhook URL for payment notifications
+
+All calls share one lazily created httpx.Client (keep-alive pool, HTTP/2
+when the `h2` package is installed, per-phase timeouts). Idempotent GETs
+are retried with jittered backoff, and a circuit breaker fails fast while
+the gateway keeps erroring. Tuning lives in the ZENDIT_* settings.
 """
 
+import atexit
 import os
+import random
+import threading
+import time
 import httpx
 import hashlib
 import hmac
+import logging
 from django.conf import settings
 from django.utils import timezone
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 
 # Zendit API Configuration
 ZENDIT_API_KEY = os.environ.get('ZENDIT_API_KEY', 'your-test-api-key')
@@ -24,18 +42,151 @@ ZENDIT_CALLBACK_URL = os.environ.get('ZENDIT_CALLBACK_URL', 'http://localhost:80
 ZENDIT_SECRET_KEY = os.environ.get('ZENDIT_SECRET_KEY', 'your-secret-key')
 
 
+# Responses worth retrying (GET only) and counting against the breaker
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
 class ZenditError(Exception):
     """Exception for Zendit API errors."""
     pass
 
 
+class CircuitOpenError(ZenditError):
+    """Raised without calling the gateway while the circuit breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    closed: requests flow; `threshold` failures in a row open the circuit.
+    open: requests fail immediately until `reset_timeout` has passed.
+    half-open: one trial request is let through; success closes the
+    circuit, failure opens it again.
+    """
+    
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+    
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+    
+    def before_request(self):
+        """Raise CircuitOpenError if the request must not be sent."""
+        with self._lock:
+            state = self._state()
+            if state == 'open' or (state == 'half-open' and self._trial_in_flight):
+                raise CircuitOpenError('Payment gateway unavailable (circuit open)')
+            if state == 'half-open':
+                self._trial_in_flight = True
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning(f'Zendit circuit opened after {self._failures} consecutive failures')
+                self._opened_at = time.monotonic()
+
+
 class ZenditService:
     """Service for interacting with Zendit payment gateway."""
     
-    def __init__(self):
-        self.api_key = ZENDIT_API_KEY
-        self.api_url = ZENDIT_API_URL
+    def __init__(self, api_url=None, api_key=None):
+        self.api_key = api_key or ZENDIT_API_KEY
+        self.api_url = api_url or ZENDIT_API_URL
         self.callback_url = ZENDIT_CALLBACK_URL
+        self.breaker = CircuitBreaker(
+            threshold=getattr(settings, 'ZENDIT_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'ZENDIT_BREAKER_RESET', 30.0)
+        )
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Shared pooled client, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=self.api_url,
+                        headers=self._get_headers(),
+                        http2=HTTP2_AVAILABLE,
+                        timeout=httpx.Timeout(
+                            connect=getattr(settings, 'ZENDIT_CONNECT_TIMEOUT', 3.0),
+                            read=getattr(settings, 'ZENDIT_READ_TIMEOUT', 15.0),
+                            write=getattr(settings, 'ZENDIT_WRITE_TIMEOUT', 10.0),
+                            pool=getattr(settings, 'ZENDIT_POOL_TIMEOUT', 2.0),
+                        ),
+                        limits=httpx.Limits(
+                            max_connections=getattr(settings, 'ZENDIT_MAX_CONNECTIONS', 20),
+                            max_keepalive_connections=getattr(settings, 'ZENDIT_MAX_KEEPALIVE', 10),
+                        ),
+                    )
+                    atexit.register(self.close)
+        return self._client
+    
+    def close(self):
+        """Close the pooled client (a new one is created on next use)."""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    def _request(self, method, path, **kwargs):
+        """
+        Send a request through the circuit breaker.
+        
+        GETs are retried on network errors and 502/503/504 with jittered
+        exponential backoff; other methods are sent once.
+        
+        Raises:
+            CircuitOpenError: the breaker is open
+            httpx.RequestError: network error after the last attempt
+        """
+        retries = getattr(settings, 'ZENDIT_GET_RETRIES', 2) if method == 'GET' else 0
+        backoff = getattr(settings, 'ZENDIT_RETRY_BACKOFF', 0.2)
+        
+        for attempt in range(retries + 1):
+            self.breaker.before_request()
+            try:
+                response = self.client.request(method, path, **kwargs)
+            except httpx.RequestError:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if attempt == retries:
+                    return response
+            
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
     
     def _get_headers(self):
         """Get authentication headers for Zendit API."""
@@ -74,39 +225,37 @@ class ZenditService:
             'callback_url': self.callback_url,
             'success_redirect_url': f'{settings.FRONTEND_URL}/dashboard/payment?status=success&order={order.order_number}',
             'failure_redirect_url': f'{settings.FRONTEND_URL}/dashboard/payment?status=failed&order={order.order_number}',
-            'expiry_date': (timezone.now() + timezone.timedelta(hours=24)).isoformat(),
+            'expiry_date': (timezone.now() + timezone.timedelta(hours=getattr(settings, 'INVOICE_EXPIRY_HOURS', 24))).isoformat(),
         }
         
         try:
-            with httpx.Client() as client:
-                response = client.post(
-                    f'{self.api_url}/invoices',
-                    json=payload,
-                    headers=self._get_headers(),
-                    timeout=30.0
-                )
-                
-                if response.status_code == 201 or response.status_code == 200:
-                    data = response.json()
-                    return {
-                        'success': True,
-                        'invoice_id': data.get('id') or data.get('invoice_id'),
-                        'payment_url': data.get('invoice_url') or data.get('payment_url'),
-                        'amount': data.get('amount'),
-                        'status': data.get('status'),
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': response.text,
-                        'status_code': response.status_code,
-                    }
-                    
+            response = self._request('POST', '/invoices', json=payload)
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+            }
         except httpx.RequestError as e:
             return {
                 'success': False,
                 'error': f'Network error: {str(e)}',
             }
+        
+        if response.status_code == 201 or response.status_code == 200:
+            data = response.json()
+            return {
+                'success': True,
+                'invoice_id': data.get('id') or data.get('invoice_id'),
+                'payment_url': data.get('invoice_url') or data.get('payment_url'),
+                'amount': data.get('amount'),
+                'status': data.get('status'),
+            }
+        else:
+            return {
+                'success': False,
+                'error': response.text,
+                'status_code': response.status_code,
+            }
     
     def check_invoice_status(self, invoice_id):
         """
@@ -119,32 +268,31 @@ class ZenditService:
             dict: Invoice status data
         """
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    f'{self.api_url}/invoices/{invoice_id}',
-                    headers=self._get_headers(),
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        'success': True,
-                        'status': data.get('status'),
-                        'paid_at': data.get('paid_at'),
-                        'payment_method': data.get('payment_method'),
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': response.text,
-                    }
-                    
+            response = self._request('GET', f'/invoices/{invoice_id}')
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+            }
         except httpx.RequestError as e:
             return {
                 'success': False,
                 'error': f'Network error: {str(e)}',
             }
+        
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                'success': True,
+                'status': data.get('status'),
+                'paid_at': data.get('paid_at'),
+                'payment_method': data.get('payment_method'),
+            }
+        else:
+            return {
+                'success': False,
+                'error': response.text,
+            }
     
     @staticmethod
     def verify_webhook_signature(payload: bytes, signature: str) -> bool:
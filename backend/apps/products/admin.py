@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, StockReservation
 
 
 @admin.register(Product)
@@ -16,3 +16,12 @@ class ProductAdmin(admin.ModelAdmin):
         ('Stock & Weight', {'fields': ('stock', 'shares_available', 'weight_min', 'weight_max')}),
         ('Display', {'fields': ('image_url', 'is_active', 'is_featured')}),
     )
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'coupon', 'status', 'expires_at', 'resolved_at')
+    list_filter = ('status',)
+    search_fields = ('order__order_number', 'product__name')
+    raw_id_fields = ('order', 'product', 'coupon')
+    readonly_fields = ('created_at', 'resolved_at')
@@ -0,0 +1,109 @@
+"""
+Read-through cache for the public product catalog.
+
+ProductListView and ProductDetailView serve serialized pages from the
+shared cache, keyed by filter params (category, featured, page) or slug,
+together with a strong ETag over the payload and a Last-Modified time, so
+browsers and CDNs revalidate with 304s. Any Product write bumps the
+catalog version after commit (save/delete, the admin soft-delete and the
+checkout stock updates), which drops every cached page at once.
+"""
+
+import hashlib
+import json
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class CatalogCache:
+    """Versioned cache of catalog payloads with their validators."""
+    
+    CACHE_PREFIX = 'catalog'
+    
+    def __init__(self, timeout=None, max_age=None):
+        self.timeout = timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 5 * 60)
+        self.max_age = getattr(settings, 'CATALOG_HTTP_MAX_AGE', 30) if max_age is None else max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, compute):
+        """
+        Return the cached entry for `key`, computing it on a miss.
+        
+        Args:
+            key: Tuple of the params that select the payload
+            compute: Callable returning (data, last_modified datetime or None)
+        
+        Returns:
+            dict: {'data', 'etag', 'last_modified'} (last_modified as a timestamp)
+        """
+        cache_key = self._cache_key(key)
+        entry = cache.get(cache_key)
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        
+        data, last_modified = compute()
+        body = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':')).encode()
+        entry = {
+            'data': data,
+            'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            'last_modified': int(last_modified.timestamp()) if last_modified else None,
+        }
+        cache.set(cache_key, entry, self.timeout)
+        return entry
+    
+    def respond(self, request, entry, response):
+        """
+        Attach the entry's validators to `response`, or answer 304 if the
+        client's copy is current.
+        """
+        not_modified = get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+        )
+        if not_modified is not None:
+            response = not_modified
+        
+        response['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+    
+    def invalidate(self):
+        """Drop every cached catalog page once the current transaction commits."""
+        transaction.on_commit(self._bump_version)
+    
+    def get_metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 2) if total else 0,
+            }
+    
+    def _bump_version(self):
+        version_key = f'{self.CACHE_PREFIX}:version'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 2, None)
+    
+    def _cache_key(self, key):
+        version = cache.get_or_set(f'{self.CACHE_PREFIX}:version', 1, None)
+        return f'{self.CACHE_PREFIX}:v{version}:' + ':'.join(str(part) for part in key)
+
+
+# Singleton instance
+catalog_cache = CatalogCache()
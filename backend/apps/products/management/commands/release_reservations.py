@@ -0,0 +1,62 @@
+"""
+Django management command to release expired stock reservations.
+
+Checkout takes stock with a conditional UPDATE and records a held
+StockReservation that expires with the order's invoice. Holds still unpaid
+after expiry (plus --grace minutes, for late webhooks) have their order
+cancelled and their stock and coupon use given back.
+
+Usage:
+    python manage.py release_reservations
+    python manage.py release_reservations --dry-run
+    python manage.py release_reservations --grace=30
+
+Schedule with cron:
+    */5 * * * * cd /path/to/backend && python manage.py release_reservations
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.payments.inbox import handle_payment_expired
+from apps.products.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose stock reservation has expired and return their stock'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=15,
+            help='Minutes past expiry before a hold is released (default: 15)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report expired holds without releasing them'
+        )
+    
+    def handle(self, *args, **options):
+        if options['grace'] < 0:
+            raise CommandError('--grace must not be negative')
+        
+        cutoff = timezone.now() - timedelta(minutes=options['grace'])
+        expired = StockReservation.get_expired(cutoff).select_related('order')
+        
+        if options['dry_run']:
+            count = expired.count()
+            self.stdout.write(self.style.WARNING(f'🔍 DRY RUN: {count} expired reservations would be released'))
+            return
+        
+        released = 0
+        for reservation in expired.iterator():
+            if reservation.order.status == 'pending':
+                # Cancels the order and releases the hold in one transaction
+                handle_payment_expired(reservation.order)
+                released += 1
+            elif StockReservation.release(reservation.order_id):
+                released += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Released {released} expired stock reservations'))
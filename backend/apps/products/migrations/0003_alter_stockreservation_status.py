@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockreservation',
+            name='status',
+            field=models.CharField(choices=[('held', 'Held'), ('committed', 'Committed'), ('released', 'Released'), ('oversold', 'Oversold')], default='held', max_length=20),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import catalog_cache
 
 
 class Product(models.Model):
@@ -54,6 +57,15 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} - Rp {self.price:,.0f}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Drop cached catalog pages that may show this product
+        catalog_cache.invalidate()
+    
+    def delete(self, *args, **kwargs):
+        catalog_cache.invalidate()
+        return super().delete(*args, **kwargs)
+    
     @property
     def effective_price(self):
         """Return discount price if available, otherwise regular price."""
@@ -62,3 +74,167 @@ class Product(models.Model):
     @property
     def is_on_sale(self):
         return self.discount_price is not None and self.discount_price < self.price
+    
+    @staticmethod
+    def take_stock(product_id, quantity):
+        """
+        Atomically decrement stock if enough is left (UPDATE ... WHERE stock >= n).
+        
+        Returns:
+            bool: False if there was not enough stock
+        """
+        taken = Product.objects.filter(pk=product_id, stock__gte=quantity).update(
+            stock=F('stock') - quantity,
+            updated_at=timezone.now()
+        ) == 1
+        if taken:
+            catalog_cache.invalidate()
+        return taken
+    
+    @staticmethod
+    def return_stock(product_id, quantity):
+        """Atomically add stock back."""
+        Product.objects.filter(pk=product_id).update(
+            stock=F('stock') + quantity,
+            updated_at=timezone.now()
+        )
+        catalog_cache.invalidate()
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for an unpaid order.
+    
+    Created at checkout together with the conditional stock decrement and
+    expires with the order's invoice. Payment commits it; expiry or
+    cancellation releases it, returning the stock (and the coupon use).
+    A payment arriving after the release takes both again; if no stock is
+    left the reservation ends up 'oversold' for ops to resolve.
+    """
+    
+    STATUS_CHOICES = [
+        ('held', 'Held'),            # Stock taken, awaiting payment
+        ('committed', 'Committed'),  # Order paid
+        ('released', 'Released'),    # Stock returned
+        ('oversold', 'Oversold'),    # Paid after release, no stock left to take
+    ]
+    
+    order = models.OneToOneField('orders.Order', on_delete=models.CASCADE, related_name='stock_reservation')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    coupon = models.ForeignKey(
+        'commissions.Coupon',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        help_text='Coupon use to give back on release'
+    )
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'stock_reservations'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id} ({self.status})"
+    
+    @staticmethod
+    def commit(order_id):
+        """
+        Mark the order's reservation as committed (order paid).
+        
+        A payment that arrives after the hold was released takes the stock
+        and the coupon use (given back by release()) again. Without stock
+        left the reservation is marked 'oversold'; a coupon already at its
+        limit still counts the use, so it stays closed.
+        
+        Returns:
+            list: Problems for ops to look at (empty if none)
+        """
+        if StockReservation.objects.filter(order_id=order_id, status='held').update(
+            status='committed',
+            resolved_at=timezone.now()
+        ):
+            return []
+        
+        issues = []
+        with transaction.atomic():
+            reservation = (
+                StockReservation.objects.select_for_update()
+                .filter(order_id=order_id, status='released')
+                .first()
+            )
+            if reservation is None:
+                return []
+            
+            if Product.take_stock(reservation.product_id, reservation.quantity):
+                reservation.status = 'committed'
+            else:
+                reservation.status = 'oversold'
+                issues.append(
+                    f'Paid after its stock hold was released and no stock is left '
+                    f'({reservation.quantity} x product {reservation.product_id})'
+                )
+            
+            if reservation.coupon_id:
+                from apps.commissions.models import Coupon
+                
+                coupon = Coupon.objects.filter(pk=reservation.coupon_id).first()
+                if coupon and not coupon.increment_usage():
+                    # The discount is already paid for: count the use anyway
+                    Coupon.objects.filter(pk=coupon.pk).update(
+                        usage_count=F('usage_count') + 1,
+                        updated_at=timezone.now()
+                    )
+                    issues.append(f'Coupon {coupon.code} used past its usage limit ({coupon.usage_limit})')
+            
+            reservation.resolved_at = timezone.now()
+            reservation.save(update_fields=['status', 'resolved_at'])
+        return issues
+    
+    @staticmethod
+    def release(order_id):
+        """
+        Release the order's held reservation, returning stock and coupon use.
+        
+        The status guard makes this safe to call more than once.
+        
+        Returns:
+            bool: True if something was released
+        """
+        with transaction.atomic():
+            reservation = (
+                StockReservation.objects.select_for_update()
+                .filter(order_id=order_id, status='held')
+                .first()
+            )
+            if reservation is None:
+                return False
+            updated = StockReservation.objects.filter(pk=reservation.pk, status='held').update(
+                status='released',
+                resolved_at=timezone.now()
+            )
+            if not updated:
+                return False
+            Product.return_stock(reservation.product_id, reservation.quantity)
+            if reservation.coupon_id:
+                from apps.commissions.models import Coupon
+                Coupon.release_usage(reservation.coupon_id)
+        return True
+    
+    @staticmethod
+    def get_expired(now=None):
+        """Held reservations past their expiry."""
+        return StockReservation.objects.filter(
+            status='held',
+            expires_at__lte=now or timezone.now()
+        )
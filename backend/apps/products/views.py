@@ -1,15 +1,40 @@
+from django.db.models import Max
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from .cache import catalog_cache
 from .models import Product
 from .serializers import ProductListSerializer, ProductDetailSerializer
 
 
 class ProductListView(generics.ListAPIView):
-    """List all active products."""
+    """List all active products (served from the catalog cache)."""
     
     permission_classes = [AllowAny]
     serializer_class = ProductListSerializer
     
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        key = (
+            'list',
+            request.get_host(),
+            params.get('category', ''),
+            params.get('featured') == 'true',
+            params.get('page', '1'),
+        )
+        list_page = super().list
+        
+        def compute():
+            data = list_page(request, *args, **kwargs).data
+            # Include inactive rows so a soft-delete still moves Last-Modified forward
+            changed = Product.objects.all()
+            if params.get('category'):
+                changed = changed.filter(category=params['category'])
+            return data, changed.aggregate(last=Max('updated_at'))['last']
+        
+        entry = catalog_cache.get(key, compute)
+        return catalog_cache.respond(request, entry, Response(entry['data']))
+    
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True)
         
@@ -33,6 +58,14 @@ class ProductDetailView(generics.RetrieveAPIView):
     serializer_class = ProductDetailSerializer
     queryset = Product.objects.filter(is_active=True)
     lookup_field = 'slug'
+    
+    def retrieve(self, request, *args, **kwargs):
+        def compute():
+            product = self.get_object()
+            return self.get_serializer(product).data, product.updated_at
+        
+        entry = catalog_cache.get(('detail', kwargs['slug']), compute)
+        return catalog_cache.respond(request, entry, Response(entry['data']))
 
 
 # --- Admin Views ---
@@ -76,4 +109,4 @@ class AdminProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         # Soft delete - just deactivate instead of hard delete
         instance.is_active = False
-        instance.save(update_fields=['is_active'])
+        instance.save(update_fields=['is_active', 'updated_at'])
@@ -46,10 +46,11 @@ class CustomerRegisterSerializer(serializers.ModelSerializer):
         # Link referral if code exists
         if referral_code:
             try:
-                from apps.affiliates.models import Affiliate
+                from apps.affiliates.models import Affiliate, DashboardSnapshot
                 affiliate = Affiliate.objects.get(affiliate_code=referral_code, status='approved')
                 user.referred_by = affiliate
                 user.save(update_fields=['referred_by'])
+                DashboardSnapshot.add_leads(affiliate.id)
             except Affiliate.DoesNotExist:
                 pass # Ignore invalid codes
                 
@@ -205,6 +205,74 @@ CSRF_TRUSTED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 
+# Cache - local memory for development. For multi-process production set
+# CACHE_URL to a Redis instance (e.g. redis://127.0.0.1:6379/1).
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'qutab-default',
+        }
+    }
+
+# Commission lifecycle: holding period before a commission can be withdrawn.
+# `run_scheduler` matures commissions at their mature_at and voids those whose
+# order was cancelled/refunded; it sleeps at most SCHEDULER_MAX_SLEEP seconds.
+COMMISSION_HOLDING_DAYS = 30
+SCHEDULER_MAX_SLEEP = 5.0
+
+# Payment webhook inbox, drained by `process_webhooks`
+WEBHOOK_MAX_ATTEMPTS = 8             # then the event is marked dead
+WEBHOOK_RETRY_BASE_DELAY = 30        # seconds; doubles per attempt, with jitter
+WEBHOOK_RETRY_MAX_DELAY = 60 * 60
+WEBHOOK_CLAIM_TIMEOUT = 5 * 60       # release events held by a crashed worker
+
+# Leaderboard cache lifetime (invalidated early by aggregate_daily_stats)
+LEADERBOARD_CACHE_TIMEOUT = 60 * 60
+
+# Public product catalog: cached until a product changes (or the timeout),
+# and served with ETag/Last-Modified so clients revalidate with 304s.
+CATALOG_CACHE_TIMEOUT = 5 * 60
+CATALOG_HTTP_MAX_AGE = 30
+
+# Admin dashboard stats: served fresh for 30s, then stale-while-revalidate
+STATS_FRESH_SECONDS = 30
+STATS_STALE_SECONDS = 10 * 60
+
+
+# Referral click ingestion: clicks are buffered in-process and written in
+# batches. Set CLICK_INGEST_ASYNC=False to write each click immediately.
+CLICK_INGEST_ASYNC = os.environ.get('CLICK_INGEST_ASYNC', 'True') == 'True'
+CLICK_BUFFER_SIZE = 10000      # Max queued clicks before new ones are dropped
+CLICK_FLUSH_BATCH_SIZE = 500   # Flush as soon as this many are queued
+CLICK_FLUSH_INTERVAL = 2.0     # ...or after this many seconds
+CLICK_DEDUP_WINDOW = 30 * 60   # Same affiliate+IP+UA within this many seconds is a duplicate
+CLICK_DEDUP_MAX_KEYS = 100000  # Bound on remembered (affiliate, IP, UA) keys
+CLICK_RETENTION_DAYS = 90      # prune_clicks rolls older raw clicks into hourly counts
+
+# Live counters (clicks, conversions, commissions, revenue): increments are
+# kept in-process and added to the live_counters table every
+# COUNTER_FLUSH_INTERVAL seconds. Set COUNTER_FLUSH_ASYNC=False to write
+# each increment immediately.
+COUNTER_FLUSH_ASYNC = os.environ.get('COUNTER_FLUSH_ASYNC', 'True') == 'True'
+COUNTER_FLUSH_INTERVAL = 5.0
+COUNTER_SHARDS = 16
+
+# Admin CSV/XLSX exports fetch rows from the database this many at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# Process-local affiliate_code -> affiliate cache used by redirects/attribution
+AFFILIATE_CODE_CACHE_SIZE = 10000
+AFFILIATE_CODE_CACHE_TTL = 60  # seconds; bounds staleness across processes
+
+
 # Internationalization
 LANGUAGE_CODE = 'id-id'  # Indonesian
 TIME_ZONE = 'Asia/Jakarta'  # WIB
@@ -250,6 +318,34 @@ else:
 #   ZENDIT_CALLBACK_URL=https://your-domain.com/api/payments/webhook/
 # =============================================================================
 
+# Shared keep-alive HTTP client (see apps/payments/zendit.py)
+ZENDIT_CONNECT_TIMEOUT = 3.0
+ZENDIT_READ_TIMEOUT = 15.0
+ZENDIT_WRITE_TIMEOUT = 10.0
+ZENDIT_POOL_TIMEOUT = 2.0            # wait for a free pooled connection
+ZENDIT_MAX_CONNECTIONS = 20
+ZENDIT_MAX_KEEPALIVE = 10
+ZENDIT_GET_RETRIES = 2               # GETs only; invoice creation is never retried
+ZENDIT_RETRY_BACKOFF = 0.2           # seconds, doubled per retry, with jitter
+ZENDIT_BREAKER_THRESHOLD = 5         # consecutive failures before failing fast
+ZENDIT_BREAKER_RESET = 30.0          # seconds before a trial request is let through
+
+# Invoices are created on a per-process worker pool after the order commits.
+# Set INVOICE_ASYNC=False to create them inline.
+INVOICE_ASYNC = os.environ.get('INVOICE_ASYNC', 'True') == 'True'
+INVOICE_WORKERS = 4
+INVOICE_EXPIRY_HOURS = 24            # invoice expiry; unpaid stock reservations expire with it
+INVOICE_LONG_POLL_MAX = 2            # seconds /api/payments/invoice/<id>/ may hold the request
+INVOICE_POLL_RETRY_AFTER = 1         # Retry-After (seconds) while the invoice is still pending
+INVOICE_CLAIM_TIMEOUT = 120          # seconds before a claimed, unfinished invoice is retried
+INVOICE_REQUEUE_AFTER = 60           # seconds before an unclaimed pending invoice is re-queued
+
+# `reconcile_invoices` sweeps pending invoices; PaymentStatusView reads its cache
+INVOICE_RECONCILE_INTERVAL = 60      # seconds between sweeps
+INVOICE_RECONCILE_CONCURRENCY = 8    # concurrent gateway status checks
+INVOICE_RECONCILE_MAX_AGE = 48 * 60 * 60  # ignore invoices older than this
+INVOICE_STATUS_CACHE_TTL = 120
+
 
 # =============================================================================
 # =============================================================================
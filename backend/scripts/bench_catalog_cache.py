@@ -0,0 +1,79 @@
+"""
+Measure catalog serve time and database queries with and without the
+catalog cache, and how often clients are answered with 304.
+
+Usage (from backend/):
+    python scripts/bench_catalog_cache.py
+    python scripts/bench_catalog_cache.py --requests 2000
+
+Runs the public list and detail endpoints through the Django test client:
+cold (cache invalidated before every request), warm (cache hits) and
+conditional (If-None-Match with the ETag from the previous response).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from apps.products.cache import catalog_cache
+from apps.products.models import Product
+
+
+def run(client, path, count, cold=False, conditional=False):
+    """Return (latencies, queries per request, status codes) for `count` GETs."""
+    latencies = []
+    statuses = set()
+    headers = {}
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(count):
+            if cold:
+                catalog_cache._bump_version()
+            started = time.perf_counter()
+            response = client.get(path, HTTP_HOST='localhost', **headers)
+            latencies.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+            if conditional:
+                headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+    return sorted(latencies), len(queries) / count, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    
+    product = Product.objects.filter(is_active=True).first()
+    if not product:
+        sys.exit('Need at least one active product (run generate_test_data).')
+    
+    client = Client()
+    paths = {
+        'list': '/api/products/',
+        'list (featured)': '/api/products/?featured=true',
+        'detail': f'/api/products/{product.slug}/',
+    }
+    
+    for name, path in paths.items():
+        print(f'\n{name}: GET {path} x{args.requests} ({connection.vendor})')
+        for mode, kwargs in [('cold', {'cold': True}), ('warm', {}), ('304', {'conditional': True})]:
+            latencies, queries, statuses = run(client, path, args.requests, **kwargs)
+            print(f'  {mode:<5} p50 {statistics.median(latencies) * 1000:.3f}ms, '
+                  f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.3f}ms, '
+                  f'{queries:.2f} queries/request, status {sorted(statuses)}')
+    
+    print(f'\nCache: {catalog_cache.get_metrics()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Fire concurrent duplicate "payment paid" deliveries at one order and check
+that the attribution pipeline creates exactly one referral and commission.
+
+Usage (from backend/):
+    python scripts/bench_commission_attribution.py
+    python scripts/bench_commission_attribution.py --deliveries 1000 --workers 50 --max-wait 5
+
+Meant for PostgreSQL, where select_for_update makes duplicates queue on the
+order row. On SQLite writers serialize on the database lock instead, and
+"database is locked" errors are reported as failed deliveries.
+A throwaway order is created and deleted again (use --keep to inspect it).
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from apps.affiliates.models import Affiliate, Referral
+from apps.commissions.models import AffiliateBalance, Commission, CommissionAttribution
+from apps.orders.models import Order, OrderTracking
+from apps.payments.utils import process_payment_success
+from apps.products.models import Product
+from apps.users.models import User
+
+
+def create_order():
+    affiliate = Affiliate.objects.filter(status='approved').select_related('user').first()
+    product = Product.objects.first()
+    if not affiliate or not product:
+        sys.exit('Need at least one approved affiliate and one product (run generate_test_data).')
+    customer = User.objects.exclude(pk=affiliate.user_id).first()
+    
+    return Order.objects.create(
+        user=customer,
+        product=product,
+        quantity=1,
+        unit_price=product.price,
+        total_amount=product.price,
+        final_amount=product.price,
+        recipient_name='Benchmark',
+        referral_code=affiliate.affiliate_code,
+    )
+
+
+def deliver(order):
+    """One webhook delivery holding a stale copy of the order, like the view does."""
+    started = time.perf_counter()
+    try:
+        process_payment_success(copy.copy(order), payment_method='benchmark')
+        return time.perf_counter() - started, None
+    except Exception as e:
+        return time.perf_counter() - started, e
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--deliveries', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--max-wait', type=float, default=5.0, help='Fail if any delivery takes longer (seconds)')
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark order and its rows')
+    args = parser.parse_args()
+    
+    order = create_order()
+    print(f'Order {order.order_number} -> {order.referral_code}: '
+          f'{args.deliveries} deliveries on {args.workers} threads ({connection.vendor})')
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(deliver, [order] * args.deliveries))
+    elapsed = time.perf_counter() - started
+    
+    latencies = sorted(latency for latency, _ in results)
+    errors = [error for _, error in results if error]
+    counts = {
+        'referrals': Referral.objects.filter(order=order).count(),
+        'commissions': Commission.objects.filter(order=order).count(),
+        'attributions': CommissionAttribution.objects.filter(order=order).count(),
+        'paid trackings': OrderTracking.objects.filter(order=order, status='paid').count(),
+    }
+    
+    print(f'\nTotal: {elapsed:.2f}s ({args.deliveries / elapsed:.0f} deliveries/s)')
+    print(f'Latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms, '
+          f'max {latencies[-1] * 1000:.1f}ms')
+    print(f'Errors: {len(errors)}' + (f' (first: {errors[0]})' if errors else ''))
+    for name, count in counts.items():
+        print(f'  {name}: {count}')
+    
+    exactly_once = all(count == 1 for count in counts.values())
+    bounded = latencies[-1] <= args.max_wait
+    
+    if not args.keep:
+        affiliate_id = Affiliate.objects.get(affiliate_code=order.referral_code).id
+        order.delete()
+        AffiliateBalance.rebuild([affiliate_id])
+    
+    print('\n' + ('PASS' if exactly_once and bounded and not errors else 'FAIL') +
+          f': exactly-once={exactly_once}, max wait {latencies[-1]:.2f}s <= {args.max_wait}s={bounded}')
+    sys.exit(0 if exactly_once and bounded and not errors else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Compare peak RSS and time to first byte of the streaming order export
+against serializing the same rows.
+
+Usage (from backend/):
+    python scripts/bench_export_memory.py
+    python scripts/bench_export_memory.py --orders 1000000 --modes stream-csv stream-xlsx serializer
+
+Bulk-creates throwaway orders (deleted again unless --keep), then runs each
+mode in a fresh subprocess so peak RSS is measured independently:
+
+    stream-csv / stream-xlsx  AdminOrderExportView, response consumed chunk by chunk
+    serializer                AdminOrderSerializer(many=True).data written to CSV in memory
+
+Streaming peak RSS should stay flat as --orders grows; the serializer's grows
+with the row count.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.orders.models import Order
+from apps.orders.serializers import AdminOrderSerializer
+from apps.orders.views import AdminOrderExportView, AdminOrderListView
+from apps.products.models import Product
+from apps.users.models import User
+
+PREFIX = 'BEXP'
+MODES = ['stream-csv', 'stream-xlsx', 'serializer']
+
+
+def create_orders(count):
+    user = User.objects.first()
+    product = Product.objects.first()
+    if not user or not product:
+        sys.exit('Need at least one user and one product (run generate_test_data).')
+    
+    batch = []
+    for i in range(count):
+        batch.append(Order(
+            order_number=f'{PREFIX}{uuid.uuid4().hex[:14].upper()}',
+            user=user,
+            product=product,
+            unit_price=product.price,
+            total_amount=product.price,
+            final_amount=product.price,
+            recipient_name='Benchmark export',
+        ))
+        if len(batch) == 5000:
+            Order.objects.bulk_create(batch)
+            batch = []
+    Order.objects.bulk_create(batch)
+
+
+def peak_rss_mb():
+    # VmHWM is this process's own peak; ru_maxrss survives exec on Linux and
+    # would report the parent's peak (the fixture creation) instead
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(mode):
+    """Run one export in this process and print its stats as JSON."""
+    admin = User.objects.filter(is_staff=True).first()
+    if not admin:
+        sys.exit('Need a staff user (run setup_admin).')
+    baseline = peak_rss_mb()
+    params = {'search': PREFIX}
+    
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    if mode == 'serializer':
+        request = APIRequestFactory().get('/api/orders/admin/', params)
+        force_authenticate(request, user=admin)
+        view = AdminOrderListView()
+        view.setup(view.initialize_request(request))
+        view.format_kwarg = None
+        
+        data = AdminOrderSerializer(view.get_queryset(), many=True, context={'request': view.request}).data
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(data[0].keys() if data else [])
+        for row in data:
+            writer.writerow(row.values())
+        body = out.getvalue().encode()
+        first_byte = time.perf_counter() - started
+        size = len(body)
+        rows = len(data)
+    else:
+        request = APIRequestFactory().get('/api/orders/admin/export/', {**params, 'type': mode.split('-')[1]})
+        force_authenticate(request, user=admin)
+        response = AdminOrderExportView.as_view()(request)
+        for chunk in response.streaming_content:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        rows = None
+    
+    print(json.dumps({
+        'mode': mode,
+        'rows': rows,
+        'bytes': size,
+        'first_byte': first_byte,
+        'total': time.perf_counter() - started,
+        'peak_rss_mb': peak_rss_mb(),
+        'growth_mb': peak_rss_mb() - baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark orders')
+    parser.add_argument('--measure', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        measure(args.measure)
+        return
+    
+    existing = Order.objects.filter(order_number__startswith=PREFIX).count()
+    if existing < args.orders:
+        started = time.perf_counter()
+        create_orders(args.orders - existing)
+        print(f'Created {args.orders - existing:,} orders in {time.perf_counter() - started:.1f}s')
+    print(f'{args.orders:,} orders ({connection.vendor})\n')
+    print(f'{"mode":<12}  {"first byte":>10}  {"total":>8}  {"size":>9}  {"peak RSS":>9}  {"growth":>8}')
+    
+    for mode in args.modes:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--measure', mode],
+            capture_output=True, text=True, env=os.environ
+        )
+        if result.returncode != 0:
+            print(f'{mode:<12}  failed:\n{result.stderr[-2000:]}')
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f'{mode:<12}  {stats["first_byte"] * 1000:>8.1f}ms  {stats["total"]:>7.2f}s  '
+              f'{stats["bytes"] / 1e6:>7.1f}MB  {stats["peak_rss_mb"]:>7.1f}MB  {stats["growth_mb"]:>6.1f}MB')
+    
+    if not args.keep:
+        Order.objects.filter(order_number__startswith=PREFIX).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare page-number (COUNT + OFFSET) and keyset pagination cost by page depth.
+
+Usage (from backend/):
+    python scripts/bench_keyset_pagination.py
+    python scripts/bench_keyset_pagination.py --orders 200000 --pages 1 10 100 1000 5000
+
+Bulk-creates throwaway orders (deleted again unless --keep), then times
+the admin order list paginator at increasing depths: ?page=N against
+?cursor=<cursor of page N>. Keyset pages should cost the same at any depth.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.core.pagination import KeysetPagination
+from apps.orders.models import Order
+from apps.products.models import Product
+from apps.users.models import User
+
+TAG = 'bench-keyset'
+
+
+def create_orders(count):
+    user = User.objects.first()
+    product = Product.objects.first()
+    if not user or not product:
+        sys.exit('Need at least one user and one product (run generate_test_data).')
+    
+    batch = []
+    for i in range(count):
+        batch.append(Order(
+            order_number=f'BK{uuid.uuid4().hex[:16].upper()}',
+            user=user,
+            product=product,
+            unit_price=product.price,
+            total_amount=product.price,
+            final_amount=product.price,
+            recipient_name=TAG,
+        ))
+        if len(batch) == 5000:
+            Order.objects.bulk_create(batch)
+            batch = []
+    Order.objects.bulk_create(batch)
+
+
+def time_page(paginator, params, repeat):
+    factory = APIRequestFactory()
+    queryset = Order.objects.filter(recipient_name=TAG).order_by('-created_at', '-id')
+    timings = []
+    for _ in range(repeat):
+        request = Request(factory.get('/api/orders/admin/', params))
+        started = time.perf_counter()
+        rows = paginator.paginate_queryset(queryset, request)
+        paginator.get_paginated_response([row.pk for row in rows])
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 4000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark orders')
+    args = parser.parse_args()
+    
+    if not Order.objects.filter(recipient_name=TAG).exists():
+        started = time.perf_counter()
+        create_orders(args.orders)
+        print(f'Created {args.orders:,} orders in {time.perf_counter() - started:.1f}s')
+    total = Order.objects.filter(recipient_name=TAG).count()
+    page_size = PageNumberPagination.page_size
+    print(f'{total:,} orders, {page_size} per page ({connection.vendor})\n')
+    print(f'{"page":>6}  {"page-number":>12}  {"keyset":>8}')
+    
+    boundaries = Order.objects.filter(recipient_name=TAG).order_by('-created_at', '-id')
+    for page in args.pages:
+        if (page - 1) * page_size >= total:
+            continue
+        offset_time = time_page(PageNumberPagination(), {'page': page}, args.repeat)
+        
+        cursor = ''
+        if page > 1:
+            last = boundaries.values_list('created_at', 'id')[(page - 1) * page_size - 1]
+            cursor = KeysetPagination.encode_cursor(last)
+        keyset_time = time_page(KeysetPagination(), {'cursor': cursor}, args.repeat)
+        
+        print(f'{page:>6}  {offset_time * 1000:>10.2f}ms  {keyset_time * 1000:>6.2f}ms')
+    
+    if not args.keep:
+        Order.objects.filter(recipient_name=TAG).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Time a full bulk payout run: lock payouts into a batch, write the bank
+transfer files, then settle them from a bank response file.
+
+Usage (from backend/):
+    python scripts/bench_payout_batch.py
+    python scripts/bench_payout_batch.py --payouts 5000 --failed 50
+
+Bulk-creates throwaway orders, referrals, available commissions and one
+pending payout per commission, spread over up to --affiliates approved
+affiliates with a throwaway verified bank account each (deleted again
+unless --keep). Balance snapshots are checked against the source rows
+after the run; snapshots and live counters are rebuilt after cleanup.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.affiliates.models import Affiliate, Referral
+from apps.commissions.models import AffiliateBalance, BankAccount, Commission, Payout, PayoutBatch
+from apps.commissions.services import PayoutBatchService
+from apps.core.counters import counters
+from apps.orders.models import Order
+from apps.products.models import Product
+from apps.users.models import User
+
+TAG = 'bench-payout-batch'
+BANKS = ['BCA', 'Mandiri', 'BNI', 'BRI']
+
+
+def create_payouts(count, affiliates):
+    customer = User.objects.filter(is_staff=False).first()
+    product = Product.objects.first()
+    if not customer or not product:
+        sys.exit('Need at least one user and one product (run generate_test_data).')
+    
+    accounts = BankAccount.objects.bulk_create([
+        BankAccount(
+            affiliate=affiliate,
+            bank_name=BANKS[i % len(BANKS)],
+            account_number=f'{9000000000 + affiliate.id}',
+            account_holder=TAG,
+            verification_status='verified',
+            verified_at=timezone.now(),
+        )
+        for i, affiliate in enumerate(affiliates)
+    ])
+    
+    orders = Order.objects.bulk_create([
+        Order(
+            order_number=f'BPB{uuid.uuid4().hex[:14].upper()}',
+            user=customer,
+            product=product,
+            unit_price=product.price,
+            total_amount=product.price,
+            final_amount=product.price,
+            recipient_name=TAG,
+        )
+        for _ in range(count)
+    ], batch_size=1000)
+    
+    referrals = Referral.objects.bulk_create([
+        Referral(
+            affiliate=affiliates[i % len(affiliates)],
+            order=order,
+            customer=customer,
+            status='confirmed',
+            customer_name_masked='Ben****',
+            customer_email_masked='ben****@example.com',
+        )
+        for i, order in enumerate(orders)
+    ], batch_size=1000)
+    
+    now = timezone.now()
+    Commission.objects.bulk_create([
+        Commission(
+            affiliate_id=referral.affiliate_id,
+            referral=referral,
+            order=referral.order,
+            order_amount=product.price,
+            commission_rate=Decimal('10.00'),
+            amount=50000 + 1000 * (i % 50),
+            status='available',
+            mature_at=now,
+            matured_at=now,
+        )
+        for i, referral in enumerate(referrals)
+    ], batch_size=1000)
+    
+    # One payout per commission, so every payout is made of whole commissions
+    account_for = {account.affiliate_id: account for account in accounts}
+    Payout.objects.bulk_create([
+        Payout(
+            affiliate_id=affiliate_id,
+            bank_account=account_for[affiliate_id],
+            amount=amount,
+            bank_name_snapshot=account_for[affiliate_id].bank_name,
+            account_number_snapshot=account_for[affiliate_id].account_number,
+            account_holder_snapshot=TAG,
+        )
+        for affiliate_id, amount in Commission.objects.filter(order__recipient_name=TAG).values_list('affiliate_id', 'amount')
+    ], batch_size=1000)
+    AffiliateBalance.rebuild([affiliate.id for affiliate in affiliates])
+
+
+def timed(label, func):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+    print(f'{label:<22}  {elapsed:>7.2f}s  {len(queries):>6} queries')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--payouts', type=int, default=2000)
+    parser.add_argument('--failed', type=int, default=20, help='Payouts the bank response marks failed')
+    parser.add_argument('--affiliates', type=int, default=50)
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows')
+    args = parser.parse_args()
+    
+    if PayoutBatchService.get_eligible().exclude(account_holder_snapshot=TAG).exists():
+        sys.exit('Real pending payouts with verified bank accounts exist; run this on a scratch database.')
+    
+    affiliates = list(Affiliate.objects.filter(status='approved').order_by('id')[:args.affiliates])
+    if not affiliates:
+        sys.exit('Need at least one approved affiliate (run generate_test_data).')
+    
+    started = time.perf_counter()
+    create_payouts(args.payouts, affiliates)
+    print(f'Created {args.payouts:,} payouts for {len(affiliates)} affiliates in {time.perf_counter() - started:.1f}s')
+    print(f'({connection.vendor})\n')
+    
+    batch, skipped = timed('create batch', PayoutBatchService.create_batch)
+    files = timed('transfer files', lambda: PayoutBatchService.build_transfer_files(batch))
+    
+    lines = ['reference,status,transfer_reference,message']
+    for i, payout_id in enumerate(batch.payouts.order_by('id').values_list('id', flat=True)):
+        if i < args.failed:
+            lines.append(f'{PayoutBatch.line_reference(payout_id)},FAILED,,Account closed')
+        else:
+            lines.append(f'{PayoutBatch.line_reference(payout_id)},SUCCESS,TRX{payout_id},')
+    result = timed('ingest response', lambda: PayoutBatchService.ingest_response(batch, '\n'.join(lines)))
+    
+    batch.refresh_from_db()
+    print(f'\n{batch}: {len(files)} transfer files, {len(skipped)} skipped')
+    print(f'{len(result["paid"])} paid, {len(result["failed"])} failed, {len(result["errors"])} errors')
+    
+    affiliate_ids = [affiliate.id for affiliate in affiliates]
+    actual = AffiliateBalance.compute_from_source(affiliate_ids)
+    drift = [
+        affiliate_id for affiliate_id, balance in AffiliateBalance.objects.in_bulk(affiliate_ids).items()
+        if any(getattr(balance, column) != value for column, value in actual.get(affiliate_id, {}).items())
+    ]
+    print(f'Balance snapshots: {"OK" if not drift else f"drift for affiliates {drift}"}')
+    
+    if not args.keep:
+        tagged = Q(account_holder_snapshot=TAG)
+        PayoutBatch.objects.filter(pk=batch.pk).delete()
+        Order.objects.filter(recipient_name=TAG).delete()
+        Payout.objects.filter(tagged).delete()
+        BankAccount.objects.filter(account_holder=TAG).delete()
+        # Bulk deletes bypass the snapshot and counter hooks
+        AffiliateBalance.rebuild(affiliate_ids)
+        counters.rebuild()
+
+
+if __name__ == '__main__':
+    main()
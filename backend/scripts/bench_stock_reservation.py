@@ -0,0 +1,177 @@
+"""
+Fire concurrent checkouts at one low-stock product (and one limited coupon)
+and check that stock is never oversold and the coupon never overused.
+
+Usage (from backend/):
+    python scripts/bench_stock_reservation.py
+    python scripts/bench_stock_reservation.py --checkouts 500 --stock 50 --coupon-limit 20 --workers 50
+
+Each checkout runs the same transaction as CreateOrderView (conditional
+stock decrement, conditional coupon use, order and StockReservation) minus
+the invoice dispatch, so no gateway is called. Half the orders are then
+expired and released to check that stock and coupon uses come back.
+On SQLite writers serialize on the database lock and "database is locked"
+errors are reported separately; they must never cause an oversell.
+Throwaway rows are deleted again (use --keep to inspect them).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.utils import timezone
+from apps.affiliates.models import Affiliate
+from apps.commissions.models import Coupon
+from apps.orders.models import Order
+from apps.products.models import Product, StockReservation
+from apps.users.models import User
+
+
+def create_fixtures(stock, coupon_limit):
+    tag = uuid.uuid4().hex[:8]
+    product = Product.objects.create(
+        name=f'Benchmark {tag}',
+        slug=f'benchmark-{tag}',
+        category='sapi',
+        price=Decimal('10000000'),
+        weight_min=300,
+        weight_max=350,
+        stock=stock,
+    )
+    affiliate = Affiliate.objects.filter(status='approved').first()
+    if not affiliate:
+        sys.exit('Need at least one approved affiliate (run generate_test_data).')
+    coupon = Coupon.objects.create(
+        affiliate=affiliate,
+        code=f'BENCH{tag.upper()}',
+        discount_type='percentage',
+        discount_value=Decimal('5'),
+        valid_from=timezone.now() - timedelta(days=1),
+        valid_until=timezone.now() + timedelta(days=1),
+        usage_limit=coupon_limit,
+    )
+    return product, coupon
+
+
+def checkout(product, coupon, user):
+    """One checkout, the way CreateOrderView does it. Returns (latency, outcome)."""
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            if not Product.take_stock(product.id, 1):
+                return time.perf_counter() - started, 'sold out'
+            
+            used = coupon is not None and coupon.increment_usage()
+            order = Order.objects.create(
+                user=user,
+                product=product,
+                quantity=1,
+                unit_price=product.price,
+                total_amount=product.price,
+                final_amount=product.price,
+                recipient_name='Benchmark',
+                coupon_code=coupon.code if used else '',
+            )
+            StockReservation.objects.create(
+                order=order,
+                product=product,
+                quantity=1,
+                coupon=coupon if used else None,
+                expires_at=timezone.now() + timedelta(hours=24),
+            )
+        return time.perf_counter() - started, 'ordered'
+    except Exception as e:
+        return time.perf_counter() - started, e
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--checkouts', type=int, default=500)
+    parser.add_argument('--stock', type=int, default=50)
+    parser.add_argument('--coupon-limit', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark product, coupon and orders')
+    args = parser.parse_args()
+    
+    user = User.objects.first()
+    if not user:
+        sys.exit('Need at least one user (run generate_test_data).')
+    product, coupon = create_fixtures(args.stock, args.coupon_limit)
+    print(f'{args.checkouts} checkouts of {product.name} (stock {args.stock}, coupon limit '
+          f'{args.coupon_limit}) on {args.workers} threads ({connection.vendor})')
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda _: checkout(product, coupon, user), range(args.checkouts)))
+    elapsed = time.perf_counter() - started
+    
+    latencies = sorted(latency for latency, _ in results)
+    outcomes = [outcome for _, outcome in results]
+    errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    
+    product.refresh_from_db()
+    coupon.refresh_from_db()
+    orders = Order.objects.filter(product=product).count()
+    held = StockReservation.objects.filter(product=product, status='held').count()
+    coupon_uses = StockReservation.objects.filter(coupon=coupon).count()
+    
+    print(f'\nTotal: {elapsed:.2f}s ({args.checkouts / elapsed:.0f} checkouts/s)')
+    print(f'Latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms, '
+          f'max {latencies[-1] * 1000:.1f}ms')
+    print(f'Ordered: {outcomes.count("ordered")}, sold out: {outcomes.count("sold out")}, '
+          f'errors: {len(errors)}' + (f' (first: {errors[0]})' if errors else ''))
+    print(f'  stock left: {product.stock}, orders: {orders}, held reservations: {held}')
+    print(f'  coupon usage_count: {coupon.usage_count}, reservations with coupon: {coupon_uses}')
+    
+    no_oversell = product.stock >= 0 and orders == held == args.stock - product.stock
+    coupon_ok = coupon.usage_count == coupon_uses <= args.coupon_limit
+    
+    # Expire half of the holds and release them
+    to_expire = list(
+        StockReservation.objects.filter(product=product, status='held')
+        .values_list('order_id', flat=True)[:held // 2]
+    )
+    StockReservation.objects.filter(order_id__in=to_expire).update(expires_at=timezone.now() - timedelta(minutes=1))
+    released = sum(
+        1 for order_id in StockReservation.get_expired().filter(product=product).values_list('order_id', flat=True)
+        if StockReservation.release(order_id)
+    )
+    product.refresh_from_db()
+    coupon.refresh_from_db()
+    coupon_uses = StockReservation.objects.filter(coupon=coupon, status='held').count()
+    released_ok = (
+        released == len(to_expire)
+        and product.stock == args.stock - (held - released)
+        and coupon.usage_count == coupon_uses
+    )
+    print(f'  released {released} expired holds -> stock {product.stock}, coupon usage_count {coupon.usage_count}')
+    
+    if not args.keep:
+        Order.objects.filter(product=product).delete()
+        product.delete()
+        coupon.delete()
+    
+    passed = no_oversell and coupon_ok and released_ok
+    print('\n' + ('PASS' if passed else 'FAIL') +
+          f': no-oversell={no_oversell}, coupon-within-limit={coupon_ok}, release-restores={released_ok}')
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
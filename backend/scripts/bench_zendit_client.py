@@ -0,0 +1,135 @@
+"""
+Invoice-creation latency of ZenditService against a local stub gateway.
+
+Starts a keep-alive HTTP stub on 127.0.0.1, then makes N sequential
+create_invoice() calls through the pooled client and through a fresh
+httpx.Client per call (the previous behaviour), printing p50/p99 for both.
+Then checks that the circuit breaker fails fast once the stub goes down.
+
+Usage (from backend/):
+    python scripts/bench_zendit_client.py
+    python scripts/bench_zendit_client.py --calls 1000 --delay-ms 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+import httpx
+from apps.payments.zendit import ZenditService
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Minimal Zendit stand-in: POST /v1/invoices and GET /v1/invoices/<id>."""
+    
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    delay = 0.0
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        invoice_id = uuid.uuid4().hex
+        self._reply(201, {
+            'id': invoice_id,
+            'invoice_url': f'https://pay.example/{invoice_id}',
+            'amount': payload.get('amount'),
+            'status': 'PENDING',
+        })
+    
+    def do_GET(self):
+        self._reply(200, {'id': self.path.rsplit('/', 1)[-1], 'status': 'PENDING'})
+    
+    def _reply(self, code, body):
+        if self.delay:
+            time.sleep(self.delay)
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+
+class PerCallClientService(ZenditService):
+    """The old behaviour: a new connection (and client) for every call."""
+    
+    def _request(self, method, path, **kwargs):
+        with httpx.Client(base_url=self.api_url, headers=self._get_headers(), timeout=30.0) as client:
+            return client.request(method, path, **kwargs)
+
+
+def fake_order():
+    user = SimpleNamespace(get_full_name=lambda: 'Bench User', email='bench@example.com', phone='')
+    product = SimpleNamespace(name='Paket Kambing Grade A')
+    return SimpleNamespace(
+        id=uuid.uuid4(), order_number='QTB-BENCH', final_amount=1200000,
+        unit_price=1200000, quantity=1, product=product, user=user,
+    )
+
+
+def measure(service, calls):
+    order = fake_order()
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        result = service.create_invoice(order)
+        latencies.append(time.perf_counter() - started)
+        if not result['success']:
+            sys.exit(f'create_invoice failed: {result}')
+    latencies.sort()
+    return latencies
+
+
+def report(name, latencies):
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f'{name:<22} p50 {statistics.median(latencies) * 1000:7.2f}ms   '
+          f'p99 {p99 * 1000:7.2f}ms   total {sum(latencies):6.2f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='Server-side delay per request')
+    args = parser.parse_args()
+    
+    StubGatewayHandler.delay = args.delay_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGatewayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f'http://127.0.0.1:{server.server_port}/v1'
+    print(f'Stub gateway at {api_url}, {args.calls} sequential create_invoice() calls\n')
+    
+    pooled = ZenditService(api_url=api_url)
+    report('pooled client', measure(pooled, args.calls))
+    report('client per call', measure(PerCallClientService(api_url=api_url), args.calls))
+    
+    # Gateway down: the breaker should open and later calls return immediately
+    server.shutdown()
+    server.server_close()
+    pooled.close()
+    started = time.perf_counter()
+    results = [pooled.check_invoice_status('inv') for _ in range(20)]
+    elapsed = time.perf_counter() - started
+    print(f'\nGateway down: 20 status checks in {elapsed * 1000:.0f}ms, '
+          f'breaker {pooled.breaker.state}, last error: {results[-1]["error"]}')
+    pooled.close()
+
+
+if __name__ == '__main__':
+    main()